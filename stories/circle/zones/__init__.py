@@ -8,38 +8,109 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 from __future__ import absolute_import, print_function, division, unicode_literals
 import re
 import random
+from textwrap import dedent
 from .circledata.parse_mob_files import get_mobs
 from .circledata.parse_obj_files import get_objs
 from .circledata.parse_shp_files import get_shops
 from .circledata.parse_wld_files import get_rooms
 from .circledata.parse_zon_files import get_zones
+from .circledata.loader import load_data
 from tale.base import Location, Item, Exit, Door, Armour, Container, Weapon, Key
 from tale.npc import NPC
 from tale.items.basic import *
 from tale.items.board import BulletinBoard
 from tale.shop import ShopBehavior, Shopkeeper
 from tale.errors import LocationIntegrityError
-from tale.util import roll_dice
+from tale.util import roll_dice, FrozenDict
 from tale import mud_context
 
 
-print("\nLoading circle data files.")
-mobs = get_mobs()
-print(len(mobs), "mobs loaded.")
-objs = get_objs()
-print(len(objs), "objects loaded.")
-shops = get_shops()
-print(len(shops), "shops loaded.")
-rooms = get_rooms()
-print(len(rooms), "rooms loaded.")
-zones = get_zones()
-print(len(zones), "zones loaded.")
+mobs, objs, shops, rooms, zones = {}, {}, {}, {}, {}   # the circle data, loaded by init_zones()
 
 
 converted_rooms = {}   # cache for the rooms
 converted_mobs = set()
 converted_items = set()
 converted_shops = {}  # cache for the shop data
+item_prototypes = {}  # vnum -> ItemPrototype
+mob_prototypes = {}   # vnum -> MobPrototype
+
+
+class ItemPrototype(object):
+    """
+    The data that all instances of a circle object or mob (with the same vnum) have in common:
+    their name, descriptions and extra descriptions. This is created once per vnum and
+    the instances refer to it, they only hold their own state. All of it is immutable,
+    so when something of an instance is changed, it gets its own copy (the extra descriptions
+    are copied by add_extradesc, the other attributes are simply replaced).
+    The aliases are not in here: they can be changed in place, so every instance has its own set.
+    """
+    __slots__ = ("vnum", "name", "title", "description", "short_description", "extra_desc")
+
+    def __init__(self, vnum, c_thing, description=None, skip_keyword=None):
+        self.vnum = vnum
+        self.name = list(c_thing.aliases)[0].lower()
+        title = c_thing.shortdesc
+        if title.startswith("the ") or title.startswith("The "):
+            title = title[4:]
+        if title.startswith("a ") or title.startswith("A "):
+            title = title[2:]
+        self.title = title
+        self.description = dedent(description).strip() if description else ""
+        self.short_description = c_thing.longdesc
+        extra_desc = {}
+        for ed in getattr(c_thing, "extradesc", []):
+            if skip_keyword not in ed["keywords"]:
+                for keyword in ed["keywords"]:
+                    extra_desc[keyword] = ed["text"]
+        self.extra_desc = FrozenDict(extra_desc)
+
+    def apply(self, obj):
+        """Make the (new) object use the names and descriptions of this prototype."""
+        obj.name = self.name
+        if self.description:
+            obj.description = self.description
+        obj.extra_desc = self.extra_desc
+        obj.vnum = self.vnum
+
+
+class MobPrototype(ItemPrototype):
+    """Prototype of a circle mob, also has the stats that are the same for all instances."""
+    __slots__ = ("gender", "aggressive", "sentinel", "money", "alignment", "xp", "hp_dice", "maxhp_dice", "level", "ac", "attack_dice")
+
+    def __init__(self, vnum, c_mob):
+        super(MobPrototype, self).__init__(vnum, c_mob, c_mob.detaileddesc)
+        self.gender = c_mob.gender
+        self.aggressive = "aggressive" in c_mob.actions
+        self.sentinel = "sentinel" in c_mob.actions
+        self.money = float(c_mob.gold)
+        self.alignment = c_mob.alignment
+        self.xp = c_mob.xp
+        self.hp_dice = tuple(map(int, re.match(r"(\d+)d(\d+)\+(\d+)$", c_mob.maxhp_dice).groups()))
+        self.maxhp_dice = c_mob.maxhp_dice
+        self.level = max(1, c_mob.level)   # 1..50
+        # convert AC -10..10 to more modern 0..20   (naked person(0)...plate armor(10)...battletank(20))
+        # special elites can go higher (limit 100), weaklings with utterly no defenses can go lower (limit -100)
+        self.ac = max(-100, min(100, 10 - c_mob.ac))
+        self.attack_dice = c_mob.barehanddmg_dice
+
+
+def item_prototype(vnum):
+    try:
+        return item_prototypes[vnum]
+    except KeyError:
+        # the item name is removed from the extradesc of the bulletin boards
+        skip_keyword = list(objs[vnum].aliases)[0] if vnum in circle_bulletin_boards else None
+        proto = item_prototypes[vnum] = ItemPrototype(vnum, objs[vnum], skip_keyword=skip_keyword)
+        return proto
+
+
+def mob_prototype(vnum):
+    try:
+        return mob_prototypes[vnum]
+    except KeyError:
+        proto = mob_prototypes[vnum] = MobPrototype(vnum, mobs[vnum])
+        return proto
 
 
 class CircleMob(NPC):
@@ -55,6 +126,25 @@ class CircleMob(NPC):
         ctx.driver.defer(random.randint(20, 60), self.do_wander)
 
 
+# The base item classes store their attributes in slots and have no instance dict,
+# these subclasses add a slot to keep the circle vnum in.
+
+class CircleItem(Item):
+    __slots__ = ("vnum",)
+
+
+class CircleWeapon(Weapon):
+    __slots__ = ("vnum",)
+
+
+class CircleArmour(Armour):
+    __slots__ = ("vnum",)
+
+
+class CircleKey(Key):
+    __slots__ = ("vnum",)
+
+
 def make_location(vnum):
     """
     Get a Tale location object for the given circle room vnum.
@@ -106,38 +196,25 @@ def make_exit(c_exit):
 
 
 def make_mob(vnum, mob_class=CircleMob):
-    """Create an instance of an item for the given vnum"""
-    c_mob = mobs[vnum]
-    aliases = list(c_mob.aliases)
-    name = aliases[0]
-    aliases = set(aliases[1:])
-    title = c_mob.shortdesc
-    if title.startswith("the ") or title.startswith("The "):
-        title = title[4:]
-    if title.startswith("a ") or title.startswith("A "):
-        title = title[2:]
+    """Create an instance of a mob for the given vnum"""
+    proto = mob_prototype(vnum)
     # we take the stats from the 'human' race because the circle data lacks race and stats
-    mob = mob_class(name, c_mob.gender, "human", title, description=c_mob.detaileddesc, short_description=c_mob.longdesc)
-    mob.vnum = vnum  # keep the vnum
-    if hasattr(c_mob, "extradesc"):
-        for ed in c_mob.extradesc:
-            mob.add_extradesc(ed["keywords"], ed["text"])
-    mob.aliases = aliases
-    mob.aggressive = "aggressive" in c_mob.actions
-    mob.money = float(c_mob.gold)
-    mob.stats.alignment = c_mob.alignment
-    mob.stats.xp = c_mob.xp
-    number, sides, hp = map(int, re.match(r"(\d+)d(\d+)\+(\d+)$", c_mob.maxhp_dice).groups())
+    mob = mob_class(proto.name, proto.gender, "human", proto.title, short_description=proto.short_description)
+    proto.apply(mob)   # keep the vnum, and share the descriptions with the other instances
+    mob.aliases = set(list(mobs[vnum].aliases)[1:])
+    mob.aggressive = proto.aggressive
+    mob.money = proto.money
+    mob.stats.alignment = proto.alignment
+    mob.stats.xp = proto.xp
+    number, sides, hp = proto.hp_dice
     if number > 0 and sides > 0:
         hp += roll_dice(number, sides)[0]
     mob.stats.hp = hp
-    mob.stats.maxhp_dice = c_mob.maxhp_dice
-    mob.stats.level = max(1, c_mob.level)   # 1..50
-    # convert AC -10..10 to more modern 0..20   (naked person(0)...plate armor(10)...battletank(20))
-    # special elites can go higher (limit 100), weaklings with utterly no defenses can go lower (limit -100)
-    mob.stats.ac = max(-100, min(100, 10 - c_mob.ac))
-    mob.stats.attack_dice = c_mob.barehanddmg_dice
-    if "sentinel" not in c_mob.actions:
+    mob.stats.maxhp_dice = proto.maxhp_dice
+    mob.stats.level = proto.level
+    mob.stats.ac = proto.ac
+    mob.stats.attack_dice = proto.attack_dice
+    if not proto.sentinel:
         mud_context.driver.defer(random.randint(2, 30), mob.do_wander)
     #@todo load position? (standing/sleeping/sitting...)
     #@todo convert thac0 to appropriate attack stat (armor penetration? to-hit bonus?)
@@ -157,21 +234,13 @@ circle_bulletin_boards = {
 def make_item(vnum):
     """Create an instance of an item for the given vnum"""
     c_obj = objs[vnum]
-    aliases = list(c_obj.aliases)
-    name = aliases[0]
-    aliases = set(aliases[1:])
-    title = c_obj.shortdesc
-    if title.startswith("the ") or title.startswith("The "):
-        title = title[4:]
-    if title.startswith("a ") or title.startswith("A "):
-        title = title[2:]
+    proto = item_prototype(vnum)
+    name, title = proto.name, proto.title
     if vnum in circle_bulletin_boards:
         # it's a bulletin board
-        item = BulletinBoard(name, title, short_description=c_obj.longdesc)
+        item = BulletinBoard(name, title, short_description=proto.short_description)
         item.storage_file = circle_bulletin_boards[vnum]   # XXX the mortal board is duplicated in the circle data...
         item.load()
-        # remove the item name from the extradesc
-        c_obj.extradesc = [ed for ed in c_obj.extradesc if item.name not in ed["keywords"]]
     elif c_obj.type == "container":
         if c_obj.typespecific.get("closeable"):
             item = Boxlike(name, title, short_description=c_obj.longdesc)
@@ -181,13 +250,13 @@ def make_item(vnum):
         else:
             item = Container(name, title, short_description=c_obj.longdesc)
     elif c_obj.type == "weapon":
-        item = Weapon(name, title, short_description=c_obj.longdesc)
+        item = CircleWeapon(name, title, short_description=c_obj.longdesc)
         #@todo weapon attrs
     elif c_obj.type == "armor":
-        item = Armour(name, title, short_description=c_obj.longdesc)
+        item = CircleArmour(name, title, short_description=c_obj.longdesc)
         #@todo armour attrs
     elif c_obj.type == "key":
-        item = Key(name, title, short_description=c_obj.longdesc)
+        item = CircleKey(name, title, short_description=c_obj.longdesc)
         item.key_for(code=vnum)   # the key code is just the item's vnum
     elif c_obj.type == "note":  # doesn't yet occur in the obj files though
         item = Note(name, title, short_description=c_obj.longdesc)
@@ -247,13 +316,11 @@ def make_item(vnum):
         item.contents  = c_obj.typespecific["drinktype"]
         item.poisoned = c_obj.typespecific.get("ispoisoned", False)
     elif c_obj.type in ("treasure", "other"):
-        item = Item(name, title, short_description=c_obj.longdesc)
+        item = CircleItem(name, title, short_description=c_obj.longdesc)
     else:
         raise ValueError("invalid obj type: " + c_obj.type)
-    for ed in c_obj.extradesc:
-        item.add_extradesc(ed["keywords"], ed["text"])
-    item.vnum = vnum  # keep the vnum
-    item.aliases = aliases
+    proto.apply(item)   # keep the vnum, and share the descriptions with the other instances
+    item.aliases = set(list(c_obj.aliases)[1:])
     item.value = c_obj.cost
     item.rent = c_obj.rent
     item.weight = c_obj.weight
@@ -306,8 +373,29 @@ def make_shop(vnum):
         return shop
 
 
+def load_circle_data():
+    """
+    Load the circle data files. This is done when the driver initializes the story, because
+    the parsed data is cached in the user data directory (it is only parsed again when it has changed).
+    """
+    print("\nLoading circle data files.")
+    if load_data(mud_context.driver.user_resources):
+        print("(using the cached data from a previous run)")
+    mobs.update(get_mobs())
+    print(len(mobs), "mobs loaded.")
+    objs.update(get_objs())
+    print(len(objs), "objects loaded.")
+    shops.update(get_shops())
+    print(len(shops), "shops loaded.")
+    rooms.update(get_rooms())
+    print(len(rooms), "rooms loaded.")
+    zones.update(get_zones())
+    print(len(zones), "zones loaded.")
+
+
 def init_zones():
-    """Populate the zones and initialize inventories and door states. Set up shops."""
+    """Load the circle data, populate the zones and initialize inventories and door states. Set up shops."""
+    load_circle_data()
     print("Initializing zones.")
     num_shops = num_mobs = num_items = 0
     all_shopkeepers = set(shop.shopkeeper for shop in shops.values())
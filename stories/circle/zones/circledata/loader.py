@@ -0,0 +1,122 @@
+"""
+Load the CircleMUD data. Parsing all data files takes a while, so the parsed
+data is cached in a binary file in the user data directory. That cache is only
+used as long as the data files and the parsers themselves haven't changed
+(their names, sizes and modification times are stored in the cache file).
+When the data does have to be parsed, the files (one per zone) are parsed in parallel
+in a pool of worker processes, if there is enough data to make that worthwhile.
+"""
+
+import os
+import io
+import sys
+import pickle
+import multiprocessing
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None    # Python 2 without the 'futures' backport: the files are always parsed serially
+from . import parse_mob_files, parse_obj_files, parse_shp_files, parse_wld_files, parse_zon_files
+
+__all__ = ["load_data", "parse_data_files", "cache_name"]
+
+# the type of data file, its parser module, the name of the dict with the parsed data in it, and the parse function for one file
+datasets = [("mob", parse_mob_files, "mobs", parse_mob_files.parse_mobs),
+            ("obj", parse_obj_files, "objs", parse_obj_files.parse_file),
+            ("shp", parse_shp_files, "shops", parse_shp_files.parse_file),
+            ("wld", parse_wld_files, "rooms", parse_wld_files.parse_file),
+            ("zon", parse_zon_files, "zones", parse_zon_files.parse_file)]
+cache_name = "circledata-py%d.cache" % sys.version_info[0]
+basedir = os.path.dirname(os.path.abspath(__file__))
+parallel_threshold = 2 * 1024 * 1024    # total size of the data files from which on they're parsed in parallel
+
+
+def data_files():
+    """the data files, as (type, path) tuples"""
+    files = []
+    for kind, _, _, _ in datasets:
+        datadir = os.path.join(basedir, "world", kind)
+        files.extend((kind, os.path.join(datadir, name)) for name in sorted(os.listdir(datadir)) if name.endswith("." + kind))
+    return files
+
+
+def source_files():
+    """the data files and the source files of the parsers"""
+    return [path for _, path in data_files()] + [os.path.splitext(module.__file__)[0] + ".py" for _, module, _, _ in datasets]
+
+
+def cache_key():
+    """identifies the version of the data: the name, size and modification time of all source files"""
+    key = []
+    for path in source_files():
+        stat = os.stat(path)
+        key.append((os.path.relpath(path, basedir), stat.st_size, stat.st_mtime))
+    return key
+
+
+def load_data(user_resources=None):
+    """
+    Fill the mobs, objs, shops, rooms and zones dicts of the parser modules.
+    Uses the cache file in user_resources (the driver's user data vfs) if it is up to date,
+    otherwise the data files are parsed and the cache is written anew.
+    Returns True if the data came from the cache.
+    """
+    key = cache_key()
+    if user_resources:
+        try:
+            with io.BytesIO(user_resources[cache_name].data) as cache:
+                if pickle.load(cache) == key:
+                    for (_, module, name, _), parsed in zip(datasets, pickle.load(cache)):
+                        getattr(module, name).update(parsed)
+                    return True
+        except Exception:
+            pass    # there is no cache yet, or it is unreadable: parse the files instead
+    parse_data_files()
+    data = [getattr(module, name) for _, module, name, _ in datasets]
+    if user_resources:
+        try:
+            user_resources[cache_name] = pickle.dumps(key, pickle.HIGHEST_PROTOCOL) + pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+        except IOError:
+            pass    # the cache is optional
+    return False
+
+
+def parse_file(kind, path):
+    """Parse a single data file of the given type, returns a dict vnum -> parsed object. Called in the worker processes."""
+    parsed = {}
+    for dataset_kind, _, _, parse in datasets:
+        if dataset_kind == kind:
+            parse(path, parsed)
+    return parsed
+
+
+def parse_data_files(parallel=None):
+    """
+    Parse all data files and fill the mobs, objs, shops, rooms and zones dicts of the parser modules.
+    The files are independent of each other, so they are parsed in a pool of worker processes,
+    unless parallel is False. By default that is only done if the files are large enough to be worth
+    the overhead of the worker processes (and if they can be started at all).
+    Raises ValueError if a vnum occurs in more than one file.
+    """
+    files = data_files()
+    if parallel is None:
+        parallel = sum(os.path.getsize(path) for _, path in files) >= parallel_threshold and multiprocessing.cpu_count() > 1
+    results = None
+    if parallel and ProcessPoolExecutor:
+        try:
+            with ProcessPoolExecutor() as executor:
+                results = list(executor.map(parse_file, *zip(*files)))
+        except (OSError, RuntimeError):
+            pass    # no worker processes available, parse the files serially after all
+    if results is None:
+        results = [parse_file(kind, path) for kind, path in files]
+    merged = dict((kind, {}) for kind, _, _, _ in datasets)
+    origins = {}    # (type, vnum) -> file name
+    for (kind, path), parsed in zip(files, results):
+        for vnum in parsed:
+            if vnum in merged[kind]:
+                raise ValueError("%s vnum %d occurs in both %s and %s" % (kind, vnum, origins[kind, vnum], os.path.basename(path)))
+            origins[kind, vnum] = os.path.basename(path)
+        merged[kind].update(parsed)
+    for kind, module, name, _ in datasets:
+        getattr(module, name).update(merged[kind])
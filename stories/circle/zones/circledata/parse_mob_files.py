@@ -25,7 +25,7 @@ class Mob(object):
         return "<Mob #%d: %s>" % (self.vnum, self.shortdesc)
 
 
-def parse_mobs(mobFile):
+def parse_mobs(mobFile, mobs=mobs):
     with io.open(mobFile) as fp:
         content = [line.strip() for line in fp]
 
@@ -24,7 +24,7 @@ objs = {}
 extendedMobPat = re.compile('(.*?):(.*)')
 
 
-def parse_file(objFile):
+def parse_file(objFile, objs=objs):
     with io.open(objFile) as fp:
         content = [line.strip() for line in fp]
 
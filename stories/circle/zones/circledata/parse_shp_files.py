@@ -24,7 +24,7 @@ extendedMobPat = re.compile('(.*?):(.*)')
 shops = {}
 
 
-def parse_file(shpFile):
+def parse_file(shpFile, shops=shops):
     with io.open(shpFile) as fp:
         content = fp.readlines()
 
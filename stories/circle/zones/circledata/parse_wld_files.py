@@ -28,7 +28,7 @@ class Exit(object):
 rooms = {}
 
 
-def parse_file(wldFile):
+def parse_file(wldFile, rooms=rooms):
     with io.open(wldFile) as fp:
         content = [line.strip() for line in fp]
 
@@ -33,7 +33,7 @@ zones = {}
 extendedMobPat = re.compile('(.*?):(.*)')
 
 
-def parse_file(zonFile):
+def parse_file(zonFile, zones=zones):
     with io.open(zonFile) as fp:
         content = [line.strip() for line in fp]
 
@@ -13,19 +13,20 @@ from tale.base import heartbeat
 from tale.util import message_nearby_locations
 
 
-@heartbeat
+@heartbeat(interval=2)
 class VillageIdiot(NPC):
     def init(self):
-        self.beats_before_drool = 4
+        self.beats_before_drool = 2
 
     def heartbeat(self, ctx):
         # note: this village idiot NPC uses a heartbeat mechanism to drool at certain moments.
         # This is less efficient than using a deferred (as the town crier NPC does) because
-        # the driver has to call all heartbeats every tick even though they do nothing yet.
+        # the driver has to call the heartbeat even though it does nothing yet.
+        # The interval makes it beat only every other server tick, which is all it needs.
         # It's here for example sake.
         self.beats_before_drool -= 1
         if self.beats_before_drool <= 0:
-            self.beats_before_drool = random.randint(10, 20)
+            self.beats_before_drool = random.randint(5, 10)
             target = random.choice(list(self.location.livings))
             if target is self:
                 self.location.tell("%s drools on %sself." % (lang.capital(self.title), self.objective))
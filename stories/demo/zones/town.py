@@ -173,6 +173,9 @@ lane.add_exits([end_door])
 
 
 class Computer(Item):
+    handled_verbs = frozenset()   # just the custom verbs
+    notified_verbs = {"hello", "hi", "say", "yell"}
+
     def init(self):
         super(Computer, self).init()
         self.aliases = {"keyboard", "screen", "wires"}
@@ -41,6 +41,7 @@ from textwrap import dedent
 from collections import defaultdict
 import copy
 import sys
+import weakref
 from . import lang
 from . import util
 from . import pubsub
@@ -50,41 +51,250 @@ from . import races
 from .errors import ActionRefused, ParseError, LocationIntegrityError
 
 
-__all__ = ["MudObject", "Armour", 'Container', "Door", "Exit", "Item", "Living", "Stats", "Location", "Weapon", "Key", "heartbeat", "clone"]
+__all__ = ["MudObject", "Armour", 'Container', "Door", "Exit", "Item", "Living", "Stats", "Location", "Weapon", "Key", "heartbeat", "clone", "ALL_VERBS"]
 
 pending_actions = pubsub.topic("driver-pending-actions")
 pending_tells = pubsub.topic("driver-pending-tells")
 async_dialogs = pubsub.topic("driver-async-dialogs")
 
 
-def heartbeat(klass):
+def heartbeat(klass=None, interval=1, phase=None):
     """
     Decorator to use on a class to make it have a heartbeat.
+    Use it as @heartbeat to receive a heartbeat every server tick, or as @heartbeat(interval=N)
+    to receive it only once every N server ticks. The driver spreads the objects with the same interval
+    evenly over those ticks, unless you also give a fixed phase (0..N-1) of the tick to be called on.
     Use sparingly as it is less efficient than using a deferred, because the driver
-    has to call all heartbeats every tick even though they do nothing yet.
+    has to call all heartbeats even though they do nothing yet.
     With deferreds, the driver only calls a deferred at the time it is needed.
     """
-    klass._register_heartbeat = True
-    return klass
+    if interval < 1:
+        raise ValueError("heartbeat interval must be 1 or more")
+    if phase is not None and not 0 <= phase < interval:
+        raise ValueError("heartbeat phase must be in the range 0..interval-1")
+
+    def set_heartbeat(klass):
+        klass._register_heartbeat = True
+        klass.heartbeat_interval = interval
+        klass.heartbeat_phase = phase
+        return klass
+    if klass is None:
+        return set_heartbeat   # used with arguments: @heartbeat(interval=..)
+    return set_heartbeat(klass)
 
 
 def clone(obj):
-    """Create a copy of an existing (Mud)Object. Only when it has an empty inventory (to avoid problems)"""
+    """
+    Create a copy of an existing (Mud)Object. Only when it has an empty inventory (to avoid problems).
+    MudObjects are copied according to their clone protocol (see MudObject.clone_state), anything else is deep-copied.
+    The clone is in the same location as the original, but isn't yet part of its contents.
+    """
     if isinstance(obj, MudObject):
         try:
             if obj.inventory_size > 0:
                 raise ValueError("can't clone something that has other stuff in it")
-        except ActionRefused:
-            pass
-        if obj.location:
-            # avoid deepcopying the location
-            location, obj.location = obj.location, None
-            duplicate = copy.deepcopy(obj)
-            obj.location = duplicate.location = location
-            return duplicate
+        except (ActionRefused, AttributeError):
+            pass    # it can't contain anything (exits don't even have an inventory)
+        duplicate = obj.__class__.__new__(obj.__class__)
+        duplicate.__setstate__(obj.clone_state({id(obj): duplicate}))
+        if hasattr(obj, "location"):
+            duplicate.location = obj.location
+        return duplicate
     return copy.deepcopy(obj)
 
 
+_atomic_types = frozenset([type(None), bool, int, type(2**64), float, complex, str, bytes, type(""), util.FrozenDict])
+
+
+def _clone_value(value, memo):
+    """
+    A deep copy of the value, but without going through copy.deepcopy for the common cases:
+    immutable values and flat collections of immutable values.
+    """
+    cls = type(value)
+    if cls in _atomic_types:
+        return value
+    if cls in (tuple, frozenset):
+        if all(type(v) in _atomic_types for v in value):
+            return value
+    elif cls in (list, set):
+        if all(type(v) in _atomic_types for v in value):
+            return cls(value)
+    elif cls in (dict, VerbsDict):
+        if all(type(k) in _atomic_types and type(v) in _atomic_types for k, v in value.items()):
+            return cls(value)
+    return copy.deepcopy(value, memo)
+
+
+ALL_VERBS = "*"    # handled_verbs/notified_verbs wildcard: the object wants to be called for every verb
+_verb_interest_cache = {}   # (class, method name) -> verbs that the class' method wants to be called for
+
+
+def _verb_interest(obj, method_name):
+    """
+    The verbs that the handle_verb or notify_action method of the object wants to be called for,
+    a set of verbs or ALL_VERBS. Taken from the handled_verbs or notified_verbs attribute of the object;
+    handle_verb is also called for the custom verbs of the object (its verbs dict).
+    If that is not declared, it is every verb if the method has been overridden, and none otherwise.
+    """
+    declared = obj.handled_verbs if method_name == "handle_verb" else obj.notified_verbs
+    if declared is not None:
+        if method_name == "handle_verb" and obj._verbs and declared != ALL_VERBS:
+            return frozenset(declared).union(obj._verbs)
+        return declared
+    if method_name in getattr(obj, "__dict__", ()):
+        return ALL_VERBS
+    cls = obj.__class__
+    try:
+        return _verb_interest_cache[cls, method_name]
+    except KeyError:
+        implementor = next(c for c in cls.__mro__ if method_name in c.__dict__)
+        interest = frozenset() if implementor in (MudObject, Living) else ALL_VERBS
+        _verb_interest_cache[cls, method_name] = interest
+        return interest
+
+
+_slot_names_cache = {}
+
+
+def _slot_names(cls):
+    """the names of the slots of a class and its base classes, as they are stored (mangled for private names)"""
+    try:
+        return _slot_names_cache[cls]
+    except KeyError:
+        names = []
+        for klass in cls.__mro__:
+            slots = klass.__dict__.get("__slots__", ())
+            if isinstance(slots, util.basestring_type):
+                slots = (slots,)
+            for name in slots:
+                if name in ("__dict__", "__weakref__"):
+                    continue
+                if name.startswith("__") and not name.endswith("__"):
+                    name = "_%s%s" % (klass.__name__.lstrip("_"), name)
+                names.append(name)
+        _slot_names_cache[cls] = names
+        return names
+
+
+class VerbsDict(dict):
+    """
+    The custom verbs of an object (verb -> help text). A normal dict, except that every change
+    to any of them increases a global generation counter (also done when exits are bound).
+    The driver uses that to cache the custom verbs that are currently available to a player.
+    """
+    generation = 0
+
+    @staticmethod
+    def changed():
+        VerbsDict.generation += 1
+
+    def __setitem__(self, verb, helptext):
+        super(VerbsDict, self).__setitem__(verb, helptext)
+        VerbsDict.changed()
+
+    def __delitem__(self, verb):
+        super(VerbsDict, self).__delitem__(verb)
+        VerbsDict.changed()
+
+    def clear(self):
+        super(VerbsDict, self).clear()
+        VerbsDict.changed()
+
+    def pop(self, *args):
+        VerbsDict.changed()
+        return super(VerbsDict, self).pop(*args)
+
+    def popitem(self):
+        VerbsDict.changed()
+        return super(VerbsDict, self).popitem()
+
+    def setdefault(self, verb, helptext=None):
+        VerbsDict.changed()
+        return super(VerbsDict, self).setdefault(verb, helptext)
+
+    def update(self, *args, **kwargs):
+        super(VerbsDict, self).update(*args, **kwargs)
+        VerbsDict.changed()
+
+
+class AliasSet(set):
+    """
+    The aliases of an object. A normal set, except that every change to it
+    is reported to the object, so that the name index it is in stays up to date.
+    """
+    __slots__ = ("_owner",)
+
+    def __init__(self, aliases=(), owner=None):
+        super(AliasSet, self).__init__(aliases)
+        self._owner = weakref.ref(owner) if owner is not None else None
+
+    def __reduce__(self):
+        return AliasSet, (list(self),)   # the owner is not stored, it sets itself again when the object is loaded
+
+    def _changed(self):
+        owner = self._owner() if self._owner else None
+        if owner is not None:
+            owner._names_changed()
+
+    def add(self, alias):
+        super(AliasSet, self).add(alias)
+        self._changed()
+
+    def discard(self, alias):
+        super(AliasSet, self).discard(alias)
+        self._changed()
+
+    def remove(self, alias):
+        super(AliasSet, self).remove(alias)
+        self._changed()
+
+    def pop(self):
+        alias = super(AliasSet, self).pop()
+        self._changed()
+        return alias
+
+    def clear(self):
+        super(AliasSet, self).clear()
+        self._changed()
+
+    def update(self, *others):
+        super(AliasSet, self).update(*others)
+        self._changed()
+
+    def difference_update(self, *others):
+        super(AliasSet, self).difference_update(*others)
+        self._changed()
+
+    def intersection_update(self, *others):
+        super(AliasSet, self).intersection_update(*others)
+        self._changed()
+
+    def symmetric_difference_update(self, other):
+        super(AliasSet, self).symmetric_difference_update(other)
+        self._changed()
+
+    def __ior__(self, other):
+        super(AliasSet, self).__ior__(other)
+        self._changed()
+        return self
+
+    def __iand__(self, other):
+        super(AliasSet, self).__iand__(other)
+        self._changed()
+        return self
+
+    def __isub__(self, other):
+        super(AliasSet, self).__isub__(other)
+        self._changed()
+        return self
+
+    def __ixor__(self, other):
+        super(AliasSet, self).__ixor__(other)
+        self._changed()
+        return self
+
+
 class MudObject(object):
     """
     Root class of all objects in the mud world
@@ -101,11 +311,22 @@ class MudObject(object):
     includes the tantalizing sentence, ``The wall looks strange here.``
     Using extra descriptions, players could then see additional detail by typing
     ``look at wall.``  There can be an unlimited number of Extra Descriptions.
+
+    The base classes of the world objects store their attributes in __slots__ to keep them small,
+    because a story can easily have thousands of them. Subclasses that don't declare __slots__ themselves
+    get a normal instance dict, so you can still add any attribute you like in your own classes.
     """
+    __slots__ = ("name", "_title", "_aliases", "_verbs", "_description", "_short_description", "_extradesc", "__weakref__")
     subjective = "it"
     possessive = "its"
     objective = "it"
     gender = "n"
+    heartbeat_interval = 1      # heartbeat every N server ticks (see the @heartbeat decorator)
+    heartbeat_phase = None      # on what tick of the interval (None=let the driver choose)
+    handled_verbs = None        # verbs for which handle_verb is called besides the custom verbs: set of verbs, ALL_VERBS, or None=every verb if it is overridden
+    notified_verbs = None       # verbs for which notify_action is called, same as handled_verbs
+    clone_shared = frozenset()  # attributes that a clone shares with the original (see clone_state)
+    clone_shallow = frozenset()  # attributes that are copied shallowly into a clone (see clone_state)
 
     @property
     def title(self):
@@ -114,6 +335,33 @@ class MudObject(object):
     @title.setter
     def title(self, value):
         self._title = value
+        self._names_changed()
+
+    @property
+    def aliases(self):
+        if self._aliases is None:
+            self._aliases = AliasSet((), self)   # created when first used, like the custom verbs
+        return self._aliases
+
+    @aliases.setter
+    def aliases(self, value):
+        # a set is stored as an AliasSet that reports changes to it (other types, such as a list, are stored as they are,
+        # and the name index won't notice it when you change those in place)
+        if isinstance(value, (set, frozenset)) and value is not self._aliases:
+            value = AliasSet(value, self)
+        self._aliases = value
+        self._names_changed()
+
+    @property
+    def verbs(self):
+        if self._verbs is None:
+            self._verbs = VerbsDict()   # created when first used, most objects don't have custom verbs
+        return self._verbs
+
+    @verbs.setter
+    def verbs(self, value):
+        self._verbs = VerbsDict(value)
+        VerbsDict.changed()
 
     @property
     def description(self):
@@ -133,17 +381,20 @@ class MudObject(object):
 
     @property
     def extra_desc(self):
+        if self._extradesc is None:
+            self._extradesc = {}    # created when first used, most objects don't have extra descriptions
         return self._extradesc
 
     @extra_desc.setter
     def extra_desc(self, value):
+        # a util.FrozenDict can be shared between objects, add_extradesc copies it before changing it
         self._extradesc = value
 
     def __init__(self, name, title=None, description=None, short_description=None):
         self.name = self._description = self._title = self._short_description = None
+        self._aliases = None   # created when first used (see the aliases property)
+        self._verbs = None   # any custom verbs that need to be recognised (verb->docstring mapping. Verb handling is done via handle_verb() callbacks)
         self.init_names(name, title, description, short_description)
-        self.aliases = set()
-        self.verbs = {}   # any custom verbs that need to be recognised (verb->docstring mapping. Verb handling is done via handle_verb() callbacks)
         if getattr(self, "_register_heartbeat", False):
             # one way of setting this attribute is by using the @heartbeat decorator
             self.register_heartbeat()
@@ -165,17 +416,64 @@ class MudObject(object):
         self._title = title or name
         self._description = dedent(description).strip() if description else ""
         self._short_description = short_description
-        self._extradesc = {}   # maps keyword to description
+        self._extradesc = None   # maps keyword to description
+        self._names_changed()
+
+    def _names_changed(self):
+        """
+        Called when the name, title or aliases have changed,
+        to update the name index of the location or inventory that contains this object.
+        """
+        pass
+
+    def _update_name_index(self, obj):
+        """Called when the names of the object that we contain have changed."""
+        pass
 
     def add_extradesc(self, keywords, description):
         """For the list of keywords, add the extra description text"""
         assert isinstance(keywords, (set, tuple, list))
+        extra_desc = self.extra_desc
+        if isinstance(extra_desc, util.FrozenDict):
+            extra_desc = self._extradesc = extra_desc.copy()   # it is shared with other objects, copy it before changing it
         for keyword in keywords:
-            self._extradesc[keyword] = description
+            extra_desc[keyword] = description
 
     def __repr__(self):
         return "<%s '%s' @ 0x%x>" % (self.__class__.__name__, self.name, id(self))
 
+    def __getstate__(self):
+        # the attributes are in the slots, and in the instance dict of subclasses that don't declare slots
+        state = dict(getattr(self, "__dict__", {}))
+        for name in _slot_names(self.__class__):
+            if hasattr(self, name):
+                state[name] = getattr(self, name)
+        if isinstance(state.get("_aliases"), AliasSet):
+            state["_aliases"] = set(state["_aliases"])   # without the reference to us
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        if isinstance(state.get("_aliases"), set):
+            self._aliases = AliasSet(state["_aliases"], self)
+
+    def clone_state(self, memo):
+        """
+        The state (see __getstate__) for a clone of this object, used by clone().
+        The attributes named in clone_shared are shared with the clone, the ones in clone_shallow are
+        copied shallowly, and all other attributes are deep-copied. The memo is the copy.deepcopy memo dict.
+        Extend those sets in your subclass for attributes that refer to other world objects,
+        and override this method if an attribute needs something else still.
+        """
+        state = self.__getstate__()
+        for name, value in list(state.items()):
+            if name in self.clone_shallow:
+                state[name] = copy.copy(value)
+            elif name not in self.clone_shared:
+                state[name] = _clone_value(value, memo)
+        return state
+
     def destroy(self, ctx):
         """Common cleanup code that needs to be called when the object is destroyed"""
         assert isinstance(ctx, util.Context)
@@ -232,11 +530,17 @@ class MudObject(object):
         raise ActionRefused("There's nothing to read.")
 
     def handle_verb(self, parsed, actor):
-        """Handle a custom verb. Return True if handled, False if not handled."""
+        """
+        Handle a custom verb. Return True if handled, False if not handled.
+        Only called for the verbs in handled_verbs and the custom verbs (if you declare handled_verbs).
+        """
         return False
 
     def notify_action(self, parsed, actor):
-        """Notify the object of an action performed by someone. This can be any verb, command, soul emote, custom verb."""
+        """
+        Notify the object of an action performed by someone. This can be any verb, command, soul emote, custom verb.
+        Only called for the verbs in notified_verbs (if you declare it).
+        """
         pass
 
 
@@ -248,6 +552,9 @@ class Item(MudObject):
     Regular items cannot contain other things, so it makes to sense
     to check containment.
     """
+    __slots__ = ("contained_in", "default_verb", "value", "rent", "weight")
+    clone_shared = frozenset(["contained_in"])
+
     def init(self):
         self.contained_in = None
         self.default_verb = "examine"
@@ -258,6 +565,11 @@ class Item(MudObject):
     def __contains__(self, item):
         raise ActionRefused("You can't look inside of that.")
 
+    def _names_changed(self):
+        container = getattr(self, "contained_in", None)
+        if container:
+            container._update_name_index(self)
+
     @property
     def location(self):
         if not self.contained_in:
@@ -358,14 +670,14 @@ class Weapon(Item):
     An item that can be wielded by a Living (i.e. present in a weapon itemslot),
     and that can be used to attack another Living.
     """
-    pass
+    __slots__ = ()
 
 
 class Armour(Item):
     """
     An item that can be worn by a Living (i.e. present in an armour itemslot)
     """
-    pass
+    __slots__ = ()
 
 
 class Location(MudObject):
@@ -374,22 +686,86 @@ class Location(MudObject):
     Has connections ('exits') to other Locations.
     You can test for containment with 'in': item in loc, npc in loc
     """
+    exits_version = 0    # increased whenever the exits change (see exits_changed)
+
     def __init__(self, name, description=None):
         super(Location, self).__init__(name, description=description)
         self.name = name      # make sure we preserve the case; base object stores it lowercase
+        self.exits = {}       # dictionary of all exits: exit_direction -> Exit object with target & descr
+        self.exits_version = 0
+        self._multiword_exits = (0, util.TokenTrie())   # (exits version, trie of the exit names with spaces)
+        self._verb_subscribers = (0, {})   # (VerbsDict generation, (method name, verb) -> objects to call)
         self.livings = set()  # set of livings in this location
         self.items = set()    # set of all items in the room
-        self.exits = {}       # dictionary of all exits: exit_direction -> Exit object with target & descr
+
+    @property
+    def livings(self):
+        return self._livings
+
+    @livings.setter
+    def livings(self, livings):
+        # replace all livings at once; it is better to use insert/remove, that keeps the name index up to date incrementally
+        self._livings = livings
+        self.livings_index = util.NameIndex(self._livings)
+        self.verb_interest_changed()
+
+    @property
+    def items(self):
+        return self._items
+
+    @items.setter
+    def items(self, items):
+        # replace all items at once; it is better to use insert/remove, that keeps the name index up to date incrementally
+        self._items = items
+        self.items_index = util.NameIndex(self._items)
+        self.verb_interest_changed()
 
     def __contains__(self, obj):
-        return obj in self.livings or obj in self.items
+        return obj in self._livings or obj in self._items
+
+    def _update_name_index(self, obj):
+        if obj in self._livings:
+            self.livings_index.add(obj)
+        elif obj in self._items:
+            self.items_index.add(obj)
 
     def __getstate__(self):
-        state = dict(self.__dict__)
+        state = super(Location, self).__getstate__()
+        state["_verb_subscribers"] = (0, {})
         return state
 
-    def __setstate__(self, state):
-        self.__dict__ = state
+    def verb_interest_changed(self):
+        """
+        Forget which objects in this location are interested in what verbs.
+        Happens automatically when the contents, the exits or any custom verbs change, call it yourself when
+        you change the handled_verbs or notified_verbs of an object that is already in this location.
+        """
+        self._verb_subscribers = (VerbsDict.generation, {})
+
+    def _verb_subscribers_for(self, method_name, verb):
+        """
+        The objects whose handle_verb or notify_action method should be called for the verb:
+        the livings (followed by their inventory items), the items, and the exits. Cached per verb.
+        """
+        if self._verb_subscribers[0] != VerbsDict.generation:
+            self.verb_interest_changed()   # exits or custom verbs have been changed
+        subscribers = self._verb_subscribers[1]
+        try:
+            return subscribers[method_name, verb]
+        except KeyError:
+            result = []
+            for living in self._livings:
+                result.append(living)
+                result.extend(living.inventory)
+            result.extend(self._items)
+            result.extend(set(self.exits.values()))
+            result = subscribers[method_name, verb] = tuple(obj for obj in result if self.__interested(obj, method_name, verb))
+            return result
+
+    @staticmethod
+    def __interested(obj, method_name, verb):
+        interest = _verb_interest(obj, method_name)
+        return interest == ALL_VERBS or verb in interest
 
     def init_inventory(self, objects):
         """Set the location's initial item and livings 'inventory'"""
@@ -403,9 +779,28 @@ class Location(MudObject):
         for living in self.livings:
             if living.location is self:
                 living.location = _limbo
-        self.livings.clear()
-        self.items.clear()
+        self.livings = set()
+        self.items = set()
         self.exits.clear()
+        self.exits_changed()
+
+    def exits_changed(self):
+        """
+        Call this when you changed the exits dict yourself. Exit.bind does it for you.
+        It invalidates what is cached about the exits, and the custom verbs available in the location.
+        """
+        self.exits_version += 1
+        VerbsDict.changed()
+
+    def match_exit(self, words, index):
+        """
+        Find the exit with the longest name (that may consist of multiple words) at words[index].
+        Returns (exit, name, wordcount) or (None, None, 0) if there's no such exit.
+        """
+        if self._multiword_exits[0] != self.exits_version:
+            # exits have been changed (this happens only a few times, usually when the world is built)
+            self._multiword_exits = (self.exits_version, util.TokenTrie(name for name in self.exits if " " in name))
+        return self._multiword_exits[1].match_object(words, index, self.exits.get)
 
     def add_exits(self, exits):
         """Adds every exit from the sequence as an exit to this room."""
@@ -415,8 +810,8 @@ class Location(MudObject):
             # the exit may have aliases defined that it wants to be known as also.
 
     def get_wiretap(self):
-        """get a wiretap for this location"""
-        return pubsub.topic(("wiretap-location", self.name))
+        """get a wiretap for this location (it is created on demand)"""
+        return pubsub.topic(("wiretap-location", self.name), idle_expiry=30)
 
     def tell(self, room_msg, exclude_living=None, specific_targets=None, specific_target_msg=""):
         """
@@ -436,7 +831,7 @@ class Location(MudObject):
                 living.tell(specific_target_msg)
             else:
                 living.tell(room_msg)
-        if room_msg:
+        if room_msg and pubsub.has_subscribers(("wiretap-location", self.name)):
             tap = self.get_wiretap()
             tap.send((self.name, room_msg))
 
@@ -500,57 +895,50 @@ class Location(MudObject):
     def search_living(self, name):
         """
         Search for a living in this location by its name (and title, if no names match).
-        Is alias-aware. If there's more than one match, returns the first.
+        Is alias-aware. If there's more than one match, returns one of them.
         """
-        name = name.lower()
-        result = [living for living in self.livings if living.name == name]
-        if not result:
-            # try titles and aliases
-            result = [living for living in self.livings if name in living.aliases or living.title.lower() == name]
-        return result[0] if result else None
+        return self.livings_index.search(name)
 
     def insert(self, obj, actor):
         """Add obj to the contents of the location (either a Living or an Item)"""
         if isinstance(obj, Living):
-            self.livings.add(obj)
+            self._livings.add(obj)
+            self.livings_index.add(obj)
         elif isinstance(obj, Item):
-            self.items.add(obj)
+            self._items.add(obj)
+            self.items_index.add(obj)
         else:
             raise TypeError("can only add Living or Item")
         obj.location = self
+        self.verb_interest_changed()
 
     def remove(self, obj, actor):
         """Remove obj from this location (either a Living or an Item)"""
-        if obj in self.livings:
-            self.livings.remove(obj)
-        elif obj in self.items:
-            self.items.remove(obj)
+        if obj in self._livings:
+            self._livings.remove(obj)
+            self.livings_index.discard(obj)
+        elif obj in self._items:
+            self._items.remove(obj)
+            self.items_index.discard(obj)
         else:
             return   # just ignore an object that wasn't present in the first place
         obj.location = None
+        self.verb_interest_changed()
 
     def handle_verb(self, parsed, actor):
         """Handle a custom verb. Return True if handled, False if not handled."""
         # this code cannot deal with yields directly but you can raise AsyncDialog exception,
         # that indicates to the driver that it should initiate the given async dialog when continuing.
-        handled = any(living._handle_verb_base(parsed, actor) for living in self.livings)
-        if not handled:
-            handled = any(item.handle_verb(parsed, actor) for item in self.items)
-            if not handled:
-                handled = any(exit.handle_verb(parsed, actor) for exit in set(self.exits.values()))
-        return handled
+        # only the objects that declared an interest in the verb are asked to handle it.
+        return any(obj.handle_verb(parsed, actor) for obj in self._verb_subscribers_for("handle_verb", parsed.verb))
 
     def notify_action(self, parsed, actor):
         """Notify the room, its livings and items of an action performed by someone."""
         # Notice that this notification event is invoked by the driver after all
         # actions concerning player input have been handled, so we don't have to
-        # queue the delegated calls.
-        for living in self.livings:
-            living._notify_action_base(parsed, actor)
-        for item in self.items:
-            item.notify_action(parsed, actor)
-        for exit in set(self.exits.values()):
-            exit.notify_action(parsed, actor)
+        # queue the delegated calls. Only the objects interested in the verb are notified.
+        for obj in self._verb_subscribers_for("notify_action", parsed.verb):
+            obj.notify_action(parsed, actor)
 
     def notify_npc_arrived(self, npc, previous_location):
         """a NPC has arrived in this location."""
@@ -588,6 +976,9 @@ class Exit(MudObject):
     The exit's direction is stored as its name attribute (if more than one, the rest are aliases).
     Note that the exit's origin is not stored in the exit object.
     """
+    __slots__ = ("target", "bound")
+    clone_shared = frozenset(["target"])
+
     def __init__(self, directions, target_location, short_description, long_description=None):
         assert isinstance(target_location, (Location, util.basestring_type)), "target must be a Location or a string"
         if isinstance(directions, util.basestring_type):
@@ -621,6 +1012,7 @@ class Exit(MudObject):
             if direction in location.exits:
                 raise LocationIntegrityError("exit already exists: '%s' in %s" % (direction, location), direction, self, location)
             location.exits[direction] = self
+        location.exits_changed()   # also makes the exit's verbs available in the location
 
     def _bind_target(self, game_zones_module):
         """
@@ -666,6 +1058,9 @@ class Exit(MudObject):
 
 
 class Stats(object):
+    __slots__ = ("level", "xp", "hp", "maxhp_dice", "ac", "attack_dice", "agi", "cha", "int", "lck", "spd", "sta", "str", "wis",
+                 "stat_prios", "alignment", "bodytype", "language", "weight", "size", "race")
+
     def __init__(self):
         self.level = 0
         self.xp = 0
@@ -690,7 +1085,9 @@ class Stats(object):
         self.race = None    # optional, can use the stats template from races
 
     def __repr__(self):
-        return "<Stats: %s>" % vars(self)
+        return "<Stats: %s>" % dict((name, getattr(self, name)) for name in Stats.__slots__)
+
+    _stat_prios = {}    # race -> stat_prios, shared by all stats of that race
 
     @classmethod
     def from_race(cls, race):
@@ -710,9 +1107,13 @@ class Stats(object):
         s.sta = rs["sta"][0]
         s.str = rs["str"][0]
         s.wis = rs["wis"][0]
-        s.stat_prios = defaultdict(list)
-        for stat, (_, prio) in r["stats"].items():
-            s.stat_prios[prio].append(stat)
+        try:
+            s.stat_prios = Stats._stat_prios[race]
+        except KeyError:
+            stat_prios = defaultdict(list)
+            for stat, (_, prio) in r["stats"].items():
+                stat_prios[prio].append(stat)
+            s.stat_prios = Stats._stat_prios[race] = util.FrozenDict((prio, tuple(stats)) for prio, stats in stat_prios.items())
         #@todo xp, hp, maxhp, ac, attack, alignment, level
         return s
 
@@ -724,6 +1125,9 @@ class Living(MudObject):
     They are always inside a Location (Limbo when not specified yet).
     They also have an inventory object, and you can test for containment with item in living.
     """
+    clone_shared = frozenset(["location", "_previous_parsed", "inventory_index"])
+    clone_shallow = frozenset(["soul", "stats"])
+
     def __init__(self, name, gender, race=None, title=None, description=None, short_description=None):
         self.init_gender(gender)
         self.soul = soul.Soul()
@@ -737,6 +1141,7 @@ class Living(MudObject):
             self.stats = Stats()
         self.default_verb = "examine"
         self.__inventory = set()
+        self.inventory_index = util.NameIndex()
         self.previous_commandline = None
         self._previous_parsed = None
         super(Living, self).__init__(name, title, description, short_description)
@@ -754,16 +1159,18 @@ class Living(MudObject):
         for item in items:
             self.insert(item, self)
 
-    def __getstate__(self):
-        state = dict(self.__dict__)
-        return state
-
-    def __setstate__(self, state):
-        self.__dict__ = state
-
     def __contains__(self, item):
         return item in self.__inventory
 
+    def _names_changed(self):
+        location = getattr(self, "location", None)
+        if location:
+            location._update_name_index(self)
+
+    def _update_name_index(self, item):
+        if item in self.__inventory:
+            self.inventory_index.add(item)
+
     @property
     def inventory_size(self):
         return len(self.__inventory)
@@ -777,7 +1184,10 @@ class Living(MudObject):
         if actor is self or actor is not None and "wizard" in actor.privileges:
             assert isinstance(item, Item)
             self.__inventory.add(item)
+            self.inventory_index.add(item)
             item.contained_in = self
+            if self.location:
+                self.location.verb_interest_changed()   # our items are also called by the location
         else:
             raise ActionRefused("You can't do that.")
 
@@ -785,21 +1195,30 @@ class Living(MudObject):
         """remove an item from the inventory"""
         if actor is self or actor is not None and "wizard" in actor.privileges:
             self.__inventory.remove(item)
+            self.inventory_index.discard(item)
             item.contained_in = None
+            if self.location:
+                self.location.verb_interest_changed()
         else:
             raise ActionRefused("You can't take %s from %s." % (item.title, self.title))
 
     def destroy(self, ctx):
         super(Living, self).destroy(ctx)
         if self.location and self in self.location.livings:
-            self.location.livings.remove(self)
+            self.location.remove(self, None)
         self.location = None
         for item in self.__inventory:
             item.destroy(ctx)
         self.__inventory.clear()
+        self.inventory_index.clear()
         # @todo: remove attack status, etc.
         self.soul = None   # truly die ;-)
 
+    def clone_state(self, memo):
+        state = super(Living, self).clone_state(memo)
+        state["inventory_index"] = util.NameIndex()   # clones start with an empty inventory
+        return state
+
     @util.authorized("wizard")
     def wiz_clone(self, actor):
         duplicate = clone(self)
@@ -829,8 +1248,8 @@ class Living(MudObject):
             actor.tell("Money in possession: %s." % ctx.driver.moneyfmt.display(self.money))
 
     def get_wiretap(self):
-        """get a wiretap for this living"""
-        return pubsub.topic(("wiretap-living", self.name))
+        """get a wiretap for this living (it is created on demand)"""
+        return pubsub.topic(("wiretap-living", self.name), idle_expiry=30)
 
     def tell(self, *messages, **kwargs):
         """
@@ -841,6 +1260,8 @@ class Living(MudObject):
         to parse the string again to figure out what happened...
         kwargs is ignored for Livings.
         """
+        if not pubsub.has_subscribers(("wiretap-living", self.name)):
+            return   # nobody is wiretapping us, skip the work
         if sys.version_info < (3, 0):
             msg = u" ".join(unicode(msg) for msg in messages)
         else:
@@ -887,7 +1308,7 @@ class Living(MudObject):
 
     def validate_socialize_targets(self, parsed):
         """check if any of the targeted objects is an exit"""
-        if any(isinstance(w, Exit) for w in parsed.who_info):
+        if any(isinstance(w, Exit) for w in parsed.who_order):
             raise ParseError("That doesn't make much sense.")
 
     def remember_parsed(self):
@@ -933,7 +1354,7 @@ class Living(MudObject):
         try:
             if parsed.qualifier:
                 raise ParseError("That action doesn't support qualifiers.")  # for now, qualifiers are only supported on soul-verbs (emotes).
-            custom_verbs = set(ctx.driver.current_custom_verbs(self))
+            custom_verbs = ctx.driver.current_custom_verbs(self)
             if parsed.verb in custom_verbs:
                 if self.location.handle_verb(parsed, self):       # note: can't deal with async dialogs
                     pending_actions.send(lambda actor=self: actor.location.notify_action(parsed, actor))
@@ -1008,10 +1429,10 @@ class Living(MudObject):
         found = containing_object = None
         if include_inventory:
             containing_object = self
-            found = util.search_item(name, self.__inventory)
+            found = util.search_item(name, self.inventory_index)
         if not found and include_location:
             containing_object = self.location
-            found = util.search_item(name, self.location.items)
+            found = util.search_item(name, self.location.items_index)
         if not found and include_containers_in_inventory:
             # check if an item in the inventory might contain it
             for container in self.__inventory:
@@ -1035,30 +1456,10 @@ class Living(MudObject):
         """Do we accept money? Raise ActionRefused if not."""
         raise ActionRefused("You can't do that.")
 
-    def _handle_verb_base(self, parsed, actor):
-        """
-        Handle a custom verb. Return True if handled, False if not handled.
-        Also checks inventory items. (Don't override this in a subclass,
-        override handle_verb instead)
-        """
-        if self.handle_verb(parsed, actor):
-            return True
-        return any(item.handle_verb(parsed, actor) for item in self.__inventory)
-
     def handle_verb(self, parsed, actor):
         """Handle a custom verb. Return True if handled, False if not handled."""
         return False
 
-    def _notify_action_base(self, parsed, actor):
-        """
-        Notify the living of an action performed by someone.
-        Also calls inventory items. Don't override this one in a subclass,
-        override notify_action instead.
-        """
-        self.notify_action(parsed, actor)
-        for item in self.__inventory:
-            item.notify_action(parsed, actor)
-
     def notify_action(self, parsed, actor):
         """Notify the living of an action performed by someone."""
         pass
@@ -1118,6 +1519,9 @@ class Door(Exit):
     """
     A special exit that connects one location to another but which can be closed or even locked.
     """
+    __slots__ = ("locked", "opened", "__description_prefix", "key_code", "linked_door")
+    clone_shared = Exit.clone_shared | {"linked_door"}
+
     def __init__(self, directions, target_location, short_description, long_description=None, locked=False, opened=True):
         self.locked = locked
         self.opened = opened
@@ -1262,6 +1666,8 @@ class Door(Exit):
 
 class Key(Item):
     """A key which has a unique code. It can be used to open the matching Door."""
+    __slots__ = ("key_code",)
+
     def init(self):
         super(Key, self).init()
         self.key_code = None
@@ -732,7 +732,7 @@ def do_stats(player, parsed, ctx):
     if target.aggressive:
         player.tell("%s seems to be aggressive." % lang.capital(target.subjective))
     player.tell("\n")
-    player.tell("Stats: agi={agi} cha={cha} int={int} lck={lck} spd={spd} sta={sta} str={str} wis={wis}".format(**vars(target.stats)))
+    player.tell("Stats: agi={0.agi} cha={0.cha} int={0.int} lck={0.lck} spd={0.spd} sta={0.sta} str={0.str} wis={0.wis}".format(target.stats))
 
 
 @cmd("tell")
@@ -980,8 +980,7 @@ def do_what(player, parsed, ctx):
     # is it a soul verb?
     if name in soul.VERBS:
         found = True
-        parsed = soul.ParseResult(name)
-        parsed.who_order = [player]
+        parsed = soul.ParseResult(name, who_order=[player])
         _, playermessage, roommessage, _ = player.soul.process_verb_parsed(player, parsed)
         p("It is a soul emote you can do. <dim>%s: %s</>" % (name, playermessage))
         if name in soul.AGGRESSIVE_VERBS:
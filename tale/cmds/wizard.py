@@ -9,6 +9,7 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 from __future__ import absolute_import, print_function, division, unicode_literals
 import datetime
 import inspect
+import json
 import functools
 import sys
 import gc
@@ -16,7 +17,7 @@ import platform
 from .decorators import disabled_in_gamemode
 from ..errors import SecurityViolation, ParseError, ActionRefused
 from ..player import Player
-from ..soul import NonSoulVerb
+from ..soul import NonSoulVerb, Soul
 from .. import base, lang, util, pubsub, __version__
 
 all_commands = {}
@@ -377,7 +378,7 @@ def do_debug(player, parsed, ctx):
     else:
         raise ActionRefused("Can't find %s." % name)
     txt = ["<bright>%r</>" % obj, "Class defined in: " + inspect.getfile(obj.__class__)]
-    for varname, value in sorted(vars(obj).items()):
+    for varname, value in sorted(obj.__getstate__().items()):
         txt.append("<dim>.</>%s<dim>:</> %r" % (varname, value))
     if obj in ctx.driver.heartbeat_objects:
         txt.append("%s receives heartbeats." % obj.name)
@@ -447,6 +448,9 @@ def do_server(player, parsed, ctx):
         txt.append("Loop duration:  %.2f sec. (avg)" % avg_loop_duration)
     elif config.server_tick_method == "command":
         txt.append("Loop duration:  n/a (command driven)")
+    if Soul.parse_cache is not None:
+        cache = Soul.parse_cache
+        txt.append("Parse cache:    %d hits, %d misses (%.0f%%), %d entries" % (cache.hits, cache.misses, cache.hit_rate * 100, len(cache.entries)))
     player.tell(*txt, format=False)
 
 
@@ -472,18 +476,71 @@ def do_events(player, parsed, ctx):
 
 @wizcmd("pubsub")
 def do_pubsub(player, parsed, ctx):
-    """Give an overview of the pubsub topics."""
-    pending = pubsub.pending()
-    player.tell("<bright>Pending pubsub messages overview.</>", "Active topics (from %d total):" % len(pending))
-    total_pending = 0
-    txt = ["<ul>  topic                                            <dim>|</><ul>#pending<dim>|</><ul>idle sec.<dim>|</><ul>subs</>"]
-    for topic in sorted(pending, key=lambda t: str(t)):
-        num_pending, idle_time, subbers = pending[topic]
-        total_pending += num_pending
-        if num_pending or subbers or idle_time < 10:
-            txt.append("%-50.50s <dim>|</>  %3d   <dim>|</>  %4d   <dim>|</> %d" % (topic, num_pending, int(idle_time), subbers))
-    txt.append(("total pending:  " + str(total_pending)).rjust(56))
+    """Give an overview of the pending pubsub messages. Use 'pubsub -all' for an overview of all active topics."""
+    if parsed.args and parsed.args[0] == "-all":
+        pending = pubsub.pending()
+        player.tell("<bright>Pending pubsub messages overview.</>", "Active topics (from %d total):" % len(pending))
+        total_pending = 0
+        txt = ["<ul>  topic                                            <dim>|</><ul>#pending<dim>|</><ul>idle sec.<dim>|</><ul>subs</>"]
+        for topic in sorted(pending, key=lambda t: str(t)):
+            num_pending, idle_time, subbers = pending[topic]
+            total_pending += num_pending
+            if num_pending or subbers or idle_time < 10:
+                txt.append("%-50.50s <dim>|</>  %3d   <dim>|</>  %4d   <dim>|</> %d" % (topic, num_pending, int(idle_time), subbers))
+        txt.append(("total pending:  " + str(total_pending)).rjust(56))
+        txt.append("")
+        player.tell(*txt, format=False)
+        return
+    elif parsed.args:
+        raise ActionRefused("Unknown option, use -all.")
+    backlog = pubsub.backlog()
+    player.tell("<bright>Pending pubsub messages overview.</>", "Topics with pending messages (from %d total topics):" % len(pubsub.all_topics))
+    txt = ["<ul>  topic                                            <dim>|</><ul>#pending</>"]
+    for topic in sorted(backlog, key=lambda t: str(t)):
+        txt.append("%-50.50s <dim>|</>  %3d" % (topic, backlog[topic]))
+    txt.append(("total pending:  " + str(sum(backlog.values()))).rjust(56))
+    txt.append("")
+    player.tell(*txt, format=False)
+
+
+@wizcmd("perf")
+def do_perf(player, parsed, ctx):
+    """Show the performance statistics of the server tick phases, and the slowest deferreds and heartbeats.
+'perf -reset' clears the statistics, 'perf -json' exports them to a json file in the user data directory."""
+    profiler = ctx.driver.tick_profiler
+    arg = parsed.args[0] if parsed.args else None
+    cache = Soul.parse_cache
+    if arg == "-reset":
+        profiler.reset()
+        if cache is not None:
+            cache.reset_stats()
+        player.tell("Performance statistics have been reset.")
+        return
+    stats = profiler.stats()
+    if cache is not None:
+        stats["parse_cache"] = {"hits": cache.hits, "misses": cache.misses, "hit_rate": cache.hit_rate, "entries": len(cache.entries)}
+    if arg == "-json":
+        ctx.driver.user_resources["perf_stats.json"] = json.dumps(stats, indent=4, sort_keys=True).encode("UTF-8")
+        player.tell("Performance statistics written to 'perf_stats.json' in the user data directory.")
+        return
+    elif arg:
+        raise ActionRefused("Unknown option, use -reset or -json.")
+    player.tell("<bright>Server tick performance overview.</>", "Latencies in milliseconds, over the last %d calls of each phase:" % profiler.window, end=True)
+    txt = ["<ul>  phase          <dim>|</><ul>  count  <dim>|</><ul>   p50  <dim>|</><ul>   p95  <dim>|</><ul>   p99  <dim>|</><ul>   max  </>"]
+    for phase in profiler.phase_names:
+        p = stats["phases"][phase]
+        txt.append("%-16s<dim>|</> %7d <dim>|</> %6.2f <dim>|</> %6.2f <dim>|</> %6.2f <dim>|</> %6.2f" %
+                   (phase, p["count"], p["p50"] * 1000, p["p95"] * 1000, p["p99"] * 1000, p["max"] * 1000))
     txt.append("")
+    for title, calls in (("Slowest deferreds:", stats["slowest_deferreds"]), ("Slowest heartbeats:", stats["slowest_heartbeats"])):
+        txt.append(title)
+        txt.append("<ul>  max ms <dim>|</><ul>  avg ms <dim>|</><ul>  calls <dim>|</><ul> name                             </>")
+        for call in calls:
+            txt.append(" %7.2f <dim>|</> %7.2f <dim>|</> %6d <dim>|</> %s" % (call["max"] * 1000, call["avg"] * 1000, call["count"], call["name"]))
+        txt.append("")
+    if cache is not None:
+        txt.append("Parse cache: %d hits, %d misses, hit rate %.0f%%, %d of max %d entries." %
+                   (cache.hits, cache.misses, cache.hit_rate * 100, len(cache.entries), cache.size))
     player.tell(*txt, format=False)
 
 
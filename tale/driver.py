@@ -19,11 +19,12 @@ import pickle
 import inspect
 import threading
 import types
+import weakref
 import traceback
 import appdirs
-import distutils.version
 import pkgutil
 from . import mud_context, errors, util, soul, cmds, player, base, npc, pubsub, charbuilder, lang, races
+from .perf import TickProfiler, timer
 from . import __version__ as tale_version_str
 from .tio import vfs, DEFAULT_SCREEN_WIDTH, DEFAULT_SCREEN_DELAY
 from .base import Stats
@@ -40,17 +41,21 @@ class Driver(pubsub.Listener):
     Reads story file and config, initializes game state.
     Handles main game loop, player connections, and loading/saving of game state.
     """
+    idle_check_interval = 60   # seconds between validity checks of a player connection
+
     def __init__(self):
-        self.heartbeat_objects = set()
+        self.heartbeat_objects = HeartbeatScheduler()
         self.unbound_exits = []
-        self.deferreds = []  # heapq
-        self.deferreds_lock = threading.Lock()
+        self.deferreds = DeferredScheduler()
+        self.tick_profiler = TickProfiler()
         self.server_started = datetime.datetime.now().replace(microsecond=0)
         self.config = None
         self.server_loop_durations = collections.deque(maxlen=10)
         self.commands = Commands()
         cmds.register_all(self.commands)
+        self.__verbs_cache = weakref.WeakKeyDictionary()   # living -> (state, verbs) see __living_verbs
         self.all_players = {}   # maps playername to player connection object
+        self.idle_check_deadlines = []   # heapq of (deadline, id(conn), conn) when the connection must be checked for idleness
         self.zones = None
         self.moneyfmt = None
         self.resources = self.user_resources = None
@@ -58,6 +63,8 @@ class Driver(pubsub.Listener):
         self.game_clock = None
         self.__stop_mainloop = True
         self.waiting_for_input = {}   # maps playerconnection to tuple (dialog, validator, echo_input)
+        self._input_ready = threading.Condition()   # signaled when a player entered input (wakes up the mud main loop)
+        self._players_with_input = set()   # players that entered input that is not yet processed (guarded by _input_ready)
         topic_pending_actions.subscribe(self)
         topic_pending_tells.subscribe(self)
         topic_async_dialogs.subscribe(self)
@@ -76,6 +83,7 @@ class Driver(pubsub.Listener):
         parser.add_argument('-w', '--web', help='web browser interface', action='store_true')
         parser.add_argument('-v', '--verify', help='only verify the story files, dont run it', action='store_true')
         parser.add_argument('-z', '--wizard', help='force wizard mode on if story character (for debug purposes)', action='store_true')
+        parser.add_argument('-c', '--parse-cache', type=int, help='cache the parse results of up to this many commands (0=no cache)', default=0)
         args = parser.parse_args(command_line_args)
         try:
             self.__start(args)
@@ -110,6 +118,9 @@ class Driver(pubsub.Listener):
         self.config.server_mode = args.mode  # if/mud driver mode ('if' = single player interactive fiction, 'mud'=multiplayer)
         if self.config.server_mode != "if" and self.config.server_tick_method == "command":
             raise ValueError("'command' tick method can only be used in 'if' game mode")
+        if args.parse_cache < 0:
+            raise ValueError("invalid parse cache size")
+        soul.Soul.parse_cache = soul.ParseCache(args.parse_cache) if args.parse_cache else None
         # Register the driver and some other stuff in the global context.
         mud_context.driver = self
         mud_context.config = self.config
@@ -124,6 +135,7 @@ class Driver(pubsub.Listener):
                 story_cmds = __import__("cmds", level=0)
                 story_cmds.register_all(self.commands)
         self.commands.adjust_available_commands(self.config.server_mode)
+        import distutils.version   # only imported here, it takes a considerable amount of time to import
         tale_version = distutils.version.LooseVersion(tale_version_str)
         tale_version_required = distutils.version.LooseVersion(self.config.requires_tale)
         if tale_version < tale_version_required:
@@ -229,6 +241,7 @@ class Driver(pubsub.Listener):
         connection.player = new_player
         connection.io = io
         self.all_players[new_player.name] = connection
+        self.__schedule_idle_check(connection)
         new_player.output_line_delay = line_delay
         connection.clear_screen()
         self.__print_game_intro(connection)
@@ -242,6 +255,7 @@ class Driver(pubsub.Listener):
         from .tio.mud_browser_io import MudHttpIo
         connection.io = MudHttpIo(connection)
         self.all_players[new_player.name] = connection
+        self.__schedule_idle_check(connection)
         connection.clear_screen()
         self.__print_game_intro(connection)
         connection.output("\n")
@@ -404,6 +418,8 @@ class Driver(pubsub.Listener):
             conn.write_output()
             conn.destroy()
         self.all_players.clear()
+        with self._input_ready:
+            self._input_ready.notify_all()   # wake up the main loop if it is waiting for input
         time.sleep(0.1)
 
     def __continue_dialog(self, conn, dialog, message):
@@ -572,6 +588,7 @@ class Driver(pubsub.Listener):
                 raise ValueError("invalid tick method")
 
             loop_start = time.time()
+            input_start = timer()
             if has_input:
                 conn.need_new_input_prompt = True
                 try:
@@ -604,6 +621,8 @@ class Driver(pubsub.Listener):
                     conn.player.tell(txt, format=False)
             # sync pubsub events
             pubsub.sync("driver-pending-tells")
+            if has_input:
+                self.tick_profiler.phase_done("player input", input_start)
             # server TICK
             now = time.time()
             if now - previous_server_tick >= self.config.server_tick_time:
@@ -655,8 +674,9 @@ class Driver(pubsub.Listener):
         """
         The game loop, for the multiplayer MUD mode.
         Until the server is shut down, it processes player input, and prints the resulting output.
+        Instead of polling all connections, it blocks until either some player entered input
+        or the next server tick is due, and then only deals with the players that have input.
         """
-        loop_duration = 0
         previous_server_tick = 0
         while not self.__stop_mainloop:
             pubsub.sync("driver-async-dialogs")
@@ -665,48 +685,47 @@ class Driver(pubsub.Listener):
                 if conn not in self.waiting_for_input:
                     conn.write_input_prompt()
 
-            # server tick goes on a timer
-            wait_time = max(0.01, self.config.server_tick_time - loop_duration)
-            while wait_time > 0:
-                if any(conn.player.input_is_available.is_set() for conn in self.all_players.values()):
-                    # there was player input, abort the wait loop and deal with it
-                    break
-                sub_wait = min(0.1, wait_time)  # keep things responsive
-                time.sleep(sub_wait)
-                wait_time -= sub_wait
+            # server tick goes on a timer, wait until it is due or until there is player input
+            wait_time = max(0.01, previous_server_tick + self.config.server_tick_time - time.time())
+            players_with_input = self.__wait_for_player_input(wait_time)
 
             loop_start = time.time()
-            for conn in list(self.all_players.values()):
-                if conn.player.input_is_available.is_set():
-                    conn.need_new_input_prompt = True
-                    try:
-                        if conn in self.waiting_for_input:
-                            # this connection is processing direct input, rather than regular commands
-                            dialog, validator, echo_input = self.waiting_for_input.pop(conn)
-                            response = conn.player.get_pending_input()[0]
-                            if validator:
-                                try:
-                                    response = validator(response)
-                                except ValueError as x:
-                                    prompt = conn.last_output_line
-                                    conn.io.dont_echo_next_cmd = not echo_input
-                                    conn.output(str(x) or "That is not a valid answer.")
-                                    conn.output_no_newline(prompt)   # print the input prompt again
-                                    self.waiting_for_input[conn] = (dialog, validator, echo_input)   # reschedule
-                                    continue
-                            self.__continue_dialog(conn, dialog, response)
-                        else:
-                            # normal command processing
-                            self.__server_loop_process_player_input(conn)
-                    except (KeyboardInterrupt, EOFError):
-                        continue
-                    except errors.SessionExit:
-                        self.story.goodbye(conn.player)
-                        topic_pending_tells.send(lambda conn=conn: self._disconnect_mud_player(conn))
-                    except Exception:
-                        txt = "* internal error:\n" + traceback.format_exc()
-                        conn.player.tell(txt, format=False)
+            input_start = timer()
+            for p in players_with_input:
+                conn = self.all_players.get(p.name)
+                if not conn or conn.player is not p or not p.input_is_available.is_set():
+                    continue   # player is gone, or the input was already consumed elsewhere
+                conn.need_new_input_prompt = True
+                try:
+                    if conn in self.waiting_for_input:
+                        # this connection is processing direct input, rather than regular commands
+                        dialog, validator, echo_input = self.waiting_for_input.pop(conn)
+                        response = conn.player.get_pending_input()[0]
+                        if validator:
+                            try:
+                                response = validator(response)
+                            except ValueError as x:
+                                prompt = conn.last_output_line
+                                conn.io.dont_echo_next_cmd = not echo_input
+                                conn.output(str(x) or "That is not a valid answer.")
+                                conn.output_no_newline(prompt)   # print the input prompt again
+                                self.waiting_for_input[conn] = (dialog, validator, echo_input)   # reschedule
+                                continue
+                        self.__continue_dialog(conn, dialog, response)
+                    else:
+                        # normal command processing
+                        self.__server_loop_process_player_input(conn)
+                except (KeyboardInterrupt, EOFError):
+                    continue
+                except errors.SessionExit:
+                    self.story.goodbye(conn.player)
+                    topic_pending_tells.send(lambda conn=conn: self._disconnect_mud_player(conn))
+                except Exception:
+                    txt = "* internal error:\n" + traceback.format_exc()
+                    conn.player.tell(txt, format=False)
             pubsub.sync("driver-pending-tells")
+            if players_with_input:
+                self.tick_profiler.phase_done("player input", input_start)
             # server TICK
             now = time.time()
             if now - previous_server_tick >= self.config.server_tick_time:
@@ -715,6 +734,26 @@ class Driver(pubsub.Listener):
             loop_duration = time.time() - loop_start
             self.server_loop_durations.append(loop_duration)
 
+    def __wait_for_player_input(self, timeout):
+        """
+        Block until at least one player entered input, or until the timeout (seconds) expires.
+        Returns the set of players that have input waiting, and resets it.
+        """
+        with self._input_ready:
+            if not self._players_with_input:
+                self._input_ready.wait(timeout)
+            players, self._players_with_input = self._players_with_input, set()
+        return players
+
+    def notify_player_input(self, player):
+        """
+        Signal the driver that the player has entered input that needs processing.
+        This is usually called from another thread (the i/o or web server thread).
+        """
+        with self._input_ready:
+            self._players_with_input.add(player)
+            self._input_ready.notify()
+
     def __server_tick(self):
         """
         Do everything that the server needs to do every tick (timer configurable in story)
@@ -725,29 +764,62 @@ class Driver(pubsub.Listener):
         5) write buffered output
         6) verify validity and idle state of connected players
         7) remove idle wiretaps
+        Returns True if any output was written to the players.
         """
+        profiler = self.tick_profiler
+        tick_start = phase_start = timer()
         self.game_clock.add_realtime(datetime.timedelta(seconds=self.config.server_tick_time))
         ctx = util.Context(self, self.game_clock, self.config, None)
-        for obj in self.heartbeat_objects:
+        for obj in self.heartbeat_objects.next_tick():
             obj.heartbeat(ctx)
-        while self.deferreds:
-            deferred = None
-            with self.deferreds_lock:
-                if self.deferreds:
-                    deferred = self.deferreds[0]
-                    if deferred.due <= self.game_clock.clock:
-                        deferred = heapq.heappop(self.deferreds)
-                    else:
-                        deferred = None
-                        break
-            if deferred:
-                # calling the deferred needs to be outside the lock because it can reschedule a new deferred
+            phase_start = profiler.heartbeat_done(obj, phase_start)
+        phase_start = profiler.phase_done("heartbeats", tick_start)
+        while True:
+            # calling the deferreds is done outside of the scheduler's lock because they can schedule new deferreds
+            # (these may already be due as well, so we keep going until nothing is due anymore)
+            due_deferreds = self.deferreds.pop_due(self.game_clock.clock)
+            if not due_deferreds:
+                break
+            for deferred in due_deferreds:
+                call_start = timer()
+                key = profiler.deferred_key(deferred)   # before the call, it clears the deferred
                 try:
                     deferred(ctx=ctx)  # call the deferred and provide a context object
                 except Exception:
                     self.__report_deferred_exception(deferred)
+                profiler.deferred_done(key, call_start)
+        phase_start = profiler.phase_done("deferreds", phase_start)
         pubsub.sync()
-        for name, conn in list(self.all_players.items()):
+        phase_start = profiler.phase_done("pubsub sync", phase_start)
+        self.__check_idle_players()
+        phase_start = profiler.phase_done("idle checks", phase_start)
+        had_output = False
+        for conn in list(self.all_players.values()):
+            had_output |= bool(conn.write_output())
+        phase_start = profiler.phase_done("output flush", phase_start)
+        # clean up idle wiretap topics
+        pubsub.expire_idle_topics()
+        profiler.phase_done("wiretap cleanup", phase_start)
+        profiler.phase_done("server tick", tick_start)
+        return had_output
+
+    def __schedule_idle_check(self, conn):
+        # The deadline is derived from the player's last input time, so any input simply pushes it back.
+        # The validity of the connection is also checked regularly, so the deadline is never too far away.
+        now = time.time()
+        deadline = now + self.idle_check_interval
+        if self.config and self.config.server_mode == "mud":
+            idle_limit = 3 * 60 * 60 if "wizard" in conn.player.privileges else 30 * 60
+            deadline = min(deadline, conn.player.last_input_time + idle_limit)
+        heapq.heappush(self.idle_check_deadlines, (max(deadline, now + 1), id(conn), conn))
+
+    def __check_idle_players(self):
+        """verify validity and idle state of the connected players whose check deadline has passed"""
+        now = time.time()
+        while self.idle_check_deadlines and self.idle_check_deadlines[0][0] <= now:
+            _, _, conn = heapq.heappop(self.idle_check_deadlines)
+            if conn not in self.all_players.values():
+                continue   # player has already left
             if conn.player and conn.io and conn.player.location:
                 idle_limit = 3 * 60 * 60 if "wizard" in conn.player.privileges else 30 * 60
                 if self.config.server_mode == "mud" and conn.idle_time > idle_limit:
@@ -757,17 +829,11 @@ class Driver(pubsub.Listener):
                     conn.player.tell("\n")
                     conn.player.tell_others("{Title} has been idling around for too long.")
                     self._disconnect_mud_player(conn)   # remove players who stay idle too long
-                conn.write_output()
+                else:
+                    self.__schedule_idle_check(conn)
             else:
                 # disconnect corrupt player connection
                 self._disconnect_mud_player(conn)
-        # clean up idle wiretap topics
-        topicinfo = pubsub.pending()
-        for topicname in topicinfo:
-            if isinstance(topicname, tuple) and topicname[0].startswith("wiretap-"):
-                events, idle_time, subbers = topicinfo[topicname]
-                if events == 0 and not subbers and idle_time > 30:
-                    pubsub.topic(topicname).destroy()
 
     def __report_deferred_exception(self, deferred):
         print("\n* Exception while executing deferred action {0}:".format(deferred), file=sys.stderr)
@@ -789,8 +855,7 @@ class Driver(pubsub.Listener):
         player = conn.player
         # We pass in all 'external verbs' (non-soul verbs) so it will do the
         # parsing for us even if it's a verb the soul doesn't recognise by itself.
-        command_verbs = self.commands.get(player.privileges)
-        custom_verbs = set(self.current_custom_verbs(player))
+        command_verbs, custom_verbs, all_verbs = self.__living_verbs(player)
         try:
             if _verb in self.commands.no_soul_parsing:
                 # don't use the soul to parse it further
@@ -798,7 +863,6 @@ class Driver(pubsub.Listener):
                 raise soul.NonSoulVerb(soul.ParseResult(_verb, unparsed=_rest.strip()))
             else:
                 # Parse the command by using the soul.
-                all_verbs = set(command_verbs) | custom_verbs
                 parsed = player.parse(cmd, external_verbs=all_verbs)
             # If parsing went without errors, it's a soul verb, handle it as a socialize action
             player.turns += 1
@@ -905,8 +969,14 @@ class Driver(pubsub.Listener):
             player = state["player"]
             self.all_players = {player.name: conn}
             self.deferreds = state["deferreds"]
+            if not isinstance(self.deferreds, DeferredScheduler):
+                # saved by an older version, that stored the deferreds in a plain (heapq) list
+                self.deferreds = DeferredScheduler(self.deferreds)
             self.game_clock = state["clock"]
             self.heartbeat_objects = state["heartbeats"]
+            if not isinstance(self.heartbeat_objects, HeartbeatScheduler):
+                # saved by an older version, that stored the heartbeat objects in a plain set
+                self.heartbeat_objects = HeartbeatScheduler(self.heartbeat_objects)
             self.config = state["config"]
             self.waiting_for_input = {}   # can't keep the old waiters around
             player.tell("\n")
@@ -917,18 +987,43 @@ class Driver(pubsub.Listener):
             return player
 
     def current_custom_verbs(self, player):
-        """returns dict of the currently recognised custom verbs (verb->helptext mapping)"""
+        """returns dict of the currently recognised custom verbs (verb->helptext mapping). Don't modify it."""
+        return self.__living_verbs(player)[1]
+
+    def verbs_by_prefix(self, player, prefix):
+        """returns the command verbs and custom verbs currently available to the player, that start with the prefix"""
+        verbs = self.commands.verbs_by_prefix(player.privileges, prefix)
+        verbs.extend(verb for verb in self.current_custom_verbs(player) if verb.startswith(prefix))
+        return verbs
+
+    def __living_verbs(self, player):
+        """
+        Returns a tuple (command verbs dict, custom verbs dict, set of all those verbs) for the player.
+        This is cached until the player moves somewhere else, something enters or leaves the location
+        or the player's inventory, the player's privileges change, or any custom verbs are changed.
+        """
+        location = player.location
+        privileges = frozenset(player.privileges)
+        state = (location, location.livings_index, location.livings_index.version, location.items_index,
+                 location.items_index.version, player.inventory_index, player.inventory_index.version,
+                 base.VerbsDict.generation, privileges, self.commands.version)
+        cached = self.__verbs_cache.get(player)
+        if cached and cached[0] == state:
+            return cached[1]
+        command_verbs = self.commands.get(privileges)
         verbs = player.verbs.copy()
-        verbs.update(player.location.verbs)
-        for living in player.location.livings:
+        verbs.update(location.verbs)
+        for living in location.livings:
             verbs.update(living.verbs)
         for item in player.inventory:
             verbs.update(item.verbs)
-        for item in player.location.items:
+        for item in location.items:
             verbs.update(item.verbs)
-        for exit in set(player.location.exits.values()):
+        for exit in set(location.exits.values()):
             verbs.update(exit.verbs)
-        return verbs
+        result = command_verbs, verbs, frozenset(command_verbs) | frozenset(verbs)
+        self.__verbs_cache[player] = (state, result)
+        return result
 
     def current_verbs(self, player):
         """return a dict of all currently recognised verbs, and their help text"""
@@ -964,8 +1059,9 @@ class Driver(pubsub.Listener):
 
     def do_wait(self, duration):
         # let time pass, duration is in game time (not real time).
-        # We do let the game tick for the correct number of times.
-        # @todo be able to detect if something happened during the wait
+        # We do let the game tick for the correct number of times, but the ticks in which
+        # no heartbeat and no deferred is due are skipped in one go by simply advancing the clock.
+        # The wait is interrupted as soon as something happened (the player received output).
         assert self.config.server_mode == "if"
         if self.config.gametime_to_realtime == 0:
             # game is running with a 'frozen' clock
@@ -976,9 +1072,42 @@ class Driver(pubsub.Listener):
         num_ticks = int(duration.seconds / self.config.gametime_to_realtime / self.config.server_tick_time)
         if num_ticks < 1:
             return False, "It's no use waiting such a short while."
-        for _ in range(num_ticks):
-            self.__server_tick()
-        return True, None     # wait was uneventful. (@todo return False if something happened)
+        for conn in self.all_players.values():
+            conn.write_output()     # so that only output produced during the wait is noticed
+        tick_gametime = datetime.timedelta(seconds=self.config.server_tick_time) * self.game_clock.times_realtime
+        start_clock = self.game_clock.clock
+        while num_ticks > 0:
+            skip = min(num_ticks, self.__idle_ticks(tick_gametime)) - 1
+            if skip > 0:
+                # nothing is due in these ticks, so only the clock and heartbeat phase have to advance
+                self.game_clock.add_gametime(tick_gametime * skip)
+                self.heartbeat_objects.skip_ticks(skip)
+                num_ticks -= skip
+            num_ticks -= 1
+            if self.__server_tick() and num_ticks > 0:
+                waited = self.game_clock.clock - start_clock
+                return False, "You stop waiting after %s, because something happened." % util.duration_display(waited)
+        return True, None     # wait was uneventful (or something happened right at the end of it)
+
+    def __idle_ticks(self, tick_gametime):
+        """
+        Returns the number of server ticks until (and including) the first tick in which
+        a heartbeat or a deferred is due. None are due in the ticks before that one.
+        """
+        ticks = self.heartbeat_objects.ticks_until_due()
+        ticks = sys.maxsize if ticks is None else ticks + 1
+        earliest = self.deferreds.earliest_due()
+        if earliest is not None:
+            # the deferred is due on the first tick that brings the clock at (or past) its due time
+            delta = earliest - self.game_clock.clock
+            if delta > datetime.timedelta():
+                deferred_ticks = int(delta.total_seconds() / tick_gametime.total_seconds())
+                while tick_gametime * deferred_ticks < delta:
+                    deferred_ticks += 1
+                ticks = min(ticks, deferred_ticks)
+            else:
+                ticks = 1
+        return ticks
 
     def do_save(self, player):
         if not self.config.savegames_enabled:
@@ -1029,8 +1158,7 @@ class Driver(pubsub.Listener):
             assert due >= 0.0
             due = self.game_clock.plus_realtime(datetime.timedelta(seconds=due))
         deferred = Deferred(due, action, vargs, kwargs)
-        with self.deferreds_lock:
-            heapq.heappush(self.deferreds, deferred)
+        self.deferreds.schedule(deferred)
 
     def pubsub_event(self, topicname, event):
         if topicname == "driver-pending-actions":
@@ -1049,9 +1177,7 @@ class Driver(pubsub.Listener):
             raise ValueError("unknown topic: " + topicname)
 
     def remove_deferreds(self, owner):
-        with self.deferreds_lock:
-            self.deferreds = [d for d in self.deferreds if d.owner is not owner]
-            heapq.heapify(self.deferreds)
+        self.deferreds.remove_owner(owner)
 
     @property
     def uptime(self):
@@ -1112,6 +1238,19 @@ class StoryConfig(object):
         return StoryConfig(**vars(config))
 
 
+_ctx_arg_cache = {}   # maps function object -> does it have a 'ctx' argument
+
+
+def _wants_ctx(func):
+    """does the callable have a 'ctx' argument? (cached per function, because inspecting it is slow)"""
+    func = getattr(func, "__func__", func)   # the cache is per function, not per bound method object
+    try:
+        return _ctx_arg_cache[func]
+    except KeyError:
+        wants_ctx = _ctx_arg_cache[func] = "ctx" in inspect.getargspec(func).args
+        return wants_ctx
+
+
 @total_ordering
 class Deferred(object):
     """
@@ -1119,7 +1258,11 @@ class Deferred(object):
     This object captures the action that must be invoked in a way that is serializable.
     That means that you can't pass all types of callables, there are a few that are not
     serializable (lambda's and scoped functions). They will trigger an error if you use those.
+    The actual callable is kept as well so it doesn't have to be looked up again when the deferred
+    is invoked, but it is not serialized. After loading, it is resolved from the owner and action name.
     """
+    _func = None    # the resolved callable (not serialized)
+
     def __init__(self, due, action, vargs, kwargs):
         assert due is None or isinstance(due, datetime.datetime)
         assert callable(action)
@@ -1141,6 +1284,12 @@ class Deferred(object):
         self.action = action.__name__    # store name instead of object, to make this serializable
         self.vargs = vargs
         self.kwargs = kwargs
+        self._func = action
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("_func", None)
+        return state
 
     def __eq__(self, other):
         return self.due == other.due and type(self.owner) == type(other.owner)\
@@ -1162,9 +1311,8 @@ class Deferred(object):
 
     def __call__(self, *args, **kwargs):
         self.kwargs = self.kwargs or {}
-        if callable(self.action):
-            func = self.action
-        else:
+        func = self._func
+        if func is None:
             # deferred action is stored as the name of the function to call,
             # so we need to obtain the actual function from the owner object.
             if isinstance(self.owner, util.basestring_type):
@@ -1174,7 +1322,7 @@ class Deferred(object):
                 else:
                     raise RuntimeError("invalid owner specifier: " + self.owner)
             func = getattr(self.owner, self.action)
-        if "ctx" in inspect.getargspec(func).args:
+        if _wants_ctx(func):
             self.kwargs["ctx"] = kwargs["ctx"]  # add a 'ctx' keyword argument to the call for convenience
         func(*self.vargs, **self.kwargs)
         # our lifetime has ended, remove references:
@@ -1182,6 +1330,197 @@ class Deferred(object):
         del self.action
         del self.kwargs
         del self.vargs
+        self._func = None
+
+
+class DeferredScheduler(object):
+    """
+    Bucketed scheduler ('timing wheel') for the Deferreds.
+    The deferreds are put in buckets per second of game time. Only the occupied buckets are kept
+    in a heap, so scheduling and popping due deferreds is cheap even with thousands of them pending.
+    It also keeps an index of the deferreds per owner object, so that removing all deferreds
+    of an owner (when it is destroyed) doesn't have to scan all of them; these are lazily
+    skipped when their bucket comes up.
+    It is serializable (as part of the saved game data); the buckets and index are rebuilt on load.
+    """
+    _epoch = datetime.datetime(1, 1, 1)
+
+    def __init__(self, deferreds=None):
+        self.__init_buckets()
+        for deferred in deferreds or []:
+            self.schedule(deferred)
+
+    def __init_buckets(self):
+        self.lock = threading.Lock()
+        self.buckets = {}    # maps bucket number to list of (owner key, deferred) entries
+        self.bucket_heap = []    # heapq of the bucket numbers that are in use
+        self.owners = {}     # maps owner key to dict of id(deferred)->deferred (all pending deferreds)
+        self.count = 0
+
+    def __getstate__(self):
+        return {"deferreds": sorted(self)}
+
+    def __setstate__(self, state):
+        self.__init_buckets()
+        for deferred in state["deferreds"]:
+            self.schedule(deferred)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """iterate over all pending deferreds (in no particular order)"""
+        with self.lock:
+            deferreds = [d for owned in self.owners.values() for d in owned.values()]
+        return iter(deferreds)
+
+    def __bucket(self, due):
+        delta = due - self._epoch
+        return delta.days * 86400 + delta.seconds
+
+    def schedule(self, deferred):
+        """add a deferred to the schedule"""
+        owner_key = id(deferred.owner)
+        bucket_nr = self.__bucket(deferred.due)
+        with self.lock:
+            bucket = self.buckets.get(bucket_nr)
+            if bucket is None:
+                bucket = self.buckets[bucket_nr] = []
+                heapq.heappush(self.bucket_heap, bucket_nr)
+            bucket.append((owner_key, deferred))
+            self.owners.setdefault(owner_key, {})[id(deferred)] = deferred
+            self.count += 1
+
+    def remove_owner(self, owner):
+        """remove all pending deferreds that belong to the given owner object"""
+        with self.lock:
+            owned = self.owners.pop(id(owner), None)
+            if owned:
+                self.count -= len(owned)
+
+    def pop_due(self, now):
+        """remove and return all deferreds that are due at the given (game) time, sorted on their due time"""
+        now_bucket = self.__bucket(now)
+        result = []
+        with self.lock:
+            while self.bucket_heap and self.bucket_heap[0] <= now_bucket:
+                bucket_nr = self.bucket_heap[0]
+                entries = self.buckets[bucket_nr]
+                if bucket_nr == now_bucket:
+                    # the current bucket may contain deferreds that are due a bit later
+                    not_due = [(owner_key, d) for owner_key, d in entries if d.due > now]
+                    if not_due:
+                        self.buckets[bucket_nr] = not_due
+                        entries = [(owner_key, d) for owner_key, d in entries if d.due <= now]
+                        self.__collect_pending(entries, result)
+                        break
+                heapq.heappop(self.bucket_heap)
+                del self.buckets[bucket_nr]
+                self.__collect_pending(entries, result)
+        result.sort()
+        return result
+
+    def earliest_due(self):
+        """
+        The due time of the first pending deferred, or None if there are none.
+        Deferreds of removed owners are only discarded lazily, so the actual first one may be later.
+        """
+        with self.lock:
+            if not self.bucket_heap:
+                return None
+            return min(d.due for owner_key, d in self.buckets[self.bucket_heap[0]])
+
+    def __collect_pending(self, entries, result):
+        # collect the entries that are still pending (not removed because of their owner), and forget about them
+        for owner_key, deferred in entries:
+            owned = self.owners.get(owner_key)
+            if owned and owned.pop(id(deferred), None) is deferred:
+                if not owned:
+                    del self.owners[owner_key]
+                self.count -= 1
+                result.append(deferred)
+
+
+class HeartbeatScheduler(object):
+    """
+    Keeps track of the objects that receive a heartbeat.
+    The objects are put in buckets by their heartbeat interval (in server ticks) and phase,
+    so that on every tick only the objects whose heartbeat is due have to be dealt with.
+    Objects without a fixed phase are put in the least occupied bucket of their interval,
+    to spread the heartbeats evenly over the ticks.
+    It is serializable (as part of the saved game data); the buckets are rebuilt on load.
+    """
+    def __init__(self, objects=None):
+        self.__init_buckets()
+        for obj in objects or []:
+            self.add(obj)
+
+    def __init_buckets(self):
+        self.tick = 0
+        self.buckets = {}   # maps interval to list (per phase) of sets of objects
+        self.phases = {}    # maps object to its (interval, phase)
+
+    def __getstate__(self):
+        return {"objects": list(self.phases)}
+
+    def __setstate__(self, state):
+        self.__init_buckets()
+        for obj in state["objects"]:
+            self.add(obj)
+
+    def __len__(self):
+        return len(self.phases)
+
+    def __iter__(self):
+        return iter(list(self.phases))
+
+    def __contains__(self, obj):
+        return obj in self.phases
+
+    def add(self, obj):
+        if obj in self.phases:
+            return
+        interval = obj.heartbeat_interval
+        buckets = self.buckets.get(interval)
+        if buckets is None:
+            buckets = self.buckets[interval] = [set() for _ in range(interval)]
+        phase = obj.heartbeat_phase
+        if phase is None:
+            phase = min(range(interval), key=lambda p: len(buckets[p]))
+        buckets[phase].add(obj)
+        self.phases[obj] = (interval, phase)
+
+    def discard(self, obj):
+        if obj in self.phases:
+            interval, phase = self.phases.pop(obj)
+            self.buckets[interval][phase].discard(obj)
+
+    def next_tick(self):
+        """advance to the next tick and return the objects whose heartbeat is due on it"""
+        tick = self.tick
+        self.tick += 1
+        due = []
+        for interval, buckets in self.buckets.items():
+            due.extend(buckets[tick % interval])
+        return due
+
+    def ticks_until_due(self):
+        """
+        The number of ticks that can be skipped before a heartbeat is due (0 means that there are
+        heartbeats due on the next tick), or None if there are no heartbeats at all.
+        """
+        result = None
+        for interval, buckets in self.buckets.items():
+            for phase, objects in enumerate(buckets):
+                if objects:
+                    ticks = (phase - self.tick) % interval
+                    if result is None or ticks < result:
+                        result = ticks
+        return result
+
+    def skip_ticks(self, ticks):
+        """advance the given number of ticks without returning the heartbeats that were due on them"""
+        self.tick += ticks
 
 
 class Commands(object):
@@ -1191,6 +1530,14 @@ class Commands(object):
     def __init__(self):
         self.commands_per_priv = {None: {}}
         self.no_soul_parsing = set()
+        self.version = 0    # increased whenever the commands change
+        self.__merged = {}  # frozenset of privileges -> all commands available with those privileges
+        self.__sorted_verbs = {}    # frozenset of privileges -> sorted list of the verbs of those commands
+
+    def __changed(self):
+        self.version += 1
+        self.__merged.clear()
+        self.__sorted_verbs.clear()
 
     def add(self, verb, func, privilege=None):
         self.validateFunc(func)
@@ -1198,12 +1545,14 @@ class Commands(object):
             if verb in commands:
                 raise ValueError("command defined more than once: " + verb)
         self.commands_per_priv.setdefault(privilege, {})[verb] = func
+        self.__changed()
 
     def override(self, verb, func, privilege=None):
         self.validateFunc(func)
         if verb in self.commands_per_priv[privilege]:
             existing = self.commands_per_priv[privilege][verb]
             self.commands_per_priv[privilege][verb] = func
+            self.__changed()
             return existing
         raise KeyError("command not defined: " + verb)
 
@@ -1212,12 +1561,25 @@ class Commands(object):
             raise ValueError("the function '%s' is not a proper command function (did you forget the decorator?)" % func.__name__)
 
     def get(self, privileges):
-        result = dict(self.commands_per_priv[None])  # always include the cmds for None
-        for priv in privileges:
-            if priv in self.commands_per_priv:
-                result.update(self.commands_per_priv[priv])
+        """Returns the dict of commands available with the given privileges. It is cached, don't modify it."""
+        privileges = frozenset(privileges)
+        result = self.__merged.get(privileges)
+        if result is None:
+            result = dict(self.commands_per_priv[None])  # always include the cmds for None
+            for priv in privileges:
+                if priv in self.commands_per_priv:
+                    result.update(self.commands_per_priv[priv])
+            self.__merged[privileges] = result
         return result
 
+    def verbs_by_prefix(self, privileges, prefix):
+        """Returns the sorted list of command verbs available with the given privileges, that start with the prefix."""
+        privileges = frozenset(privileges)
+        verbs = self.__sorted_verbs.get(privileges)
+        if verbs is None:
+            verbs = self.__sorted_verbs[privileges] = sorted(self.get(privileges))
+        return util.words_by_prefix(verbs, prefix)
+
     def adjust_available_commands(self, server_mode):
         # disable commands flagged with the given game_mode
         # disable soul verbs flagged with override
@@ -1231,6 +1593,8 @@ class Commands(object):
                     del soul.VERBS[cmd]
                 if getattr(func, "no_soul_parse", False):
                     self.no_soul_parsing.add(cmd)
+        soul.verbs_changed()
+        self.__changed()
 
 
 @base.heartbeat
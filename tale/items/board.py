@@ -17,6 +17,8 @@ __all__ = ["BulletinBoard", "bulletinboard"]
 
 
 class BulletinBoard(Item):
+    handled_verbs = frozenset()   # just the custom verbs
+
     def init(self):
         super(BulletinBoard, self).init()
         self.posts = []
@@ -215,5 +217,4 @@ class BulletinBoard(Item):
 
 bulletinboard = BulletinBoard("board", "wooden bulletin board", "The board contains a little plaque: \"important announcements\".",
                               "On a wall, a bulletin board is visible.")
-bulletinboard.aliases.add("messages")
-bulletinboard.aliases.add("bulletin")
+bulletinboard.aliases |= {"messages", "bulletin"}
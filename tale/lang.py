@@ -94,9 +94,38 @@ def fullstop(sentence, punct="."):
     return sentence + punct
 
 
-# adverbs are stored in a datafile next to this module
-ADVERB_LIST = sorted(vfs.internal_resources["soul_adverbs.txt"].data.splitlines())   # keep the list for prefix search
-ADVERBS = frozenset(ADVERB_LIST)
+class _Adverbs(object):
+    """
+    The adverbs, stored in a datafile next to this module. They are loaded on first use rather than
+    when the module is imported. Acts as a sorted list (for prefix search) and as a set (for fast 'in').
+    """
+    def __init__(self):
+        self.__sorted = self.__set = None
+
+    def load(self):
+        """returns the sorted list of adverbs, loads them if that hasn't been done yet"""
+        if self.__sorted is None:
+            adverbs = sorted(vfs.internal_resources["soul_adverbs.txt"].data.splitlines())
+            self.__set = frozenset(adverbs)
+            self.__sorted = adverbs
+        return self.__sorted
+
+    def __contains__(self, word):
+        if self.__set is None:
+            self.load()
+        return word in self.__set
+
+    def __len__(self):
+        return len(self.load())
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __getitem__(self, index):
+        return self.load()[index]
+
+
+ADVERBS = ADVERB_LIST = _Adverbs()
 
 
 def adverb_by_prefix(prefix, amount=5):
@@ -104,16 +133,17 @@ def adverb_by_prefix(prefix, amount=5):
     Return a list of adverbs starting with the given prefix, up to the given amount
     Uses binary search in the sorted adverbs list, O(log n)
     """
-    i = bisect.bisect_left(ADVERB_LIST, prefix)
-    if i >= len(ADVERB_LIST):
+    adverbs = ADVERB_LIST.load()
+    i = bisect.bisect_left(adverbs, prefix)
+    if i >= len(adverbs):
         return []
-    elif ADVERB_LIST[i].startswith(prefix):
+    elif adverbs[i].startswith(prefix):
         j = i + 1
-        amount = min(amount, len(ADVERB_LIST) - i)   # avoid reading past the end of the list
-        while amount > 1 and ADVERB_LIST[j].startswith(prefix):
+        amount = min(amount, len(adverbs) - i)   # avoid reading past the end of the list
+        while amount > 1 and adverbs[j].startswith(prefix):
             j += 1
             amount -= 1
-        return ADVERB_LIST[i:j]
+        return adverbs[i:j]
     else:
         return []
 
@@ -0,0 +1,138 @@
+# coding=utf-8
+"""
+Performance statistics of the driver's server tick and main loop.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+from __future__ import absolute_import, print_function, division, unicode_literals
+import collections
+import time
+
+__all__ = ["TickProfiler", "PhaseTimings", "timer"]
+
+timer = getattr(time, "perf_counter", time.time)    # high resolution timer if available (python 3.3+)
+
+
+class PhaseTimings(object):
+    """
+    Timing statistics for a single phase: a total call count, and the durations of
+    the most recent calls (a rolling window) to calculate the latency percentiles from.
+    """
+    def __init__(self, window=500):
+        self.count = 0
+        self.durations = collections.deque(maxlen=window)
+
+    def add(self, duration):
+        self.count += 1
+        self.durations.append(duration)
+
+    def percentiles(self):
+        """returns dict with p50, p95, p99 and max durations (in seconds) over the rolling window"""
+        durations = sorted(self.durations)
+        if not durations:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+        last = len(durations) - 1
+        return {
+            "p50": durations[int(last * 0.50)],
+            "p95": durations[int(last * 0.95)],
+            "p99": durations[int(last * 0.99)],
+            "max": durations[-1]
+        }
+
+
+class CallTimings(object):
+    """Aggregated timings of the calls to a single thing (such as a deferred action)"""
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+
+class TickProfiler(object):
+    """
+    Collects timings of the various phases of the server tick and main loop,
+    and of the individual deferred actions and heartbeats.
+    """
+    phase_names = ("server tick", "heartbeats", "deferreds", "pubsub sync", "output flush",
+                   "idle checks", "wiretap cleanup", "player input")
+
+    def __init__(self, window=500):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self.phases = {name: PhaseTimings(self.window) for name in self.phase_names}
+        self.deferreds = collections.defaultdict(CallTimings)    # (owner class or name, action) -> timings
+        self.heartbeats = collections.defaultdict(CallTimings)   # (class, object name) -> timings
+
+    def phase_done(self, phase, start):
+        """Record the duration of the phase that started at the given time. Returns the current time."""
+        now = timer()
+        self.phases[phase].add(now - start)
+        return now
+
+    def deferred_done(self, key, start):
+        """Record the duration of a deferred action call (key from deferred_key). Returns the current time."""
+        now = timer()
+        self.deferreds[key].add(now - start)
+        return now
+
+    def heartbeat_done(self, obj, start):
+        """Record the duration of an object's heartbeat call. Returns the current time."""
+        now = timer()
+        self.heartbeats[obj.__class__, getattr(obj, "name", "?")].add(now - start)
+        return now
+
+    @staticmethod
+    def deferred_key(deferred):
+        """the key to aggregate the timings of a deferred's action on (formatting is postponed until stats())"""
+        owner = deferred.owner
+        if not isinstance(owner, (type(""), str)):
+            owner = owner.__class__
+        return owner, deferred.action
+
+    @staticmethod
+    def describe_deferred(key):
+        """a short description of a deferred's action key"""
+        owner, action = key
+        if not isinstance(owner, (type(""), str)):
+            owner = owner.__name__
+        return "%s.%s" % (owner, action)
+
+    @staticmethod
+    def describe_heartbeat(key):
+        """a short description of a heartbeat object key"""
+        cls, name = key
+        return "%s '%s'" % (cls.__name__, name)
+
+    def slowest(self, calls, amount=10):
+        """returns the (key, timings) of the slowest calls (highest max duration)"""
+        return sorted(calls.items(), key=lambda item: item[1].max, reverse=True)[:amount]
+
+    def stats(self, top=10):
+        """returns all statistics in a dictionary that can be exported as JSON (durations are in seconds)"""
+        def calls_dict(calls, describe):
+            return [{"name": describe(key), "count": t.count, "total": t.total, "max": t.max, "avg": t.total / t.count}
+                    for key, t in self.slowest(calls, top)]
+        phases = {}
+        for name, timings in self.phases.items():
+            phases[name] = timings.percentiles()
+            phases[name]["count"] = timings.count
+        return {
+            "since": self.started,
+            "window": self.window,
+            "phases": phases,
+            "slowest_deferreds": calls_dict(self.deferreds, self.describe_deferred),
+            "slowest_heartbeats": calls_dict(self.heartbeats, self.describe_heartbeat)
+        }
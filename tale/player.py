@@ -48,6 +48,8 @@ class Player(base.Living, pubsub.Listener):
     Player controlled entity.
     Has a Soul for social interaction.
     """
+    clone_shallow = base.Living.clone_shallow | {"known_locations"}
+
     def __init__(self, name, gender, race="human", description=None, short_description=None):
         title = lang.capital(name)
         super(Player, self).__init__(name, gender, race, title, description, short_description)
@@ -177,6 +179,7 @@ class Player(base.Living, pubsub.Listener):
             self.transcript.write(u"\n\n>> %s\n" % cmd)
         self.input_is_available.set()
         self.last_input_time = time.time()
+        mud_context.driver.notify_player_input(self)   # wake up the driver's main loop
 
     @property
     def idle_time(self):
@@ -342,9 +345,9 @@ class PlayerConnection(object):
         return self.player.idle_time
 
     def write_output(self):
-        """print any buffered output to the player's screen"""
+        """print any buffered output to the player's screen, returns True if there was any"""
         if not self.io:
-            return
+            return False
         output = self.get_output()
         if output:
             # (re)set a few io parameters because they can be changed dynamically
@@ -356,6 +359,8 @@ class PlayerConnection(object):
                     time.sleep(self.player.output_line_delay / 1000.0)  # delay the output for a short period
             else:
                 self.io.output(output.rstrip())
+            return True
+        return False
 
     def output(self, *lines):
         """directly writes the given text to the player's screen, without buffering and formatting/wrapping"""
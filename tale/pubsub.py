@@ -30,35 +30,72 @@ Currently defined pubsub topics used by the Tale driver:
   ("wiretap-living", <living name>)
       Used by the wiretapper on a living
 
+  The wiretap topics are only created when someone subscribes to them,
+  and are destroyed when they have been idle for a while (see expire_idle_topics).
+
 """
 
 import weakref
 import threading
+import collections
 import time
+import heapq
+import itertools
 
 
-__all__ = ["topic", "unsubscribe_all", "Listener"]
+__all__ = ["topic", "has_subscribers", "unsubscribe_all", "expire_idle_topics", "backlog", "Listener"]
 
 all_topics = {}
 __topic_lock = threading.Lock()
+__expiring_topics = []     # heapq of (expiry time, sequence nr, topic) for the topics that expire when idle
+__expiring_sequence = itertools.count()
+_pending_topics = set()    # the topics that have events pending, so sync() doesn't have to visit all topics
+_pending_lock = threading.Lock()
 
 
-def topic(name):
-    """Create a topic object (singleton). Name can be a string or a tuple."""
+def topic(name, idle_expiry=None):
+    """
+    Create a topic object (singleton). Name can be a string or a tuple.
+    If idle_expiry is given (seconds), the topic will be destroyed by expire_idle_topics
+    once it has been idle for that long while having no pending events and no subscribers.
+    """
     with __topic_lock:
-        if name in all_topics:
-            return all_topics[name]
-        instance = all_topics[name] = Topic(name)
+        instance = all_topics.get(name)
+        if instance is None:
+            instance = all_topics[name] = Topic(name)
+        if idle_expiry and not instance.idle_expiry:
+            instance.idle_expiry = idle_expiry
+            heapq.heappush(__expiring_topics, (instance.last_event + idle_expiry, next(__expiring_sequence), instance))
         return instance
 
 
+def has_subscribers(name):
+    """
+    Does the topic exist and does it have subscribers? This doesn't create the topic and doesn't lock,
+    so it is a cheap way to skip sending events that nobody listens to (such as on wiretaps).
+    """
+    t = all_topics.get(name)
+    return t is not None and t.has_subscribers
+
+
 def sync(topic=None):
     """Sync all pending events (i.e. push them to the subscribers)"""
+    global _pending_topics
     if topic:
         return all_topics[topic].sync()
     else:
-        for t in list(all_topics.values()):
-            t.sync()
+        with _pending_lock:
+            topics, _pending_topics = _pending_topics, set()
+        for t in topics:
+            if all_topics.get(t.name) is t:
+                t.sync()
+
+
+def backlog():
+    """Return a dictionary from topic name to number of pending events, for the topics that have pending events"""
+    with _pending_lock:
+        topics = list(_pending_topics)
+    return {t.name: len(t.events) for t in topics if all_topics.get(t.name) is t and t.events}
 
 
 def pending(topicname=None):
@@ -68,6 +105,34 @@ def pending(topicname=None):
         return {t.name: (len(t.events), t.idle_time, len(t.subscribers)) for t in topics}
 
 
+def expire_idle_topics(now=None):
+    """
+    Destroy the topics (created with an idle_expiry) that have been idle for too long.
+    Only the topics whose expiry time has passed are examined, if they were used in the meantime
+    (events sent or subscribers added) their expiry time is simply pushed back.
+    Returns the names of the topics that were destroyed.
+    """
+    now = now or time.time()
+    expired = []
+    with __topic_lock:
+        while __expiring_topics and __expiring_topics[0][0] <= now:
+            _, _, t = heapq.heappop(__expiring_topics)
+            if all_topics.get(t.name) is not t:
+                continue    # topic has already been destroyed
+            if t.events or any(subber_ref() is not None for subber_ref in t.subscribers):
+                expiry = now + t.idle_expiry
+            else:
+                expiry = t.last_event + t.idle_expiry
+                if expiry <= now:
+                    expired.append(t)
+                    continue
+            heapq.heappush(__expiring_topics, (expiry, next(__expiring_sequence), t))
+    names = [t.name for t in expired]
+    for t in expired:
+        t.destroy()
+    return names
+
+
 def unsubscribe_all(subscriber):
     """unsubscribe the given subscriber object from all topics that it may have been subscribed to."""
     for topic in list(all_topics.values()):
@@ -88,12 +153,19 @@ class Listener(object):
 class Topic(object):
     """
     A pubsub topic to send/receive events. You get these from the topic function.
+    Events can safely be sent from multiple threads, while another thread is syncing:
+    the events are queued in a deque, which supports thread-safe appends and pops.
     """
     def __init__(self, name):
         self.name = name
         self.subscribers = set()
-        self.events = []
+        self.events = collections.deque()
         self.last_event = time.time()
+        self.idle_expiry = None
+
+    @property
+    def has_subscribers(self):
+        return bool(self.subscribers)
 
     @property
     def idle_time(self):
@@ -110,26 +182,34 @@ class Topic(object):
         if not isinstance(subscriber, Listener):
             raise TypeError("subscriber needs to be a Listener")
         self.subscribers.add(weakref.ref(subscriber))
+        self.last_event = time.time()
 
     def unsubscribe(self, subscriber):
         self.subscribers.discard(weakref.ref(subscriber))
 
     def send(self, event, synchronous=False):
         self.events.append(event)
+        with _pending_lock:
+            _pending_topics.add(self)
         self.last_event = time.time()
         if synchronous:
             return self.sync()
 
     def sync(self):
-        events, self.events = self.events, []
+        # only process the events that are queued right now, events sent meanwhile are for the next sync
         results = []
-        for event in events:
+        events = self.events
+        for _ in range(len(events)):
+            try:
+                event = events.popleft()
+            except IndexError:
+                break   # another thread synced them already
             results.extend(self.__sync_event(event))
         return results
 
     def __sync_event(self, event):
         results = []
-        for subber_ref in self.subscribers:
+        for subber_ref in list(self.subscribers):
             subber = subber_ref()
             if subber is not None:
                 try:
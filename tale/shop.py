@@ -39,6 +39,8 @@ banking_money_limit = 15000.0
 
 
 class Shopkeeper(NPC):
+    handled_verbs = frozenset()   # just the custom verbs
+
     def init(self):
         super(Shopkeeper, self).init()
         self.shop = ShopBehavior()
@@ -76,9 +78,9 @@ class Shopkeeper(NPC):
         assert isinstance(current_time, datetime.time)
         for from_hr, to_hr in self.shop.open_hours:
             from_t = datetime.time(from_hr)
-            to_t = datetime.time(to_hr)
+            to_t = datetime.time(to_hr % 24)   # 24 means until midnight
             if from_hr < to_hr:
-                if from_t <= current_time < to_t:  # normal order such as 9..17
+                if from_t <= current_time and (current_time < to_t or to_hr == 24):  # normal order such as 9..17
                     return  # we're open!
             else:
                 if from_t <= current_time or current_time < to_t:  # reversed order, passes midnight, such as 20..3
@@ -88,7 +90,8 @@ class Shopkeeper(NPC):
     def _parse_item(self, parsed, actor):
         if len(parsed.who_info) != 1:
             raise ParseError("I don't understand what single item you're talking about.")
-        item, info = parsed.who_info.popitem()
+        item = parsed.who_order[0]
+        info = parsed.who_info[item]
         if item not in actor:
             raise ActionRefused(self.shop.msg_playercantsell or "You don't have that.")
         if not isinstance(item, Item):
@@ -172,7 +175,7 @@ class Shopkeeper(NPC):
                 item = None
         if item:
             # the parser found an item, check if there's one in the shop too with the same name.
-            shop_item = search_item(item.name, self.inventory)
+            shop_item = search_item(item.name, self.inventory_index)
             if shop_item:
                 item = shop_item
         if not item:
@@ -188,7 +191,7 @@ class Shopkeeper(NPC):
                         continue
                 except ValueError:
                     # not a number, search by name
-                    item = search_item(word, self.inventory)
+                    item = search_item(word, self.inventory_index)
                     if not item:
                         continue
                 else:
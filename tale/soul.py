@@ -13,10 +13,10 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 
 from __future__ import absolute_import, print_function, division, unicode_literals
 import re
-from collections import defaultdict
+from collections import OrderedDict
 from . import lang
 from .errors import ParseError
-from .util import next_iter
+from .util import next_iter, NameIndexes, words_by_prefix
 
 
 class SoulException(Exception):
@@ -417,6 +417,30 @@ def adjust_available_verbs(allowed_verbs=None, remove_verbs=[], add_verbs={}):
         NONLIVING_OK_VERBS.discard(v)
         MOVEMENT_VERBS.discard(v)
     VERBS.update(add_verbs)
+    _compiled_verbs.clear()
+    verbs_changed()
+
+
+_sorted_verbs = None    # sorted list of the verbs for prefix searches (created when needed)
+verbs_version = 0       # increased by verbs_changed
+
+
+def verbs_changed():
+    """
+    Forget the sorted list of verbs and cached parse results. Call this when you change
+    or replace VERBS yourself (adjust_available_verbs already does this).
+    """
+    global _sorted_verbs, verbs_version
+    _sorted_verbs = None
+    verbs_version += 1
+
+
+def verbs_by_prefix(prefix):
+    """Return the soul verbs that start with the given prefix, in sorted order."""
+    global _sorted_verbs
+    if _sorted_verbs is None:
+        _sorted_verbs = sorted(VERBS)
+    return words_by_prefix(_sorted_verbs, prefix)
 
 
 ACTION_QUALIFIERS = {
@@ -470,6 +494,95 @@ def check_person(action, who):
     return True
 
 
+_verb_escapes_regex = re.compile(r" \n(WHO|YOUR|MY|POSS|IS|SUBJ|WHERE|WHAT|MSG|HOW|AT)")
+_message_escapes = {"WHERE", "WHAT", "MSG", "HOW"}      # filled in once per action, from the parse result
+_target_escapes = {"WHO", "YOUR", "MY", "POSS", "IS", "SUBJ"}     # filled in for every observer of the action
+
+
+def compile_verb_template(text):
+    """
+    Converts a verb message with escapes (' \\nHOW', ' \\nWHO' etc.) into a format string for the % operator.
+    The format is applied twice: first to fill in the message escapes (HOW, WHERE, WHAT, MSG)
+    and then to fill in the target escapes (WHO, YOUR, MY, POSS, IS, SUBJ) for each observer.
+    """
+    def convert(match):
+        escape = match.group(1)
+        if escape in _message_escapes:
+            return "%%(%s)s" % escape
+        if escape in _target_escapes:
+            return "%%%%(%s)s" % escape
+        return match.group(0)
+    return _verb_escapes_regex.sub(convert, text.replace("%", "%%%%"))
+
+
+def _template_value(value):
+    """escape a value for the first formatting step of a compiled verb template"""
+    if "%" in value:
+        value = value.replace("%", "%%")
+    if "\n" in value:
+        # the value itself contains target escapes (such as the 'where' text of some verbs)
+        value = _verb_escapes_regex.sub(lambda m: "%%(%s)s" % m.group(1) if m.group(1) in _target_escapes else m.group(0), value)
+    return value
+
+
+_compiled_verbs = {}    # verb -> (verbdata, {(has who_order, has who_info): compiled templates})
+
+
+def compiled_verb(verb, verbdata, with_who_order, with_who_info):
+    """
+    Returns the compiled (action template, room template, needs-person, used escapes) for the verb,
+    in the variant for the given parse situation (with or without targets).
+    The templates are compiled once and then cached until the verb's data is changed.
+    """
+    cached = _compiled_verbs.get(verb)
+    if not cached or cached[0] is not verbdata:
+        cached = _compiled_verbs[verb] = (verbdata, {})
+    variant = (with_who_order, with_who_info)
+    if variant not in cached[1]:
+        cached[1][variant] = _compile_verb(verb, verbdata, with_who_order, with_who_info)
+    return cached[1][variant]
+
+
+def _compile_verb(verb, verbdata, with_who_order, with_who_info):
+    action, action_room, needs_person = _verb_messages(verb, verbdata, with_who_order, with_who_info)
+    defaults = "".join(text for text in verbdata[1] or () if text)    # these can contain escapes as well
+    escapes = frozenset(_verb_escapes_regex.findall(action + action_room + defaults))
+    return compile_verb_template(action), compile_verb_template(action_room), needs_person, escapes
+
+
+def _verb_messages(verb, verbdata, with_who_order, with_who_info):
+    vtype = verbdata[0]
+    if vtype == DEUX:
+        action = verbdata[2]
+        return action, verbdata[3], not check_person(action, False)
+    elif vtype == QUAD:
+        if with_who_info:
+            return verbdata[4], verbdata[5], False
+        return verbdata[2], verbdata[3], False
+    elif vtype == FULL:
+        raise SoulException("vtype FULL")  # doesn't matter, FULL is not used yet anyway
+    elif vtype == DEFA:
+        action = verb + "$ \nHOW \nAT"
+    elif vtype == PREV:
+        action = verb + "$" + spacify(verbdata[2]) + " \nWHO \nHOW"
+    elif vtype == PHYS:
+        action = verb + "$" + spacify(verbdata[2]) + " \nWHO \nHOW \nWHERE"
+    elif vtype == SHRT:
+        action = verb + "$" + spacify(verbdata[2]) + " \nHOW"
+    elif vtype == PERS:
+        action = verbdata[3] if with_who_order else verbdata[2]
+    elif vtype == SIMP:
+        action = verbdata[2]
+    else:
+        raise SoulException("invalid vtype " + vtype)
+    if with_who_info and len(verbdata) > 3:
+        action = action.replace(" \nAT", spacify(verbdata[3]) + " \nWHO")
+    else:
+        action = action.replace(" \nAT", "")
+    needs_person = not check_person(action, False)
+    return action.replace("$", ""), action.replace("$", "s"), needs_person
+
+
 def spacify(string):
     """returns string prefixed with a space, if it has contents. If it is empty, prefix nothing"""
     return " " + string.lstrip(" \t") if string else ""
@@ -503,6 +616,9 @@ def poss_replacement(actor, target, observer):
             return lang.possessive(target.title)
 
 
+MAX_INPUT_LENGTH = 1000   # longer command lines are refused by the parser
+MAX_INPUT_WORDS = 100     # commands with more words than this are refused by the parser
+
 _quoted_message_regex = re.compile(r"('(?P<msg1>.*)')|(\"(?P<msg2>.*)\")")    # greedy single-or-doublequoted string match
 _skip_words = {"and", "&", "at", "to", "before", "in", "into", "on", "off", "onto",
                "the", "with", "from", "after", "before", "under", "above", "next"}
@@ -511,35 +627,190 @@ _skip_words = {"and", "&", "at", "to", "before", "in", "into", "on", "off", "ont
 class WhoInfo(object):
     __slots__ = ("sequence", "previous_word")
 
-    def __init__(self, sequence=0):
+    def __init__(self, sequence=0, previous_word=None):
         self.sequence = sequence
-        self.previous_word = None
+        self.previous_word = previous_word
 
     def __str__(self):
         return "[sequence=%d, prev_word=%s]" % (self.sequence, self.previous_word)
 
+    def copy(self):
+        info = WhoInfo(self.sequence)
+        info.previous_word = self.previous_word
+        return info
+
+
+class _ParsedWhoInfo(WhoInfo):
+    """WhoInfo of an object in a ParseResult. Setting its previous_word changes it in the parse result."""
+    __slots__ = ("parsed",)
+
+    def __init__(self, parsed, sequence):
+        self.parsed = parsed
+        self.sequence = sequence
+
+    @property
+    def previous_word(self):
+        previous_words = self.parsed.previous_words
+        return previous_words[self.sequence] if len(previous_words) == len(self.parsed.who_order) else None
+
+    @previous_word.setter
+    def previous_word(self, word):
+        if len(self.parsed.previous_words) != len(self.parsed.who_order):
+            self.parsed.recalc_who_info()
+        self.parsed.previous_words[self.sequence] = word
+
+
+def _remove_who(who_order, previous_words, who):
+    while who in who_order:
+        index = who_order.index(who)
+        del who_order[index]
+        if index < len(previous_words):
+            del previous_words[index]
+
+
+class WhoInfoView(object):
+    """
+    Dict-like view of the objects in a ParseResult: object -> WhoInfo. Nothing is stored per object,
+    the WhoInfos are created when asked for, from the parse result's who_order and previous_words lists,
+    and changing their previous_word changes it in the parse result.
+    The sequence of an object is its (last) position in who_order. Assigning the WhoInfo of an object
+    that isn't parsed yet, appends it to who_order (the sequence of the assigned WhoInfo is not used).
+    The lookups use the parse result's index of the objects in who_order (see ParseResult.who_index).
+    """
+    __slots__ = ("parsed",)
+
+    def __init__(self, parsed):
+        self.parsed = parsed
+
+    def __len__(self):
+        return len(self.parsed.who_index())
+
+    def __bool__(self):
+        return bool(self.parsed.who_order)
+
+    __nonzero__ = __bool__   # python 2
+
+    def __contains__(self, who):
+        return who in self.parsed.who_index()
+
+    def __iter__(self):
+        return iter(self.parsed.who_index())
+
+    def __getitem__(self, who):
+        return _ParsedWhoInfo(self.parsed, self.parsed.who_index()[who])
+
+    def __setitem__(self, who, info):
+        parsed = self.parsed
+        if who not in parsed.who_index():
+            if len(parsed.previous_words) != len(parsed.who_order):
+                parsed.recalc_who_info()
+            parsed.who_order.append(who)
+            parsed.previous_words.append(None)
+        self[who].previous_word = info.previous_word
+
+    def __delitem__(self, who):
+        if who not in self.parsed.who_index():
+            raise KeyError(who)
+        self.parsed.remove_who(who)
+
+    def get(self, who, default=None):
+        sequence = self.parsed.who_index().get(who)
+        return default if sequence is None else _ParsedWhoInfo(self.parsed, sequence)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[who] for who in self]
+
+    def items(self):
+        return [(who, self[who]) for who in self]
+
+    def popitem(self):
+        if not self.parsed.who_order:
+            raise KeyError("popitem(): who_info is empty")
+        who = self.parsed.who_order[-1]
+        info = self[who].copy()    # it's no longer in the parse result
+        self.parsed.remove_who(who)
+        return who, info
+
+    def clear(self):
+        del self.parsed.who_order[:]
+        del self.parsed.previous_words[:]
+        self.parsed.who_order_changed()
+
+    def copy(self):
+        """a dict of object -> WhoInfo, that is independent of the parse result"""
+        return {who: info.copy() for who, info in self.items()}
+
 
 class ParseResult(object):
-    __slots__ = ("verb", "adverb", "message", "bodypart", "qualifier", "who_info", "who_order", "args", "unrecognized", "unparsed")
+    __slots__ = ("verb", "adverb", "message", "bodypart", "qualifier", "who_order", "previous_words", "args", "unrecognized", "unparsed",
+                 "_who_index")
 
-    def __init__(self, verb, adverb=None, message=None, bodypart=None, qualifier=None, args=None, who_info=None, who_order=None, unrecognized=None, unparsed=""):
+    def __init__(self, verb, adverb=None, message=None, bodypart=None, qualifier=None, args=None, who_info=None, who_order=None,
+                 unrecognized=None, unparsed="", previous_words=None):
         self.verb = verb
         self.adverb = adverb
         self.message = message
         self.bodypart = bodypart
         self.qualifier = qualifier
-        self.who_info = who_info or {}      # WhoInfo for all objects parsed  (note: who-objects can be items, livings, and exits!)
-        self.who_order = who_order or []    # the order of the occurrence of the objects in the input text
+        self.who_order = who_order or []    # the order of the occurrence of the objects in the input text  (note: who-objects can be items, livings, and exits!)
+        self.previous_words = previous_words or []    # the word before each object in who_order (or None)
         self.args = args or []
         self.unrecognized = unrecognized or []
         self.unparsed = unparsed
-        if self.who_order and not self.who_info:
+        self._who_index = None
+        if who_info:
+            self.who_info = who_info
+        elif len(self.previous_words) != len(self.who_order):
             self.recalc_who_info()
 
+    @property
+    def who_info(self):
+        """WhoInfo for all objects parsed, a dict-like view on who_order and previous_words"""
+        return WhoInfoView(self)
+
+    @who_info.setter
+    def who_info(self, who_info):
+        # accepts a dict of object -> WhoInfo
+        if not self.who_order:
+            self.who_order = sorted(who_info, key=lambda who: who_info[who].sequence)
+        self.previous_words = [who_info[who].previous_word if who in who_info else None for who in self.who_order]
+        self.who_order_changed()
+
+    def who_index(self):
+        """
+        Dict of the parsed objects -> their last position in who_order (in order of their first occurrence).
+        It is created when first needed, and created again when who_order is replaced or its length changes.
+        """
+        cached = self._who_index
+        if cached is None or cached[0] is not self.who_order or cached[1] != len(self.who_order):
+            index = {}
+            for sequence, who in enumerate(self.who_order):
+                index[who] = sequence
+            cached = self._who_index = (self.who_order, len(self.who_order), index)
+        return cached[2]
+
+    def who_order_changed(self):
+        """forget the index of the parsed objects (only needed if you changed who_order in place without changing its length)"""
+        self._who_index = None
+
     def recalc_who_info(self):
-        self.who_info = {}
-        for sequence, who in enumerate(self.who_order):
-            self.who_info[who] = WhoInfo(sequence)
+        """call this after changing who_order, to reset the previous words"""
+        self.previous_words = [None] * len(self.who_order)
+        self.who_order_changed()
+
+    def remove_who(self, who):
+        """remove all occurrences of the object from the parsed objects"""
+        _remove_who(self.who_order, self.previous_words, who)
+        self.who_order_changed()
+
+    def copy(self):
+        """a copy of the parse result, that can be changed without affecting the original"""
+        return ParseResult(self.verb, adverb=self.adverb, message=self.message, bodypart=self.bodypart, qualifier=self.qualifier,
+                           args=list(self.args), who_order=list(self.who_order), previous_words=list(self.previous_words),
+                           unrecognized=list(self.unrecognized), unparsed=self.unparsed)
 
     def __str__(self):
         who_info_str = [" %s->%s" % (living.name, info) for living, info in self.who_info.items()]
@@ -560,19 +831,74 @@ class ParseResult(object):
 
 
 def check_name_with_spaces(words, index, all_livings, all_items):
-    wordcount = 1
+    """
+    Find the living or item with the longest name (that may consist of multiple words) at words[index].
+    The livings and items are NameIndex(es), that keep a token trie of their multi-word names up to date,
+    or plain dicts of name -> object (these are searched directly, up to 6 words).
+    Returns (object, name, wordcount) or (None, None, 0) if there's no such name. Livings win over items.
+    """
+    best = None, None, 0
+    for names in (all_livings, all_items):
+        if isinstance(names, dict):
+            match = _longest_dict_match(words, index, names)
+        else:
+            match = names.longest_match(words, index)
+        if match[2] > best[2]:
+            best = match
+    return best
+
+
+def _longest_dict_match(words, index, names):
+    match = None, None, 0
     name = words[index]
-    try:
-        while wordcount < 6:    # an upper bound for the number of words to concatenate to avoid long runtime
-            if name in all_livings:
-                return all_livings[name], name, wordcount
-            if name in all_items:
-                return all_items[name], name, wordcount
-            name = name + " " + words[index + wordcount]
-            wordcount += 1
-    except IndexError:
-        pass
-    return None, None, 0
+    for wordcount in range(1, min(6, len(words) - index) + 1):
+        if wordcount > 1:
+            name = name + " " + words[index + wordcount - 1]
+        if name in names:
+            match = names[name], name, wordcount
+    return match
+
+
+class ParseCache(object):
+    """
+    Bounded LRU cache of parse results, keyed on the command string and on the state of everything
+    the parse depends on (the player, location and inventory contents, the external verbs).
+    The objects are in the key by id and version, so the cache doesn't keep them alive.
+    Keeps hit and miss counters for the server statistics.
+    """
+    def __init__(self, size=500):
+        self.size = size
+        self.entries = OrderedDict()   # key -> (ParseResult, raised as NonSoulVerb?)
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        try:
+            entry = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self.entries[key] = entry    # it's now the most recently used
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def reset_stats(self):
+        self.hits = self.misses = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+_pronouns = {"them", "him", "her", "it"}
 
 
 class Soul(object):
@@ -580,6 +906,8 @@ class Soul(object):
     The 'soul' of a Player. Handles the high level verb actions and allows for social player interaction.
     Verbs that actually do something in the environment (not purely social messages) are implemented elsewhere.
     """
+    parse_cache = None    # ParseCache shared by all souls, None=don't cache parse results (the driver sets it if configured)
+
     def __init__(self):
         self.previously_parsed = None
 
@@ -641,129 +969,85 @@ class Soul(object):
             where = " " + verbdata[1][2]  # replace bodyparts string by specific one from verbs table
         how = spacify(adverb)
 
-        def result_messages(action, action_room):
-            action = action.strip()
-            action_room = action_room.strip()
-            if parsed.qualifier:
-                qual_action, qual_room, use_room_default = ACTION_QUALIFIERS[parsed.qualifier]
-                action_room = qual_room % action_room if use_room_default else qual_room % action
-                action = qual_action % action
-            # construct message seen by player
-            targetnames = [who_replacement(player, target, player) for target in parsed.who_order]
-            player_msg = action.replace(" \nWHO", " " + lang.join(targetnames))
-            player_msg = player_msg.replace(" \nYOUR", " your")
-            player_msg = player_msg.replace(" \nMY", " your")
-            # construct message seen by room
-            targetnames = [who_replacement(player, target, None) for target in parsed.who_order]
-            room_msg = action_room.replace(" \nWHO", " " + lang.join(targetnames))
-            room_msg = room_msg.replace(" \nYOUR", " " + player.possessive)
-            room_msg = room_msg.replace(" \nMY", " " + player.objective)
-            # construct message seen by targets
-            target_msg = action_room.replace(" \nWHO", " you")
-            target_msg = target_msg.replace(" \nYOUR", " " + player.possessive)
-            target_msg = target_msg.replace(" \nPOSS", " your")
-            target_msg = target_msg.replace(" \nIS", " are")
-            target_msg = target_msg.replace(" \nSUBJ", " you")
-            target_msg = target_msg.replace(" \nMY", " " + player.objective)
-            # fix up POSS, IS, SUBJ in the player and room messages
-            if len(parsed.who_order) == 1:
-                only_living = parsed.who_order[0]
-                subjective = getattr(only_living, "subjective", "it")  # if no subjective attr, use "it"
-                player_msg = player_msg.replace(" \nIS", " is")
-                player_msg = player_msg.replace(" \nSUBJ", " " + subjective)
-                player_msg = player_msg.replace(" \nPOSS", " " + poss_replacement(player, only_living, player))
-                room_msg = room_msg.replace(" \nIS", " is")
-                room_msg = room_msg.replace(" \nSUBJ", " " + subjective)
-                room_msg = room_msg.replace(" \nPOSS", " " + poss_replacement(player, only_living, None))
-            else:
+        action, action_room, needs_person, escapes = compiled_verb(parsed.verb, verbdata, bool(parsed.who_order), bool(parsed.who_info))
+        if needs_person and not parsed.who_order:
+            raise ParseError("The verb %s needs a person." % parsed.verb)
+        values = {"WHERE": where, "WHAT": message, "MSG": msg, "HOW": how}
+        text = where + message + how
+        if "%" in text or "\n" in text:
+            values = {escape: _template_value(value) for escape, value in values.items()}
+        action = (action % values).strip()
+        action_room = (action_room % values).strip()
+        if parsed.qualifier:
+            qual_action, qual_room, use_room_default = ACTION_QUALIFIERS[parsed.qualifier]
+            action_room = qual_room % action_room if use_room_default else qual_room % action
+            action = qual_action % action
+        # the values for the target escapes (only those that the messages actually use)
+        # in the message seen by the player, the room, and the targets
+        player_values = {"YOUR": " your", "MY": " your"}
+        room_values = {"YOUR": " " + player.possessive, "MY": " " + player.objective}
+        target_values = {"WHO": " you", "YOUR": room_values["YOUR"], "POSS": " your",
+                         "IS": " are", "SUBJ": " you", "MY": room_values["MY"]}
+        if "WHO" in escapes:
+            player_values["WHO"] = " " + lang.join([who_replacement(player, target, player) for target in parsed.who_order])
+            room_values["WHO"] = " " + lang.join([who_replacement(player, target, None) for target in parsed.who_order])
+        if len(parsed.who_order) == 1:
+            only_living = parsed.who_order[0]
+            player_values["IS"] = room_values["IS"] = " is"
+            player_values["SUBJ"] = room_values["SUBJ"] = " " + getattr(only_living, "subjective", "it")  # if no subjective attr, use "it"
+            if "POSS" in escapes:
+                player_values["POSS"] = " " + poss_replacement(player, only_living, player)
+                room_values["POSS"] = " " + poss_replacement(player, only_living, None)
+        else:
+            player_values["IS"] = room_values["IS"] = " are"
+            player_values["SUBJ"] = room_values["SUBJ"] = " they"
+            if "POSS" in escapes:
                 targetnames_player = lang.join([poss_replacement(player, living, player) for living in parsed.who_order])
                 targetnames_room = lang.join([poss_replacement(player, living, None) for living in parsed.who_order])
-                player_msg = player_msg.replace(" \nIS", " are")
-                player_msg = player_msg.replace(" \nSUBJ", " they")
-                player_msg = player_msg.replace(" \nPOSS", " " + lang.possessive(targetnames_player))
-                room_msg = room_msg.replace(" \nIS", " are")
-                room_msg = room_msg.replace(" \nSUBJ", " they")
-                room_msg = room_msg.replace(" \nPOSS", " " + lang.possessive(targetnames_room))
-            # add fullstops at the end
-            player_msg = lang.fullstop("You " + player_msg)
-            room_msg = lang.capital(lang.fullstop(player.title + " " + room_msg))
-            target_msg = lang.capital(lang.fullstop(player.title + " " + target_msg))
-            if player in parsed.who_info:
-                who = set(parsed.who_info)
-                who.remove(player)  # the player should not be part of the remaining targets.
-                who = frozenset(who)
-            else:
-                who = frozenset(parsed.who_info)
-            return who, player_msg, room_msg, target_msg
-
-        # construct the action string
-        action = None
-        if vtype == DEUX:
-            action = verbdata[2]
-            action_room = verbdata[3]
-            if not check_person(action, parsed.who_order):
-                raise ParseError("The verb %s needs a person." % parsed.verb)
-            action = action.replace(" \nWHERE", where)
-            action_room = action_room.replace(" \nWHERE", where)
-            action = action.replace(" \nWHAT", message)
-            action = action.replace(" \nMSG", msg)
-            action_room = action_room.replace(" \nWHAT", message)
-            action_room = action_room.replace(" \nMSG", msg)
-            action = action.replace(" \nHOW", how)
-            action_room = action_room.replace(" \nHOW", how)
-            return result_messages(action, action_room)
-        elif vtype == QUAD:
-            if parsed.who_info:
-                action = verbdata[4]
-                action_room = verbdata[5]
-            else:
-                action = verbdata[2]
-                action_room = verbdata[3]
-            action = action.replace(" \nWHERE", where)
-            action_room = action_room.replace(" \nWHERE", where)
-            action = action.replace(" \nWHAT", message)
-            action = action.replace(" \nMSG", msg)
-            action_room = action_room.replace(" \nWHAT", message)
-            action_room = action_room.replace(" \nMSG", msg)
-            action = action.replace(" \nHOW", how)
-            action_room = action_room.replace(" \nHOW", how)
-            return result_messages(action, action_room)
-        elif vtype == FULL:
-            raise SoulException("vtype FULL")  # doesn't matter, FULL is not used yet anyway
-        elif vtype == DEFA:
-            action = parsed.verb + "$ \nHOW \nAT"
-        elif vtype == PREV:
-            action = parsed.verb + "$" + spacify(verbdata[2]) + " \nWHO \nHOW"
-        elif vtype == PHYS:
-            action = parsed.verb + "$" + spacify(verbdata[2]) + " \nWHO \nHOW \nWHERE"
-        elif vtype == SHRT:
-            action = parsed.verb + "$" + spacify(verbdata[2]) + " \nHOW"
-        elif vtype == PERS:
-            action = verbdata[3] if parsed.who_order else verbdata[2]
-        elif vtype == SIMP:
-            action = verbdata[2]
+                player_values["POSS"] = " " + lang.possessive(targetnames_player)
+                room_values["POSS"] = " " + lang.possessive(targetnames_room)
+        # add fullstops at the end
+        player_msg = lang.fullstop("You " + action % player_values)
+        room_msg = lang.capital(lang.fullstop(player.title + " " + action_room % room_values))
+        target_msg = lang.capital(lang.fullstop(player.title + " " + action_room % target_values))
+        if player in parsed.who_order:
+            who = set(parsed.who_order)
+            who.remove(player)  # the player should not be part of the remaining targets.
+            who = frozenset(who)
         else:
-            raise SoulException("invalid vtype " + vtype)
-
-        if parsed.who_info and len(verbdata) > 3:
-            action = action.replace(" \nAT", spacify(verbdata[3]) + " \nWHO")
-        else:
-            action = action.replace(" \nAT", "")
-
-        if not check_person(action, parsed.who_order):
-            raise ParseError("The verb %s needs a person." % parsed.verb)
-
-        action = action.replace(" \nHOW", how)
-        action = action.replace(" \nWHERE", where)
-        action = action.replace(" \nWHAT", message)
-        action = action.replace(" \nMSG", msg)
-        action_room = action
-        action = action.replace("$", "")
-        action_room = action_room.replace("$", "s")
-        return result_messages(action, action_room)
+            who = frozenset(parsed.who_order)
+        return who, player_msg, room_msg, target_msg
 
     def parse(self, player, cmd, external_verbs=frozenset()):
-        """Parse a command string, returns a ParseResult object."""
+        """
+        Parse a command string, returns a ParseResult object.
+        Results are cached as long as nothing that can influence them changes. Commands with pronouns
+        are never cached because they depend on what was parsed before.
+        """
+        key = None
+        if self.parse_cache is not None and isinstance(external_verbs, frozenset) and player.location:
+            if not any(word.rstrip(",").lower() in _pronouns for word in cmd.split()):
+                location = player.location
+                # the index versions are unique over all indexes, so they identify the indexes as well
+                key = (id(player), cmd, external_verbs, verbs_version, id(location), location.exits_version,
+                       location.livings_index.version, location.items_index.version, player.inventory_index.version)
+                entry = self.parse_cache.get(key)
+                if entry:
+                    parsed, non_soul_verb = entry
+                    if non_soul_verb:
+                        raise NonSoulVerb(parsed.copy())
+                    return parsed.copy()
+        try:
+            parsed = self.__parse(player, cmd, external_verbs)
+        except NonSoulVerb as x:
+            if key:
+                self.parse_cache.put(key, (x.parsed.copy(), True))
+            raise
+        if key:
+            self.parse_cache.put(key, (parsed.copy(), False))
+        return parsed
+
+    def __parse(self, player, cmd, external_verbs):
         qualifier = None
         message_verb = False  # does the verb expect a message?
         external_verb = False  # is it a non-soul verb?
@@ -772,10 +1056,11 @@ class Soul(object):
         bodypart = None
         arg_words = []
         unrecognized_words = []
-        who_info = defaultdict(WhoInfo)
         who_order = []
-        who_sequence = 0
+        previous_words = []
         unparsed = cmd
+        if len(cmd) > MAX_INPUT_LENGTH:
+            raise ParseError("That's way too long.")
 
         # a substring enclosed in quotes will be extracted as the message
         m = _quoted_message_regex.search(cmd)
@@ -786,6 +1071,8 @@ class Soul(object):
         if not cmd:
             raise ParseError("What?")
         words = cmd.split()
+        if len(words) > MAX_INPUT_WORDS:
+            raise ParseError("That's way too many words.")
         if words[0] in ACTION_QUALIFIERS:     # suddenly, fail, ...
             qualifier = words.pop(0)
             unparsed = unparsed[len(qualifier):].lstrip()
@@ -815,7 +1102,7 @@ class Soul(object):
                 move_action = words.pop(0)
                 if not words:
                     raise ParseError("%s where?" % lang.capital(move_action))
-            exit, exit_name, wordcount = check_name_with_spaces(words, 0, player.location.exits, {})
+            exit, exit_name, wordcount = player.location.match_exit(words, 0)
             if exit:
                 if wordcount != len(words):
                     raise ParseError("What do you want to do with that?")
@@ -834,20 +1121,8 @@ class Soul(object):
             unparsed = unparsed[len(verb):].lstrip()
         include_flag = True
         collect_message = False
-        all_livings = {}  # livings in the room (including player) by name + aliases
-        all_items = {}  # all items in the room or player's inventory, by name + aliases
-        for living in player.location.livings:
-            all_livings[living.name] = living
-            for alias in living.aliases:
-                all_livings[alias] = living
-        for item in player.location.items:
-            all_items[item.name] = item
-            for alias in item.aliases:
-                all_items[alias] = item
-        for item in player.inventory:
-            all_items[item.name] = item
-            for alias in item.aliases:
-                all_items[alias] = item
+        all_livings = player.location.livings_index  # livings in the room (including player) by name + aliases
+        all_items = NameIndexes(player.inventory_index, player.location.items_index)  # all items in the player's inventory or the room, by name + aliases
         previous_word = None
         words_enumerator = enumerate(words)
         for index, word in words_enumerator:
@@ -865,26 +1140,20 @@ class Soul(object):
                     if who_list:
                         for who, name in who_list:
                             if include_flag:
-                                who_info[who].sequence = who_sequence
-                                who_info[who].previous_word = previous_word
-                                who_sequence += 1
                                 who_order.append(who)
+                                previous_words.append(previous_word)
                             else:
-                                del who_info[who]
-                                who_order.remove(who)
+                                _remove_who(who_order, previous_words, who)
                             arg_words.append(name)  # put the replacement-name in the args instead of the pronoun
                     previous_word = None
                     continue
                 raise ParseError("It is not clear who you mean.")
             if word in ("me", "myself", "self"):
                 if include_flag:
-                    who_info[player].sequence = who_sequence
-                    who_info[player].previous_word = previous_word
-                    who_sequence += 1
                     who_order.append(player)
-                elif player in who_info:
-                    del who_info[player]
-                    who_order.remove(player)
+                    previous_words.append(previous_word)
+                elif player in who_order:
+                    _remove_who(who_order, previous_words, player)
                 arg_words.append(word)
                 previous_word = None
                 continue
@@ -901,14 +1170,11 @@ class Soul(object):
                     # include every *living* thing visible, don't include items, and skip the player itself
                     for living in player.location.livings:
                         if living is not player:
-                            who_info[living].sequence = who_sequence
-                            who_info[living].previous_word = previous_word
-                            who_sequence += 1
                             who_order.append(living)
+                            previous_words.append(previous_word)
                 else:
-                    who_info = {}
                     who_order = []
-                    who_sequence = 0
+                    previous_words = []
                 arg_words.append(word)
                 previous_word = None
                 continue
@@ -927,37 +1193,29 @@ class Soul(object):
             if word in all_livings:
                 living = all_livings[word]
                 if include_flag:
-                    who_info[living].sequence = who_sequence
-                    who_info[living].previous_word = previous_word
-                    who_sequence += 1
                     who_order.append(living)
-                elif living in who_info:
-                    del who_info[living]
-                    who_order.remove(living)
+                    previous_words.append(previous_word)
+                elif living in who_order:
+                    _remove_who(who_order, previous_words, living)
                 arg_words.append(word)
                 previous_word = None
                 continue
             if word in all_items:
                 item = all_items[word]
                 if include_flag:
-                    who_info[item].sequence = who_sequence
-                    who_info[item].previous_word = previous_word
-                    who_sequence += 1
                     who_order.append(item)
-                elif item in who_info:
-                    del who_info[item]
-                    who_order.remove(item)
+                    previous_words.append(previous_word)
+                elif item in who_order:
+                    _remove_who(who_order, previous_words, item)
                 arg_words.append(word)
                 previous_word = None
                 continue
             if player.location:
-                exit, exit_name, wordcount = check_name_with_spaces(words, index, player.location.exits, {})
+                exit, exit_name, wordcount = player.location.match_exit(words, index)
                 if exit:
-                    who_info[exit].sequence = who_sequence
-                    who_info[exit].previous_word = previous_word
-                    previous_word = None
-                    who_sequence += 1
                     who_order.append(exit)
+                    previous_words.append(previous_word)
+                    previous_word = None
                     arg_words.append(exit_name)
                     while wordcount > 1:
                         next_iter(words_enumerator)
@@ -969,13 +1227,10 @@ class Soul(object):
                     next_iter(words_enumerator)
                     wordcount -= 1
                 if include_flag:
-                    who_info[item].sequence = who_sequence
-                    who_info[item].previous_word = previous_word
-                    who_sequence += 1
                     who_order.append(item)
-                elif item in who_info:
-                    del who_info[item]
-                    who_order.remove(item)
+                    previous_words.append(previous_word)
+                elif item in who_order:
+                    _remove_who(who_order, previous_words, item)
                 arg_words.append(full_name)
                 previous_word = None
                 continue
@@ -987,12 +1242,9 @@ class Soul(object):
             if word not in _skip_words:
                 # unrecognized word, check if it could be a person's name or an item. (prefix)
                 if not who_order:
-                    for name in all_livings:
-                        if name.startswith(word):
-                            raise ParseError("Perhaps you meant %s?" % name)
-                    for name in all_items:
-                        if name.startswith(word):
-                            raise ParseError("Perhaps you meant %s?" % name)
+                    names = all_livings.names_by_prefix(word, 1) or all_items.names_by_prefix(word, 1)
+                    if names:
+                        raise ParseError("Perhaps you meant %s?" % names[0])
                 if not external_verb:
                     if not verb:
                         raise UnknownVerbException(word, words, qualifier)
@@ -1030,7 +1282,7 @@ class Soul(object):
                 verb = who_order[0].default_verb
             else:
                 raise UnknownVerbException(words[0], words, qualifier)
-        return ParseResult(verb, who_info=who_info, who_order=who_order,
+        return ParseResult(verb, who_order=who_order, previous_words=previous_words,
                            adverb=adverb, message=message, bodypart=bodypart, qualifier=qualifier,
                            args=arg_words, unrecognized=unrecognized_words, unparsed=unparsed)
 
@@ -126,14 +126,13 @@ class IoAdapterBase(object):
             return
         prefix = prefix.lower()
         player = self.player_connection.player
-        verbs = [verb for verb in driver.current_verbs(player) if verb.startswith(prefix)]
-        livings = [living.name for living in player.location.livings if living.name.startswith(prefix)]
-        livings_aliases = [alias for living in player.location.livings for alias in living.aliases if alias.startswith(prefix)]
-        items = [item.name for item in player.location.items if item.name.startswith(prefix)]
-        items_aliases = [alias for item in player.location.items for alias in item.aliases if alias.startswith(prefix)]
-        exits = [xt for xt in player.location.exits if xt.startswith(prefix)]
-        inventory = [item.name for item in player.inventory if item.name.startswith(prefix)]
-        inventory_aliases = [alias for item in player.inventory for alias in item.aliases if alias.startswith(prefix)]
-        emotes = [verb for verb in soul.VERBS if verb.startswith(prefix)]
-        self.candidates = sorted(verbs + livings + items + exits + inventory + emotes + livings_aliases + items_aliases + inventory_aliases)
+        location = player.location
+        # the verbs and the names in the indexes are kept in sorted lists, so these are binary searches
+        candidates = driver.verbs_by_prefix(player, prefix)
+        candidates.extend(soul.verbs_by_prefix(prefix))
+        candidates.extend(location.livings_index.names_by_prefix(prefix))
+        candidates.extend(location.items_index.names_by_prefix(prefix))
+        candidates.extend(player.inventory_index.names_by_prefix(prefix))
+        candidates.extend(xt for xt in location.exits if xt.startswith(prefix))
+        self.candidates = sorted(candidates)
         return self.candidates
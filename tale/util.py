@@ -7,11 +7,13 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 """
 
 from __future__ import absolute_import, print_function, division, unicode_literals
+import bisect
 import datetime
 import random
 import sys
 import functools
 import inspect
+import itertools
 from . import lang
 from .errors import ParseError, ActionRefused
 
@@ -441,9 +443,11 @@ def authorized(*privileges):
 
 def search_item(name, collection):
     """
-    Searches an item (by name) in a collection of Items.
+    Searches an item (by name) in a collection of Items, or in a NameIndex.
     Returns the first match. Also considers aliases and titles.
     """
+    if isinstance(collection, NameIndex):
+        return collection.search(name)
     name = name.lower()
     items = [i for i in collection if i.name == name]
     if not items:
@@ -455,3 +459,252 @@ def search_item(name, collection):
 def sorted_by_name(stuff):
     return sorted(stuff, key=lambda thing: thing.name.lower())
 
+
+def words_by_prefix(sorted_words, prefix, amount=None):
+    """
+    Return the words from the sorted list that start with the given prefix (up to the given amount, if specified).
+    Uses binary search in the sorted list, O(log n) plus the number of results.
+    """
+    i = j = bisect.bisect_left(sorted_words, prefix)
+    end = len(sorted_words) if amount is None else min(len(sorted_words), i + amount)
+    while j < end and sorted_words[j].startswith(prefix):
+        j += 1
+    return sorted_words[i:j]
+
+
+class TokenTrie(object):
+    """
+    A trie of names that consist of multiple words, with the words as tokens.
+    It finds the longest name at a position in a list of words with a single walk,
+    instead of looking up every concatenation of the next few words.
+    A name can be added more than once, it is removed when it has been discarded as many times.
+    """
+    def __init__(self, names=()):
+        self.root = {}     # word -> node (dict); the None key of a node holds the count of the name ending there
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        node = self.root
+        for word in name.split():
+            node = node.setdefault(word, {})
+        node[None] = node.get(None, 0) + 1
+
+    def discard(self, name):
+        path = []
+        node = self.root
+        for word in name.split():
+            path.append((node, word))
+            node = node.get(word)
+            if node is None:
+                return
+        if None in node:
+            node[None] -= 1
+            if not node[None]:
+                del node[None]
+                for parent, word in reversed(path):
+                    if parent[word]:
+                        break
+                    del parent[word]   # prune the nodes that no longer lead to a name
+
+    def longest_match(self, words, index):
+        """Returns (name, wordcount) of the longest name that starts at words[index], or (None, 0) if there's none."""
+        node = self.root
+        wordcount = 0
+        for i in range(index, len(words)):
+            node = node.get(words[i])
+            if node is None:
+                break
+            if None in node:
+                wordcount = i - index + 1
+        if wordcount:
+            return " ".join(words[index:index + wordcount]), wordcount
+        return None, 0
+
+    def match_object(self, words, index, lookup):
+        """
+        Find the longest name at words[index] and look up its object with the lookup function.
+        Single word names don't have to be in the trie, the word itself is tried if no longer name matches.
+        Returns (object, name, wordcount) or (None, None, 0) if there's no such name.
+        """
+        name, wordcount = self.longest_match(words, index)
+        if not name:
+            name, wordcount = words[index], 1
+        obj = lookup(name)
+        return (obj, name, wordcount) if obj is not None else (None, None, 0)
+
+
+class NameIndex(object):
+    """
+    Index of mud objects by their name, aliases and (lowercase) title, for fast lookups.
+    Locations and Livings keep one up to date for their contents: objects are added and removed
+    when they enter or leave, and re-added when their name, title or aliases change.
+    More than one object can be known by the same name; the one added last is found.
+    The version is increased on every change, so it can be used to detect that the contents have changed.
+    The versions are taken from a counter shared by all indexes, so a version is never used by two indexes.
+    """
+    _versions = itertools.count(1)
+
+    def __init__(self, objects=()):
+        self.version = next(self._versions)
+        self.entries = {}   # object -> (name, aliases, title) that it is indexed under
+        self.names = {}     # name -> list of objects
+        self.aliases = {}   # alias -> list of objects
+        self.titles = {}    # lowercase title -> list of objects
+        self.__sorted_names = []    # all names and aliases, sorted (rebuilt when needed for prefix searches)
+        self.__sorted_version = 0
+        self.multiword_names = TokenTrie()    # the names and aliases that consist of more than one word
+        for obj in objects:
+            self.add(obj)
+
+    def add(self, obj):
+        """add the object to the index, or update its entry if it's already in there"""
+        self.discard(obj)
+        self.version = next(self._versions)
+        entry = (obj.name, tuple(obj.aliases), obj.title.lower())
+        self.entries[obj] = entry
+        self.names.setdefault(entry[0], []).append(obj)
+        for alias in entry[1]:
+            self.aliases.setdefault(alias, []).append(obj)
+        self.titles.setdefault(entry[2], []).append(obj)
+        for name in (entry[0],) + entry[1]:
+            if " " in name:
+                self.multiword_names.add(name)
+
+    def discard(self, obj):
+        entry = self.entries.pop(obj, None)
+        if entry:
+            self.version = next(self._versions)
+            self.__unlist(self.names, entry[0], obj)
+            for alias in entry[1]:
+                self.__unlist(self.aliases, alias, obj)
+            self.__unlist(self.titles, entry[2], obj)
+            for name in (entry[0],) + entry[1]:
+                if " " in name:
+                    self.multiword_names.discard(name)
+
+    @staticmethod
+    def __unlist(mapping, key, obj):
+        objects = mapping[key]
+        objects.remove(obj)
+        if not objects:
+            del mapping[key]
+
+    def clear(self):
+        self.version = next(self._versions)
+        self.entries.clear()
+        self.names.clear()
+        self.aliases.clear()
+        self.titles.clear()
+        self.multiword_names = TokenTrie()
+
+    def find(self, name):
+        """find an object by its exact name or one of its aliases, None if not found"""
+        objects = self.names.get(name) or self.aliases.get(name)
+        return objects[-1] if objects else None
+
+    def search(self, name):
+        """
+        Search an object by name (case insensitive). If no name matches, try aliases and titles.
+        Returns None if nothing is found.
+        """
+        name = name.lower()
+        objects = self.names.get(name) or self.aliases.get(name) or self.titles.get(name)
+        return objects[-1] if objects else None
+
+    def longest_match(self, words, index):
+        """
+        Find the object with the longest name or alias (that may consist of multiple words) at words[index].
+        Returns (object, name, wordcount) or (None, None, 0) if there's no such name.
+        """
+        return self.multiword_names.match_object(words, index, self.find)
+
+    def names_by_prefix(self, prefix, amount=None):
+        """Return the names and aliases starting with the given prefix, in sorted order (up to the given amount)"""
+        if self.__sorted_version != self.version:
+            self.__sorted_names = sorted(self)
+            self.__sorted_version = self.version
+        return words_by_prefix(self.__sorted_names, prefix, amount)
+
+    def __contains__(self, name):
+        return name in self.names or name in self.aliases
+
+    def __getitem__(self, name):
+        obj = self.find(name)
+        if obj is None:
+            raise KeyError(name)
+        return obj
+
+    def __iter__(self):
+        """iterate over all names and aliases"""
+        for name in self.names:
+            yield name
+        for alias in self.aliases:
+            if alias not in self.names:
+                yield alias
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class NameIndexes(object):
+    """
+    Read-only view on several NameIndexes, so they can be used as one.
+    If a name occurs in more than one index, the first index wins.
+    """
+    def __init__(self, *indexes):
+        self.indexes = indexes
+
+    def find(self, name):
+        for index in self.indexes:
+            obj = index.find(name)
+            if obj is not None:
+                return obj
+        return None
+
+    def longest_match(self, words, index):
+        best = None, None, 0
+        for name_index in self.indexes:
+            match = name_index.longest_match(words, index)
+            if match[2] > best[2]:
+                best = match
+        return best
+
+    def names_by_prefix(self, prefix, amount=None):
+        names = []
+        for index in self.indexes:
+            names.extend(index.names_by_prefix(prefix, None if amount is None else amount - len(names)))
+            if amount is not None and len(names) >= amount:
+                break
+        return names
+
+    def __contains__(self, name):
+        return any(name in index for index in self.indexes)
+
+    def __getitem__(self, name):
+        obj = self.find(name)
+        if obj is None:
+            raise KeyError(name)
+        return obj
+
+    def __iter__(self):
+        for index in self.indexes:
+            for name in index:
+                yield name
+
+    def __len__(self):
+        return sum(len(index) for index in self.indexes)
+
+
+class FrozenDict(dict):
+    """
+    A dict that can't be changed after it has been created, so it can safely be shared
+    between many objects (for instance, the extra descriptions of objects created from one prototype).
+    """
+    def __readonly(self, *args, **kwargs):
+        raise TypeError("this dict is read-only, it may be shared with other objects")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = __readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
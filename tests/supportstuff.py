@@ -7,10 +7,20 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 
 from __future__ import absolute_import, print_function, division, unicode_literals
 import datetime
+import os
+import sys
+import shutil
+import tempfile
 from tale import npc
 from tale import pubsub
 from tale import util
 from tale import driver
+from tale import errors
+from tale import mud_context
+from tale import player
+from tale import soul
+from tale.tio import vfs, iobase
+from tale.tio.console_io import ConsoleIo
 
 
 class Thing(object):
@@ -27,6 +37,83 @@ class TestDriver(driver.Driver):
         super(TestDriver, self).__init__()
         # fix up some essential attributes on the driver that are normally only present after loading a story file
         self.game_clock = util.GameDateTime(datetime.datetime.now())
+        self.story_directory = self.user_data_directory = None
+
+    def load_story(self, directory, mode=None, user_data_directory=None):
+        """
+        Load the story in the given directory the way the driver does it at startup, but headless:
+        there's no main loop and the user data goes to a temporary directory, unless you provide
+        one yourself (it is kept after unloading the story). Call unload_story when done.
+        """
+        self.story_directory = directory
+        self.verbs = soul.VERBS.copy()
+        sys.path.insert(0, directory)
+        story = __import__("story", level=0)
+        self.story = story.Story()
+        self.config = driver.StoryConfig.copy_from(self.story.config)
+        self.config.server_mode = mode or sorted(self.config.supported_modes)[0]
+        mud_context.driver = self
+        mud_context.config = self.config
+        if os.path.isdir(os.path.join(directory, "cmds")):
+            __import__("cmds", level=0).register_all(self.commands)
+        self.commands.adjust_available_commands(self.config.server_mode)
+        self.resources = vfs.VirtualFileSystem(root_package="story")
+        self.remove_user_data = not user_data_directory
+        self.user_data_directory = user_data_directory or tempfile.mkdtemp()
+        self.user_resources = vfs.VirtualFileSystem(root_path=self.user_data_directory, readonly=False)
+        self.game_clock = util.GameDateTime(self.config.epoch or self.server_started, self.config.gametime_to_realtime)
+        self.moneyfmt = util.MoneyFormatter(self.config.money_type) if self.config.money_type else None
+        self.story.init(self)
+        self.zones = __import__("zones", level=0)
+        self.config.startlocation_player = self._Driver__lookup_location(self.config.startlocation_player)
+        self.config.startlocation_wizard = self._Driver__lookup_location(self.config.startlocation_wizard)
+        for exit in self.unbound_exits:
+            exit._bind_target(self.zones)
+        self.unbound_exits = []
+
+    def unload_story(self):
+        """Remove the story modules again, so that another story can be loaded."""
+        sys.path.remove(self.story_directory)
+        soul.VERBS = self.verbs
+        soul.adjust_available_verbs()
+        for m in list(sys.modules.keys()):
+            if m.startswith("zones") or m in ("story", "cmds") or m.startswith("cmds."):
+                del sys.modules[m]
+        if self.remove_user_data:
+            shutil.rmtree(self.user_data_directory, ignore_errors=True)
+
+    def connect_player(self, name, gender="f", wizard=False):
+        """Create a player in the story's start location, with a console connection that only renders output."""
+        conn = player.PlayerConnection(player.Player(name, gender))
+        conn.io = HeadlessIo(conn)
+        conn.player.output_line_delay = 0
+        if wizard:
+            conn.player.privileges.add("wizard")
+        conn.player.move(self.config.startlocation_wizard if wizard else self.config.startlocation_player)
+        self.all_players[name] = conn
+        return conn
+
+    def process_player_command(self, cmd, conn):
+        """Process a command like the driver's main loop does, returns the error message if the command failed."""
+        try:
+            self._Driver__process_player_command(cmd, conn)
+            conn.player.remember_parsed()
+        except soul.UnknownVerbException as x:
+            return "The verb '%s' is unrecognized." % x.verb
+        except errors.ActionRefused as x:
+            conn.player.remember_parsed()
+            return str(x)
+        except errors.ParseError as x:
+            return str(x)
+
+
+class HeadlessIo(ConsoleIo):
+    """Renders the output text just like the console does, but doesn't print it."""
+    def output(self, *lines):
+        iobase.IoAdapterBase.output(self, *lines)
+
+    def output_no_newline(self, text):
+        iobase.IoAdapterBase.output_no_newline(self, text)
 
 
 class Wiretap(pubsub.Listener):
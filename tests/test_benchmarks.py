@@ -0,0 +1,473 @@
+"""
+Micro benchmarks for some performance sensitive parts of the driver.
+They are skipped in a normal test run. Set the environment variable TALE_BENCHMARKS=1 to run them,
+for instance: TALE_BENCHMARKS=1 python -m unittest tests.test_benchmarks
+They print their results so you can compare the numbers between versions, and some of them
+fail when the numbers are much worse than the stored baseline in benchmark_baseline.json.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+from __future__ import absolute_import, print_function, division, unicode_literals
+import unittest
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import copy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None    # only available on Python 3.4+
+try:
+    import resource
+except ImportError:
+    resource = None       # not available on Windows
+import tale
+import tale.driver as the_driver
+import tale.base
+import tale.npc
+import tale.player
+import tale.soul
+import tale.util
+from tale import pubsub
+from tale.errors import ActionRefused
+from tale.tio.iobase import IoAdapterBase
+from tests.supportstuff import TestDriver
+
+
+benchmark = unittest.skipUnless(os.environ.get("TALE_BENCHMARKS"), "benchmarks only run when TALE_BENCHMARKS is set")
+
+
+def report(name, amount, duration, unit):
+    print("\nbenchmark %s: %d %s in %.3f sec. = %.0f %s/sec." % (name, amount, unit, duration, amount / duration, unit), file=sys.stderr)
+
+
+baseline_file = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+
+
+def compare_baseline(testcase, name, results):
+    """
+    Print the results next to the stored baseline numbers in benchmark_baseline.json,
+    and let the testcase fail if they show a performance regression.
+    Run with the environment variable TALE_BENCHMARK_BASELINE=update to store the results as the new baseline.
+    """
+    with io.open(baseline_file, encoding="utf-8") as f:
+        baselines = json.load(f)
+    if os.environ.get("TALE_BENCHMARK_BASELINE") == "update":
+        baselines[name] = results
+        with io.open(baseline_file, "w", encoding="utf-8") as f:
+            f.write(json.dumps(baselines, indent=4, sort_keys=True, ensure_ascii=True) + "\n")
+        return
+    baseline = baselines.get(name, {})
+    for measure, value in sorted(baseline.items()):
+        if measure in results:
+            print("   %s: %s (baseline %s, %.0f%%)" % (measure, results[measure], value, 100 * results[measure] / value), file=sys.stderr)
+    if "commands_per_sec" in baseline:
+        testcase.assertGreaterEqual(results["commands_per_sec"], baseline["commands_per_sec"] / 2,
+                                    "command throughput is less than half of the baseline, this looks like a performance regression")
+    if "bytes_per_object" in baseline:
+        testcase.assertLessEqual(results["bytes_per_object"], baseline["bytes_per_object"] * 2,
+                                 "memory use is more than twice the baseline, this looks like a regression")
+
+
+class Wanderer(object):
+    def __init__(self):
+        self.steps = 0
+
+    def do_wander(self, ctx):
+        self.steps += 1
+
+    def do_rest(self, minutes):
+        self.steps += 1
+
+
+@benchmark
+class TestDeferredsBenchmark(unittest.TestCase):
+    def test_deferreds_fired_per_second(self):
+        now = datetime.datetime(2015, 5, 14, 14, 0, 0)
+        ctx = tale.util.Context(driver=None, clock=None, config=None, player_connection=None)
+        scheduler = the_driver.DeferredScheduler()
+        wanderers = [Wanderer() for _ in range(1000)]
+        amount = 20000
+        for i in range(amount):
+            due = now + datetime.timedelta(seconds=i % 300)
+            wanderer = wanderers[i % len(wanderers)]
+            if i % 2:
+                scheduler.schedule(the_driver.Deferred(due, wanderer.do_wander, [], None))
+            else:
+                scheduler.schedule(the_driver.Deferred(due, wanderer.do_rest, [5], None))
+        start = time.time()
+        fired = 0
+        clock = now
+        while scheduler:
+            for deferred in scheduler.pop_due(clock):
+                deferred(ctx=ctx)
+                fired += 1
+            clock += datetime.timedelta(seconds=5)
+        duration = time.time() - start
+        report("deferreds", fired, duration, "deferreds")
+        self.assertEqual(amount, fired)
+        self.assertEqual(amount, sum(w.steps for w in wanderers))
+
+
+@benchmark
+class TestSoulBenchmark(unittest.TestCase):
+    corpus = [
+        "smile", "smile at max", "grin evilly at kate", "fail kick max", "suddenly cough",
+        "hug kate and max", "pat max on the head", "stroke kate on the shoulder", "ponder", "shrug at kate",
+        "chant 'hello there'", "wave happily at kate and max", "watch max", "ayt max", "poke max in the side",
+        "nod solemnly", "pretend to hug max", "fear max", "stink", "die suddenly"
+    ]
+
+    def setUp(self):
+        tale.mud_context.driver = TestDriver()
+
+    def test_emotes_per_second(self):
+        soul = tale.soul.Soul()
+        player = tale.player.Player("julie", "f")
+        room = tale.base.Location("somewhere")
+        player.move(room)
+        room.insert(tale.npc.NPC("max", "m"), None)
+        room.insert(tale.npc.NPC("kate", "f"), None)
+        parsed = [soul.parse(player, cmd) for cmd in self.corpus]
+        amount = 20000
+        start = time.time()
+        for i in range(amount):
+            soul.process_verb_parsed(player, parsed[i % len(parsed)])
+        duration = time.time() - start
+        report("soul emotes", amount, duration, "emotes")
+
+
+@benchmark
+class TestTabCompletionBenchmark(unittest.TestCase):
+    def test_completions_per_second(self):
+        driver = TestDriver()
+        tale.mud_context.driver = driver
+        player = tale.player.Player("julie", "f")
+        room = tale.base.Location("market")
+        player.move(room)
+        for i in range(300):
+            room.insert(tale.base.Item("crate%d" % i), None)
+            room.insert(tale.npc.NPC("trader%d" % i, "m"), None)
+        conn = tale.player.PlayerConnection(player)
+        conn.io = IoAdapterBase(conn)
+        prefixes = ["c", "cr", "crate1", "tr", "trader29", "sm", "l", "q", "x"]
+        amount = 5000
+        start = time.time()
+        for i in range(amount):
+            conn.io.tab_complete(prefixes[i % len(prefixes)], driver)
+        duration = time.time() - start
+        report("tab completion", amount, duration, "completions")
+        self.assertIn("crate150", conn.io.tab_complete("crate15", driver))
+
+
+@benchmark
+class TestVerbRoutingBenchmark(unittest.TestCase):
+    def test_notifications_per_second(self):
+        tale.mud_context.driver = TestDriver()
+        player = tale.player.Player("julie", "f")
+        room = tale.base.Location("market")
+        player.move(room)
+        for i in range(200):
+            room.insert(tale.base.Item("crate%d" % i), None)
+            npc = tale.npc.NPC("trader%d" % i, "m")
+            npc.insert(tale.base.Item("coin"), npc)
+            room.insert(npc, None)
+        verbs = ["smile", "look", "take", "nod", "pull", "push"]
+        amount = 20000
+        start = time.time()
+        for i in range(amount):
+            parsed = tale.soul.ParseResult(verbs[i % len(verbs)])
+            room.handle_verb(parsed, player)
+            room.notify_action(parsed, player)
+        duration = time.time() - start
+        report("verb routing in a busy room", amount, duration, "commands")
+
+
+@benchmark
+class TestCloneBenchmark(unittest.TestCase):
+    """Clones per second of typical items and npcs, compared with a plain copy.deepcopy of them."""
+    amount = 5000
+
+    def setUp(self):
+        tale.mud_context.driver = TestDriver()
+        self.room = tale.base.Location("workshop")
+
+    def test_item(self):
+        item = tale.base.Item("lantern", "brass lantern", "A dented brass lantern. It still works.")
+        item.aliases = {"lamp", "light"}
+        item.add_extradesc({"dent"}, "Someone must have dropped it.")
+        item.value = 12.5
+        self.room.insert(item, None)
+        self.clones_per_second("item", item)
+
+    def test_npc(self):
+        npc = tale.npc.NPC("guard", "m", race="human", title="city guard", description="He looks bored.")
+        npc.aliases = {"soldier"}
+        npc.verbs = {"salute": "salute the guard"}
+        self.room.insert(npc, None)
+        self.clones_per_second("npc", npc)
+
+    def clones_per_second(self, kind, obj):
+        start = time.time()
+        for _ in range(self.amount):
+            duplicate = tale.base.clone(obj)
+        duration = time.time() - start
+        report(kind + " clone", self.amount, duration, "clones")
+        self.assertIs(self.room, duplicate.location)
+        self.assertEqual(obj.aliases, duplicate.aliases)
+        self.assertIsNot(obj.aliases, duplicate.aliases)
+        location, obj.location = obj.location, None   # how clone() used to do it: deepcopy without the location
+        start = time.time()
+        for _ in range(self.amount):
+            copy.deepcopy(obj)
+        duration = time.time() - start
+        obj.location = location
+        print("   copy.deepcopy: %.0f clones/sec." % (self.amount / duration), file=sys.stderr)
+
+
+def load_command_corpus(story):
+    """the commands for the given story from the recorded corpus in benchmark_commands.txt"""
+    with io.open(os.path.join(os.path.dirname(__file__), "benchmark_commands.txt"), encoding="utf-8") as corpus:
+        commands = {}
+        section = None
+        for line in corpus:
+            line = line.strip()
+            if line.startswith("[") and line.endswith("]"):
+                section = commands.setdefault(line[1:-1], [])
+            elif line and not line.startswith("#"):
+                section.append(line)
+    return commands[story]
+
+
+@benchmark
+class TestCommandDispatchBenchmark(unittest.TestCase):
+    """
+    Replays the recorded command corpus through the driver's command processing, in the demo and circle stories.
+    Reports the throughput, the time spent per phase, and the memory allocations, and compares the
+    numbers with the stored baseline in benchmark_baseline.json.
+    Run with the environment variable TALE_BENCHMARK_BASELINE=update to store the new numbers as baseline.
+    """
+    rounds = 20
+
+    def setUp(self):
+        self.driver = TestDriver()
+
+    def tearDown(self):
+        if self.driver.story_directory:
+            self.driver.unload_story()
+
+    def test_demo(self):
+        self.replay_corpus("demo")
+
+    def test_circle(self):
+        self.replay_corpus("circle")
+
+    def replay_corpus(self, story):
+        commands = load_command_corpus(story)
+        self.driver.load_story(os.path.join(os.path.dirname(tale.__file__), "../stories", story))
+        conn = self.driver.connect_player("bench")
+        conn.player.money = 1000.0
+        start_location = conn.player.location
+        phases = dict.fromkeys(["parse", "dispatch", "notify", "render"], 0.0)
+        parse = conn.player.parse
+
+        def timed_parse(*args, **kwargs):
+            parse_start = time.time()
+            try:
+                return parse(*args, **kwargs)
+            finally:
+                phases["parse"] += time.time() - parse_start
+
+        conn.player.parse = timed_parse
+        errors = 0
+        start = time.time()
+        for _ in range(self.rounds):
+            for cmd in commands:
+                dispatch_start = time.time()
+                if self.driver.process_player_command(cmd, conn):
+                    errors += 1
+                pubsub.sync("driver-async-dialogs")
+                notify_start = time.time()
+                pubsub.sync("driver-pending-actions")
+                render_start = time.time()
+                pubsub.sync("driver-pending-tells")
+                conn.get_output()
+                phases["dispatch"] += notify_start - dispatch_start
+                phases["notify"] += render_start - notify_start
+                phases["render"] += time.time() - render_start
+        duration = time.time() - start
+        phases["dispatch"] -= phases["parse"]
+        del conn.player.parse
+        self.assertIs(start_location, conn.player.location, "the corpus must end where it started")
+        amount = self.rounds * len(commands)
+        report(story + " command dispatch", amount, duration, "commands")
+        print("   time per phase: " + ", ".join("%s %.0f%%" % (phase, 100 * phases[phase] / duration) for phase in sorted(phases)) +
+              ", refused/failed commands: %d%%" % (100 * errors / amount), file=sys.stderr)
+        results = {"commands_per_sec": round(amount / duration)}
+        if tracemalloc:
+            tracemalloc.start()
+            snapshot = tracemalloc.take_snapshot()
+            for cmd in commands:
+                self.driver.process_player_command(cmd, conn)
+                pubsub.sync()
+                conn.get_output()
+            blocks = sum(stat.count_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename"))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results["blocks_per_command"] = round(blocks / len(commands), 1)
+            print("   allocations: %.1f blocks retained per command, %.0f Kb peak" % (results["blocks_per_command"], peak / 1024), file=sys.stderr)
+        compare_baseline(self, story, results)
+
+
+def world_objects(locations):
+    """all objects in the world: the locations, their exits, and everything in them (recursively)"""
+    objects = set(locations)
+    for location in locations:
+        objects.update(location.exits.values())
+        contents = list(location.livings | location.items)
+        while contents:
+            obj = contents.pop()
+            objects.add(obj)
+            try:
+                contents.extend(obj.inventory)
+            except ActionRefused:
+                pass    # not a container
+    return objects
+
+
+def object_memory(objects, seen):
+    """
+    The memory used by the objects themselves: the instance, its attribute dict, its names and descriptions
+    and the collections it owns. Things that are shared between objects are only counted once (the ids in seen).
+    """
+    total = 0
+    for obj in objects:
+        parts = [obj, getattr(obj, "__dict__", None), obj.name, obj._title, obj._description, obj._short_description,
+                 obj._aliases, obj._verbs, obj._extradesc]
+        if isinstance(obj, tale.base.Living):
+            parts += [obj.stats, getattr(obj.stats, "__dict__", None), obj.stats.stat_prios]
+            parts += list((obj.stats.stat_prios or {}).values())
+        for part in parts:
+            if part is not None and id(part) not in seen:
+                seen.add(id(part))
+                total += sys.getsizeof(part)
+    return total
+
+
+@benchmark
+class TestWorldMemoryBenchmark(unittest.TestCase):
+    """
+    Reports the memory used by the objects of the fully loaded circle world, and compares
+    the bytes per object with the stored baseline in benchmark_baseline.json.
+    """
+    def setUp(self):
+        self.driver = TestDriver()
+
+    def tearDown(self):
+        self.driver.unload_story()
+
+    def test_circle_world(self):
+        start = time.time()
+        self.driver.load_story(os.path.join(os.path.dirname(tale.__file__), "../stories", "circle"))
+        duration = time.time() - start
+        objects = world_objects(list(self.driver.zones.converted_rooms.values()))
+        kinds = [("rooms", tale.base.Location), ("exits", tale.base.Exit), ("items", tale.base.Item), ("mobs", tale.base.Living)]
+        seen = set()
+        total = 0
+        details = []
+        for kind, cls in kinds:
+            selection = [obj for obj in objects if isinstance(obj, cls)]
+            size = object_memory(selection, seen)
+            total += size
+            details.append("%d %s %.0f" % (len(selection), kind, size / len(selection)))
+        self.assertEqual(len(objects), sum(int(detail.split()[0]) for detail in details))
+        print("\nbenchmark circle world: %d objects loaded in %.3f sec." % (len(objects), duration), file=sys.stderr)
+        print("   bytes per object: " + ", ".join(details), file=sys.stderr)
+        if resource:
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            max_rss /= 1024 * 1024 if sys.platform == "darwin" else 1024    # bytes on osx, Kb on linux
+            print("   process max RSS: %.0f Mb" % max_rss, file=sys.stderr)
+        compare_baseline(self, "circle_world", {"bytes_per_object": round(total / len(objects))})
+
+
+@benchmark
+class TestStartupBenchmark(unittest.TestCase):
+    """
+    Startup times of the circle story: a cold start that parses all circle data files,
+    a warm start that uses the parsed data that the cold start cached in the user data directory,
+    and the same two with the real driver in --verify mode (which includes starting the interpreter).
+    """
+    def setUp(self):
+        self.user_data_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.user_data_directory, ignore_errors=True)
+
+    def test_circle_startup(self):
+        story = os.path.join(os.path.dirname(tale.__file__), "../stories", "circle")
+        durations = []
+        for _ in range(2):
+            driver = TestDriver()
+            start = time.time()
+            driver.load_story(story, user_data_directory=self.user_data_directory)
+            durations.append(time.time() - start)
+            driver.unload_story()
+        self.assertTrue(any(name.endswith(".cache") for name in os.listdir(self.user_data_directory)))
+        print("\nbenchmark circle startup: cold %.3f sec., warm %.3f sec." % tuple(durations), file=sys.stderr)
+        if sys.platform.startswith("linux"):
+            # the driver puts its user data in $XDG_DATA_HOME on linux, so it won't touch the real user data directory
+            env = dict(os.environ, XDG_DATA_HOME=self.user_data_directory,
+                       PYTHONPATH=os.pathsep.join([os.path.dirname(os.path.dirname(tale.__file__)), os.environ.get("PYTHONPATH", "")]))
+            durations = []
+            for _ in range(2):
+                start = time.time()
+                output = subprocess.check_output([sys.executable, "-m", "tale.main", "--game", story, "--verify"], env=env, stderr=subprocess.STDOUT)
+                durations.append(time.time() - start)
+                self.assertIn(b"Verified", output)
+            print("   --verify: cold %.3f sec., warm %.3f sec." % tuple(durations), file=sys.stderr)
+
+
+class TestCircleParsingBenchmark(unittest.TestCase):
+    """Parsing the circle data files serially and in parallel, in a pool of worker processes."""
+    def setUp(self):
+        self.story = os.path.join(os.path.dirname(tale.__file__), "../stories", "circle")
+        sys.path.insert(0, self.story)
+        self.loader = __import__("zones.circledata.loader", fromlist=["loader"], level=0)
+
+    def tearDown(self):
+        sys.path.remove(self.story)
+        for m in list(sys.modules.keys()):
+            if m.startswith("zones"):
+                del sys.modules[m]
+
+    def parsed_data(self):
+        return [getattr(module, name) for _, module, name, _ in self.loader.datasets]
+
+    @benchmark
+    def test_serial_and_parallel(self):
+        durations = []
+        results = []
+        for parallel in (False, True):
+            for parsed in self.parsed_data():
+                parsed.clear()
+            start = time.time()
+            self.loader.parse_data_files(parallel)
+            durations.append(time.time() - start)
+            results.append([sorted(parsed) for parsed in self.parsed_data()])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual([569, 678, 46, 1878, 30], [len(vnums) for vnums in results[0]])
+        print("\nbenchmark circle data parsing: serial %.3f sec., parallel %.3f sec. (%d cpus)" %
+              (durations[0], durations[1], multiprocessing.cpu_count()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Unit tests for the loader of the circle story's data files
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+import unittest
+import os
+import sys
+import tale
+
+
+def contents(value):
+    """the parsed data as plain dicts and lists, so that it can be compared (the parsed objects have no __eq__)"""
+    if isinstance(value, dict):
+        return dict((key, contents(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [contents(item) for item in value]
+    if hasattr(value, "__dict__"):
+        return (type(value).__name__, contents(vars(value)))
+    return value
+
+
+class TestCircleLoader(unittest.TestCase):
+    def setUp(self):
+        self.story = os.path.abspath(os.path.join(os.path.dirname(tale.__file__), "../stories/circle"))
+        sys.path.insert(0, self.story)
+        self.loader = __import__("zones.circledata.loader", fromlist=["loader"], level=0)
+
+    def tearDown(self):
+        sys.path.remove(self.story)
+        for m in list(sys.modules.keys()):
+            if m.startswith("zones"):
+                del sys.modules[m]
+
+    def parse(self, parallel):
+        for _, module, name, _ in self.loader.datasets:
+            getattr(module, name).clear()
+        self.loader.parse_data_files(parallel)
+        return [contents(getattr(module, name)) for _, module, name, _ in self.loader.datasets]
+
+    def test_serial_and_parallel(self):
+        serial = self.parse(False)
+        parallel = self.parse(True)
+        self.assertEqual([569, 678, 46, 1878, 30], [len(parsed) for parsed in serial])
+        self.assertEqual(serial, parallel)
+
+    def test_duplicate_vnums(self):
+        data_files = self.loader.data_files
+        files = data_files()
+        self.loader.data_files = lambda: files + [kind_path for kind_path in files if kind_path[0] == "shp"][:1]
+        try:
+            with self.assertRaises(ValueError) as x:
+                self.loader.parse_data_files(parallel=False)
+        finally:
+            self.loader.data_files = data_files
+        self.assertIn("occurs in both", str(x.exception))
+        self.assertIs(data_files, self.loader.data_files)
+
+
+if __name__ == "__main__":
+    unittest.main()
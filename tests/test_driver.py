@@ -8,18 +8,24 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 from __future__ import absolute_import, print_function, division, unicode_literals
 import unittest
 import heapq
+import json
 import datetime
 import os
 import inspect
 import pickle
+import threading
+import time
 import tale.driver as the_driver
 import tale.cmds.normal
 import tale.cmds.wizard
 import tale.base
 import tale.util
 import tale.demo
+import tale.player
+import tale.perf
+from tale import mud_context
 from tale.cmds.decorators import cmd, wizcmd, disabled_in_gamemode
-from tests.supportstuff import Thing
+from tests.supportstuff import Thing, TestDriver
 
 
 def module_level_func(ctx):
@@ -54,7 +60,7 @@ class TestDeferreds(unittest.TestCase):
         with self.assertRaises(ValueError):
             driver.defer("blerp", thing.move)
         driver.defer(3601, thing.move)
-        deferred = driver.deferreds[0]
+        deferred = list(driver.deferreds)[0]
         after = deferred.due - now
         self.assertEqual(3601, after.seconds)
 
@@ -65,7 +71,7 @@ class TestDeferreds(unittest.TestCase):
         driver.game_clock = tale.util.GameDateTime(now, 1)
         due = driver.game_clock.plus_realtime(datetime.timedelta(seconds=3601))
         driver.defer(due, thing.move)
-        deferred = driver.deferreds[0]
+        deferred = list(driver.deferreds)[0]
         after = deferred.due - now
         self.assertEqual(3601, after.seconds)
 
@@ -104,6 +110,16 @@ class TestDeferreds(unittest.TestCase):
         with self.assertRaises(ValueError):
             d = the_driver.Deferred(None, lambda a, ctx=None: 1, [42], None)
 
+    def testCallableAfterSerialization(self):
+        t = Thing()
+        d = the_driver.Deferred(None, t.append, [42], None)
+        d = pickle.loads(pickle.dumps(d, pickle.HIGHEST_PROTOCOL))
+        self.assertNotIn("_func", vars(d), "resolved callable must not be serialized")
+        owner = d.owner
+        ctx = tale.util.Context(driver="driver", clock=None, config=None, player_connection=None)
+        d(ctx=ctx)
+        self.assertEqual([42], owner.x)
+
     def testSerializable(self):
         target = Thing()
         deferreds = [the_driver.Deferred(datetime.datetime.now(), target.append, [1, 2, 3], {"kwarg": 42}),
@@ -113,6 +129,61 @@ class TestDeferreds(unittest.TestCase):
         data = pickle.loads(ser)
         self.assertEqual(deferreds, data)
 
+    def testScheduler(self):
+        t1 = datetime.datetime(1995, 1, 1)
+        t2 = datetime.datetime(1995, 1, 1, 0, 0, 0, 500000)
+        t3 = datetime.datetime(1995, 1, 1, 0, 0, 1)
+        t4 = datetime.datetime(1995, 1, 1, 0, 0, 30)
+        target = Thing()
+        d1 = the_driver.Deferred(t4, target.append, [1], None)
+        d2 = the_driver.Deferred(t3, os.getcwd, None, None)
+        d3 = the_driver.Deferred(t2, os.getcwd, None, None)
+        d4 = the_driver.Deferred(t1, target.append, [4], None)
+        scheduler = the_driver.DeferredScheduler([d1, d2, d3])
+        scheduler.schedule(d4)
+        self.assertEqual(4, len(scheduler))
+        self.assertEqual([d4], scheduler.pop_due(t1))
+        self.assertEqual([], scheduler.pop_due(t1))
+        self.assertEqual([d3, d2], scheduler.pop_due(t3))
+        self.assertEqual(1, len(scheduler))
+        self.assertEqual([], scheduler.pop_due(t3))
+        self.assertEqual([d1], scheduler.pop_due(datetime.datetime(2000, 1, 1)))
+        self.assertEqual(0, len(scheduler))
+        self.assertEqual([], list(scheduler))
+
+    def testSchedulerRemoveOwner(self):
+        now = datetime.datetime(1995, 1, 1)
+        target1 = Thing()
+        target2 = Thing()
+        scheduler = the_driver.DeferredScheduler()
+        for seconds in range(100):
+            due = now + datetime.timedelta(seconds=seconds)
+            scheduler.schedule(the_driver.Deferred(due, target1.append, [seconds], None))
+            scheduler.schedule(the_driver.Deferred(due, target2.append, [seconds], None))
+        self.assertEqual(200, len(scheduler))
+        scheduler.remove_owner(target1)
+        self.assertEqual(100, len(scheduler))
+        scheduler.remove_owner(target1)
+        self.assertEqual(100, len(scheduler))
+        due = scheduler.pop_due(now + datetime.timedelta(seconds=200))
+        self.assertEqual(100, len(due))
+        self.assertTrue(all(d.owner is target2 for d in due))
+        self.assertEqual(0, len(scheduler))
+
+    def testSchedulerSerializable(self):
+        now = datetime.datetime(1995, 1, 1)
+        target = Thing()
+        deferreds = [the_driver.Deferred(now + datetime.timedelta(seconds=s), target.append, [s], None) for s in (5, 1, 3)]
+        scheduler = the_driver.DeferredScheduler(deferreds)
+        data = pickle.loads(pickle.dumps(scheduler, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(3, len(data))
+        self.assertEqual(sorted(deferreds), sorted(data))
+        due = data.pop_due(now + datetime.timedelta(seconds=10))
+        self.assertEqual([1, 3, 5], [d.vargs[0] for d in due])
+        data = pickle.loads(pickle.dumps(scheduler, pickle.HIGHEST_PROTOCOL))
+        data.remove_owner(list(data)[0].owner)   # the owner index must have been rebuilt as well
+        self.assertEqual(0, len(data))
+
     def testDue_realtime(self):
         # test due timings where the gameclock == realtime clock
         game_clock = tale.util.GameDateTime(datetime.datetime(2013, 7, 18, 15, 29, 59, 123))
@@ -165,6 +236,227 @@ class TestVarious(unittest.TestCase):
         d.start(["--game", gamedir, "--verify"])
 
 
+class Beater(object):
+    heartbeat_interval = 1
+    heartbeat_phase = None
+
+    def __init__(self, interval=1, phase=None):
+        self.heartbeat_interval = interval
+        self.heartbeat_phase = phase
+
+
+class TestHeartbeats(unittest.TestCase):
+    def test_every_tick(self):
+        beaters = [Beater() for _ in range(10)]
+        hb = the_driver.HeartbeatScheduler(beaters)
+        self.assertEqual(10, len(hb))
+        self.assertTrue(beaters[0] in hb)
+        for _ in range(3):
+            self.assertEqual(set(beaters), set(hb.next_tick()))
+        hb.discard(beaters[0])
+        hb.discard(beaters[0])
+        self.assertEqual(9, len(hb))
+        self.assertFalse(beaters[0] in hb)
+        self.assertEqual(set(beaters[1:]), set(hb.next_tick()))
+
+    def test_intervals_spread(self):
+        beaters = [Beater(interval=5) for _ in range(100)]
+        hb = the_driver.HeartbeatScheduler(beaters)
+        beaten = []
+        for _ in range(5):
+            due = hb.next_tick()
+            self.assertEqual(20, len(due), "heartbeats must be spread evenly over the interval")
+            beaten.extend(due)
+        self.assertEqual(set(beaters), set(beaten))
+        self.assertEqual(100, len(beaten))
+
+    def test_fixed_phase(self):
+        beater1 = Beater(interval=3, phase=2)
+        beater2 = Beater()
+        hb = the_driver.HeartbeatScheduler([beater1, beater2])
+        self.assertEqual([beater2], hb.next_tick())
+        self.assertEqual([beater2], hb.next_tick())
+        self.assertEqual({beater1, beater2}, set(hb.next_tick()))
+        self.assertEqual([beater2], hb.next_tick())
+
+    def test_serializable(self):
+        hb = the_driver.HeartbeatScheduler([tale.base.Item("thing"), tale.base.Item("thing2")])
+        hb.next_tick()
+        hb = pickle.loads(pickle.dumps(hb, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(2, len(hb))
+        self.assertEqual({"thing", "thing2"}, {obj.name for obj in hb.next_tick()})
+
+    def test_decorator(self):
+        @tale.base.heartbeat
+        class Beater1(tale.base.Item):
+            pass
+
+        @tale.base.heartbeat(interval=4, phase=1)
+        class Beater2(tale.base.Item):
+            pass
+        self.assertTrue(Beater1._register_heartbeat)
+        self.assertEqual(1, Beater1.heartbeat_interval)
+        self.assertIsNone(Beater1.heartbeat_phase)
+        self.assertTrue(Beater2._register_heartbeat)
+        self.assertEqual(4, Beater2.heartbeat_interval)
+        self.assertEqual(1, Beater2.heartbeat_phase)
+        self.assertEqual(1, tale.base.Item.heartbeat_interval)
+        with self.assertRaises(ValueError):
+            tale.base.heartbeat(interval=0)
+        with self.assertRaises(ValueError):
+            tale.base.heartbeat(interval=4, phase=4)
+
+
+class WaitWatcher(object):
+    heartbeat_interval = 100
+    heartbeat_phase = 10
+
+    def __init__(self, conn=None):
+        self.conn = conn
+        self.beats = []
+        self.events = []
+
+    def heartbeat(self, ctx):
+        self.beats.append(ctx.clock.clock)
+
+    def event(self, ctx=None):
+        self.events.append(ctx.clock.clock)
+        if self.conn:
+            self.conn.pending_output = True
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.player = tale.player.Player("julie", "f")
+        self.player.location = tale.base.Location("somewhere")
+        self.io = True
+        self.pending_output = False
+
+    def write_output(self):
+        output, self.pending_output = self.pending_output, False
+        return output
+
+
+class TestWait(unittest.TestCase):
+    def setUp(self):
+        self.driver = TestDriver()
+        self.driver.config = the_driver.StoryConfig(**dict.fromkeys(the_driver.StoryConfig.config_items))
+        self.driver.config.server_mode = "if"
+        self.driver.config.server_tick_time = 1.0
+        self.driver.config.gametime_to_realtime = 5
+        self.start = datetime.datetime(2016, 1, 1, 12, 0, 0)
+        self.driver.game_clock = tale.util.GameDateTime(self.start, 5)
+        mud_context.driver = self.driver
+        mud_context.config = self.driver.config
+
+    def tearDown(self):
+        mud_context.driver = mud_context.config = None
+
+    def test_too_short(self):
+        self.assertEqual((False, "It's no use waiting such a short while."), self.driver.do_wait(datetime.timedelta(seconds=4)))
+        self.assertEqual(self.start, self.driver.game_clock.clock)
+
+    def test_fast_forward_same_as_ticking(self):
+        # waiting an hour is 720 ticks of 5 game seconds, but only a few of them are actually done
+        watcher = WaitWatcher()
+        self.driver.register_heartbeat(watcher)
+        self.driver.defer(datetime.datetime(2016, 1, 1, 12, 16, 40), watcher.event)
+        self.driver.defer(datetime.datetime(2016, 1, 1, 12, 30, 2), watcher.event)
+        self.driver.tick_profiler.reset()
+        self.assertEqual((True, None), self.driver.do_wait(datetime.timedelta(hours=1)))
+        self.assertEqual(self.start + datetime.timedelta(hours=1), self.driver.game_clock.clock)
+        self.assertLess(self.driver.tick_profiler.phases["server tick"].count, 20)
+        # now do the same with a regular tick for every step
+        beats, events = watcher.beats, watcher.events
+        watcher.beats, watcher.events = [], []
+        self.driver.game_clock = tale.util.GameDateTime(self.start, 5)
+        self.driver.heartbeat_objects = the_driver.HeartbeatScheduler([watcher])
+        self.driver.defer(datetime.datetime(2016, 1, 1, 12, 16, 40), watcher.event)
+        self.driver.defer(datetime.datetime(2016, 1, 1, 12, 30, 2), watcher.event)
+        for _ in range(720):
+            self.driver._Driver__server_tick()
+        self.assertEqual(8, len(watcher.beats))
+        self.assertEqual(watcher.beats, beats)
+        self.assertEqual([datetime.datetime(2016, 1, 1, 12, 16, 40), datetime.datetime(2016, 1, 1, 12, 30, 5)], watcher.events)
+        self.assertEqual(watcher.events, events)
+
+    def test_interrupted(self):
+        conn = FakeConnection()
+        self.driver.all_players["julie"] = conn
+        watcher = WaitWatcher(conn)
+        self.driver.defer(datetime.datetime(2016, 1, 1, 12, 10, 0), watcher.event)
+        ok, message = self.driver.do_wait(datetime.timedelta(hours=1))
+        self.assertFalse(ok)
+        self.assertEqual("You stop waiting after 10 minutes, because something happened.", message)
+        self.assertEqual(self.start + datetime.timedelta(minutes=10), self.driver.game_clock.clock)
+
+
+class TestIdlePlayers(unittest.TestCase):
+    def setUp(self):
+        self.driver = TestDriver()
+        self.driver.config = the_driver.StoryConfig(**dict.fromkeys(the_driver.StoryConfig.config_items))
+        self.driver.config.server_mode = "mud"
+        self.disconnected = []
+        self.driver._disconnect_mud_player = self.disconnected.append
+        mud_context.driver = self.driver
+        mud_context.config = self.driver.config
+
+    def tearDown(self):
+        mud_context.driver = mud_context.config = None
+
+    def connect(self, name, idle_time):
+        conn = tale.player.PlayerConnection(tale.player.Player(name, "f"), True)
+        conn.player.location = tale.base.Location("somewhere")
+        conn.player.last_input_time = time.time() - idle_time
+        self.driver.all_players[name] = conn
+        self.driver._Driver__schedule_idle_check(conn)
+        return conn
+
+    def test_idle_deadlines(self):
+        idler = self.connect("idler", 40 * 60)
+        busy = self.connect("busy", 10)
+        gone = self.connect("gone", 40 * 60)
+        del self.driver.all_players["gone"]
+        self.assertEqual(3, len(self.driver.idle_check_deadlines))
+        self.driver._Driver__check_idle_players()
+        self.assertEqual([], self.disconnected, "deadlines are at least a second in the future")
+        for i, (deadline, key, conn) in enumerate(self.driver.idle_check_deadlines):
+            self.driver.idle_check_deadlines[i] = (deadline - 1, key, conn)
+        self.driver._Driver__check_idle_players()
+        self.assertEqual([idler], self.disconnected)
+        self.assertEqual(1, len(self.driver.idle_check_deadlines))
+        deadline, _, conn = self.driver.idle_check_deadlines[0]
+        self.assertIs(busy, conn)
+        self.assertGreater(deadline, time.time() + 50)
+        busy.player.last_input_time -= 31 * 60
+        self.driver._Driver__check_idle_players()
+        self.assertEqual([idler], self.disconnected, "busy player's deadline is not yet due")
+
+
+class TestPlayerInputWakeup(unittest.TestCase):
+    def setUp(self):
+        self.driver = TestDriver()
+        mud_context.driver = self.driver
+
+    def test_store_input_notifies_driver(self):
+        player = tale.player.Player("julie", "f")
+        self.assertEqual(set(), self.driver._players_with_input)
+        player.store_input_line("look")
+        player.store_input_line("smile")
+        self.assertEqual({player}, self.driver._players_with_input)
+
+    def test_wait_for_input(self):
+        player = tale.player.Player("julie", "f")
+        self.assertEqual(set(), self.driver._Driver__wait_for_player_input(0.01))
+        timer = threading.Timer(0.05, player.store_input_line, ["look"])
+        timer.start()
+        start = time.time()
+        self.assertEqual({player}, self.driver._Driver__wait_for_player_input(5.0))
+        self.assertLess(time.time() - start, 2.0)
+        self.assertEqual(set(), self.driver._players_with_input)
+        timer.join()
+
+
 @cmd
 @disabled_in_gamemode("if")
 def func1(player, parsed, ctx):
@@ -209,6 +501,71 @@ class TestCommands(unittest.TestCase):
         wiz = self.cmds.get([None])
         self.assertEqual({"verb2"}, set(wiz.keys()))
 
+    def testCommandsCached(self):
+        wiz = self.cmds.get({"wizard"})
+        self.assertIs(wiz, self.cmds.get(["wizard"]))
+        self.assertIsNot(wiz, self.cmds.get([]))
+        self.cmds.add("verb5", func1, "wizard")
+        self.assertIn("verb5", self.cmds.get({"wizard"}))
+        self.assertNotIn("verb5", self.cmds.get([]))
+        self.cmds.override("verb5", func2, "wizard")
+        self.assertIs(func2, self.cmds.get({"wizard"})["verb5"])
+
+
+class TestTickProfiler(unittest.TestCase):
+    def testPercentiles(self):
+        timings = tale.perf.PhaseTimings(window=100)
+        self.assertEqual({"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}, timings.percentiles())
+        for duration in range(200, 0, -1):
+            timings.add(duration)
+        self.assertEqual(200, timings.count)
+        self.assertEqual(100, len(timings.durations), "only the rolling window must be kept")
+        p = timings.percentiles()
+        self.assertEqual(50, p["p50"])
+        self.assertEqual(95, p["p95"])
+        self.assertEqual(99, p["p99"])
+        self.assertEqual(100, p["max"])
+
+    def testSlowest(self):
+        profiler = tale.perf.TickProfiler()
+        for i in range(20):
+            profiler.deferreds["action%d" % i].add(i)
+        profiler.deferreds["action3"].add(2)
+        slowest = profiler.slowest(profiler.deferreds, 5)
+        self.assertEqual(["action19", "action18", "action17", "action16", "action15"], [name for name, t in slowest])
+        timings = profiler.deferreds["action3"]
+        self.assertEqual((2, 5, 3), (timings.count, timings.total, timings.max))
+
+    def testDescriptions(self):
+        profiler = tale.perf.TickProfiler()
+        deferred = the_driver.Deferred(None, os.path.join, [], {})
+        key = profiler.deferred_key(deferred)
+        self.assertEqual(("module:" + os.path.join.__module__, "join"), key)
+        self.assertEqual("module:" + os.path.join.__module__ + ".join", profiler.describe_deferred(key))
+        thing = tale.base.Item("key")
+        deferred = the_driver.Deferred(None, thing.init, [], {})
+        key = profiler.deferred_key(deferred)
+        self.assertEqual((tale.base.Item, "init"), key)
+        self.assertEqual("Item.init", profiler.describe_deferred(key))
+        profiler.heartbeat_done(thing, tale.perf.timer())
+        self.assertEqual([(tale.base.Item, "key")], list(profiler.heartbeats))
+        self.assertEqual("Item 'key'", profiler.describe_heartbeat((tale.base.Item, "key")))
+
+    def testStatsJson(self):
+        profiler = tale.perf.TickProfiler()
+        start = tale.perf.timer()
+        now = profiler.phase_done("heartbeats", start)
+        self.assertGreaterEqual(now, start)
+        profiler.deferred_done(("Thing", "action"), start)
+        stats = json.loads(json.dumps(profiler.stats()))
+        self.assertEqual(set(profiler.phase_names), set(stats["phases"]))
+        self.assertEqual(1, stats["phases"]["heartbeats"]["count"])
+        self.assertEqual(0, stats["phases"]["deferreds"]["count"])
+        self.assertEqual("Thing.action", stats["slowest_deferreds"][0]["name"])
+        self.assertEqual([], stats["slowest_heartbeats"])
+        profiler.reset()
+        self.assertEqual(0, profiler.stats()["phases"]["heartbeats"]["count"])
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
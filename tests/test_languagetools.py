@@ -68,6 +68,8 @@ class TestLanguagetools(unittest.TestCase):
 
     def testAdverbs(self):
         self.assertTrue(len(lang.ADVERB_LIST) > 0)
+        self.assertEqual("abjectly", lang.ADVERB_LIST[0])
+        self.assertEqual(sorted(lang.ADVERBS), list(lang.ADVERB_LIST))
         self.assertTrue("noisily" in lang.ADVERBS)
         self.assertFalse("zzzzzzzzzz" in lang.ADVERBS)
         self.assertEqual(['nobly', 'nocturnally', 'noiselessly', 'noisily', 'nominally'], lang.adverb_by_prefix("no", 5))
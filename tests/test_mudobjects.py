@@ -9,8 +9,8 @@ from __future__ import print_function, division, unicode_literals, absolute_impo
 import unittest
 import datetime
 from tests.supportstuff import TestDriver, MsgTraceNPC, Wiretap
-from tale.base import Location, Exit, Item, Living, MudObject, _limbo, Container, Weapon, Door, Key, clone
-from tale.util import Context, MoneyFormatter
+from tale.base import Location, Exit, Item, Living, MudObject, _limbo, Container, Weapon, Door, Key, clone, ALL_VERBS
+from tale.util import Context, MoneyFormatter, FrozenDict
 from tale.errors import ActionRefused, LocationIntegrityError
 from tale.npc import NPC
 from tale.player import Player
@@ -49,11 +49,64 @@ class TestLocations(unittest.TestCase):
         self.player.insert(self.bag, self.player)
         self.hall.init_inventory([self.table, self.key, self.magazine, self.magazine2, self.rat, self.rat2, self.julie, self.player, self.fly])
 
+    def test_name_index(self):
+        self.assertIs(self.julie, self.hall.livings_index.find("chick"))
+        self.assertIs(self.julie, self.hall.search_living("attractive julie"))
+        self.assertIs(self.table, self.hall.items_index.find("table"))
+        self.assertIs(self.pencil, self.player.inventory_index.find("pen"))
+        self.assertIsNone(self.hall.items_index.find("pencil"))
+        self.julie.aliases = {"girl"}
+        self.assertIsNone(self.hall.livings_index.find("chick"))
+        self.assertIs(self.julie, self.hall.livings_index.find("girl"))
+        self.julie.aliases |= {"lady"}
+        self.assertIs(self.julie, self.hall.livings_index.find("lady"))
+        self.julie.aliases.add("kat")
+        self.assertIs(self.julie, self.hall.livings_index.find("kat"), "in place changes must update the index")
+        self.julie.aliases.discard("girl")
+        self.assertIsNone(self.hall.livings_index.find("girl"))
+        julie2 = clone(self.julie)
+        julie2.aliases.add("jules")
+        self.assertIsNone(self.hall.livings_index.find("jules"), "the clone's aliases are its own")
+        self.assertEqual({"lady", "kat"}, self.julie.aliases)
+        self.table.init_names("desk", "old desk", "an old desk", None)
+        self.assertIsNone(self.hall.items_index.find("table"))
+        self.assertIs(self.table, self.hall.items_index.find("desk"))
+        self.pencil.title = "red pen"
+        self.assertIs(self.pencil, self.player.search_item("red pen"))
+        self.julie.move(self.attic, silent=True)
+        self.assertIsNone(self.hall.livings_index.find("julie"))
+        self.assertIs(self.julie, self.attic.livings_index.find("julie"))
+        self.hall.remove(self.table, None)
+        self.assertIsNone(self.hall.items_index.find("desk"))
+        self.player.remove(self.pencil, self.player)
+        self.assertIsNone(self.player.inventory_index.find("pen"))
+        self.attic.livings = [self.rat]
+        self.assertIs(self.rat, self.attic.livings_index.find("rat"))
+        self.assertIsNone(self.attic.livings_index.find("julie"))
+
+    def test_default_aliases(self):
+        self.assertEqual(set(), self.rat.aliases)
+        self.rat.aliases.add("rodent")
+        self.assertEqual(set(), self.rat2.aliases, "objects must not share their aliases")
+        self.assertIs(self.rat, self.hall.livings_index.find("rodent"))
+
     def test_names(self):
         loc = Location("The Attic", "A dusty attic.")
         self.assertEqual("The Attic", loc.name)
         self.assertEqual("A dusty attic.", loc.description)
 
+    def test_shared_extradesc(self):
+        shared = FrozenDict({"label": "It says 'fragile'."})
+        box1 = Item("box")
+        box2 = Item("box")
+        box1.extra_desc = box2.extra_desc = shared
+        with self.assertRaises(TypeError):
+            box1.extra_desc["label"] = "changed"
+        box1.add_extradesc({"lid"}, "It is closed.")
+        self.assertEqual({"label": "It says 'fragile'.", "lid": "It is closed."}, box1.extra_desc)
+        self.assertIs(shared, box2.extra_desc, "changing one object must copy the shared extradesc")
+        self.assertEqual({"label": "It says 'fragile'."}, shared)
+
     def test_contains(self):
         self.assertTrue(self.julie in self.hall)
         self.assertTrue(self.magazine in self.hall)
@@ -200,6 +253,21 @@ class TestLocations(unittest.TestCase):
         all_verbs = mud_context.driver.current_verbs(player)
         self.assertEqual({"xywobble", "snakeverb", "frobnitz", "kowabooga", "boxverb", "exitverb"}, set(custom_verbs))
         self.assertEqual(set(), set(custom_verbs) - set(all_verbs))
+        # the custom verbs are cached, but must follow the changes in the surroundings
+        self.assertIs(custom_verbs, mud_context.driver.current_custom_verbs(player))
+        room.remove(monster, None)
+        self.assertNotIn("snakeverb", mud_context.driver.current_custom_verbs(player))
+        player.remove(box_in_inventory, player)
+        self.assertNotIn("boxverb", mud_context.driver.current_custom_verbs(player))
+        chair1.verbs["sitdown"] = "c1"
+        self.assertIn("sitdown", mud_context.driver.current_custom_verbs(player))
+        del player.verbs["xywobble"]
+        self.assertNotIn("xywobble", mud_context.driver.current_custom_verbs(player))
+        chair2.verbs = {"rock": "c2"}
+        self.assertIn("rock", mud_context.driver.current_custom_verbs(player))
+        room2 = Location("room2")
+        player.move(room2)
+        self.assertEqual({"kowabooga"}, set(mud_context.driver.current_custom_verbs(player)))
 
     def test_notify(self):
         room = Location("room")
@@ -212,6 +280,81 @@ class TestLocations(unittest.TestCase):
         parsed = ParseResult("verb")
         room.notify_action(parsed, player)
 
+    def test_verb_interest(self):
+        class Lever(Item):
+            handled_verbs = {"pull"}
+            notified_verbs = {"pull", "kick"}
+
+            def init(self):
+                super(Lever, self).init()
+                self.calls = []
+
+            def handle_verb(self, parsed, actor):
+                self.calls.append(("handle", parsed.verb))
+                return True
+
+            def notify_action(self, parsed, actor):
+                self.calls.append(("notify", parsed.verb))
+
+        class Gadget(Lever):
+            handled_verbs = notified_verbs = None    # overrides the methods, so gets all verbs
+
+        room = Location("room")
+        player = Player("julie", "f")
+        lever = Lever("lever")
+        gadget = Gadget("gadget")
+        plain = Item("stone")
+        room.init_inventory([player, lever, plain])
+        self.assertEqual((lever,), room._verb_subscribers_for("handle_verb", "pull"))
+        self.assertEqual((), room._verb_subscribers_for("notify_action", "smile"))
+        self.assertTrue(room.handle_verb(ParseResult("pull"), player))
+        self.assertFalse(room.handle_verb(ParseResult("push"), player))
+        room.notify_action(ParseResult("kick"), player)
+        room.notify_action(ParseResult("smile"), player)
+        self.assertEqual([("handle", "pull"), ("notify", "kick")], lever.calls)
+        # items carried by the livings in the room are included, and the interest follows changes
+        player.insert(gadget, player)
+        room.notify_action(ParseResult("smile"), player)
+        self.assertEqual([("notify", "smile")], gadget.calls)
+        player.remove(gadget, player)
+        room.notify_action(ParseResult("smile"), player)
+        self.assertEqual([("notify", "smile")], gadget.calls)
+        lever.handled_verbs = ALL_VERBS
+        room.verb_interest_changed()
+        self.assertTrue(room.handle_verb(ParseResult("push"), player))
+        room.remove(lever, player)
+        self.assertFalse(room.handle_verb(ParseResult("pull"), player))
+
+    def test_verb_interest_custom_verbs(self):
+        class Machine(Item):
+            handled_verbs = frozenset()
+
+            def init(self):
+                super(Machine, self).init()
+                self.verbs = {"crank": "Crank the machine."}
+
+            def handle_verb(self, parsed, actor):
+                return parsed.verb == "crank"
+
+        class BigMachine(Machine):
+            def init(self):
+                super(BigMachine, self).init()
+                self.verbs["polish"] = "Polish the machine."
+
+            def handle_verb(self, parsed, actor):
+                return parsed.verb == "polish" or super(BigMachine, self).handle_verb(parsed, actor)
+
+        room = Location("room")
+        player = Player("julie", "f")
+        machine = Machine("machine")
+        room.init_inventory([player, machine])
+        self.assertTrue(room.handle_verb(ParseResult("crank"), player))
+        self.assertEqual((), room._verb_subscribers_for("handle_verb", "smile"))
+        room.insert(BigMachine("big machine"), player)
+        self.assertTrue(room.handle_verb(ParseResult("polish"), player), "inherited handled_verbs, but a new custom verb")
+        machine.verbs["oil"] = "Oil the machine."
+        self.assertEqual((machine,), room._verb_subscribers_for("handle_verb", "oil"), "custom verbs changed later")
+
 
 class TestDoorsExits(unittest.TestCase):
     def setUp(self):
@@ -368,6 +511,24 @@ class TestDoorsExits(unittest.TestCase):
         self.assertTrue(zones.town.square is exit.target)
         exit._bind_target(zones)
 
+    def test_match_exit(self):
+        hall = Location("hall")
+        street = Location("street")
+        hall.add_exits([Exit(["north gate", "north"], street, "A gate leads north.")])
+        version = hall.exits_version
+        words = "go through the red door".split()
+        self.assertEqual((None, None, 0), hall.match_exit(words, 3))
+        self.assertEqual(hall.exits["north"], hall.match_exit(["north", "gate"], 0)[0])
+        del hall.exits["north gate"]
+        hall.exits_changed()
+        red_door = Exit("red door", street, "A red door.")
+        red_door.bind(hall)
+        self.assertEqual(2, len(hall.exits), "same amount of exits as before")
+        self.assertGreater(hall.exits_version, version)
+        self.assertEqual((red_door, "red door", 2), hall.match_exit(words, 3))
+        hall.destroy(Context(None, None, None, None))
+        self.assertEqual((None, None, 0), hall.match_exit(words, 3))
+
     def test_title_name(self):
         door = Door("north", "hall", "a locked door", locked=True, opened=False)
         self.assertEqual("north", door.name)
@@ -536,6 +697,14 @@ class TestLiving(unittest.TestCase):
         pubsub.sync()
         self.assertEqual(["msg1 msg2", "msg3 msg4"], collector.messages)
 
+    def test_tell_without_wiretap(self):
+        julie = Living("julie2", "f", race="human")
+        julie.tell("msg1")
+        self.assertNotIn(("wiretap-living", "julie2"), pubsub.all_topics, "wiretap topic should only be created on subscribe")
+        room = Location("Room2")
+        room.tell("msg2")
+        self.assertNotIn(("wiretap-location", "Room2"), pubsub.all_topics, "wiretap topic should only be created on subscribe")
+
     def test_show_inventory(self):
         class Ctx(object):
             class Config(object):
@@ -973,6 +1142,45 @@ class TestFunctions(unittest.TestCase):
         self.assertFalse(item in player)
         self.assertFalse(item in player2)
 
+    def test_clone_protocol(self):
+        class Lamp(Item):
+            clone_shared = Item.clone_shared | {"owner"}
+            clone_shallow = Item.clone_shallow | {"oil"}
+
+        room = Location("room")
+        owner = NPC("max", "m")
+        room.insert(owner, None)
+        lamp = Lamp("lamp")
+        lamp.owner = owner
+        lamp.oil = [[5], [6]]
+        lamp.log = [[1]]
+        lamp.extra_desc = FrozenDict({"wick": "it's burnt"})
+        room.insert(lamp, None)
+        lamp2 = clone(lamp)
+        self.assertIs(room, lamp2.contained_in)
+        self.assertNotIn(lamp2, room)
+        self.assertIs(owner, lamp2.owner)
+        self.assertIsNot(lamp.oil, lamp2.oil)
+        self.assertIs(lamp.oil[0], lamp2.oil[0])
+        self.assertEqual([[1]], lamp2.log)
+        self.assertIsNot(lamp.log[0], lamp2.log[0])
+        self.assertIs(lamp.extra_desc, lamp2.extra_desc)
+        owner._previous_parsed = ParseResult("smile")
+        owner2 = clone(owner)
+        self.assertIs(room, owner2.location)
+        self.assertNotIn(owner2, room)
+        self.assertIs(owner._previous_parsed, owner2._previous_parsed)
+        self.assertIsNot(owner.stats, owner2.stats)
+        self.assertEqual(owner.stats.hp, owner2.stats.hp)
+        self.assertIsNot(owner.soul, owner2.soul)
+        owner2.insert(Item("coin"), owner2)
+        self.assertEqual(0, owner.inventory_size)
+        self.assertIsNone(owner.search_item("coin"))
+        door = Door("north", room, "a door")
+        door2 = clone(door)
+        self.assertIs(room, door2.target)
+        self.assertEqual("north", door2.name)
+
 
 if __name__ == '__main__':
     unittest.main()
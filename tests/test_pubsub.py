@@ -8,7 +8,8 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 import unittest
 import gc
 import time
-from tale.pubsub import topic, unsubscribe_all, Listener, sync, pending
+import threading
+from tale.pubsub import topic, unsubscribe_all, Listener, sync, pending, expire_idle_topics, backlog, has_subscribers
 
 
 class Subber(Listener):
@@ -185,6 +186,99 @@ class TestPubsub(unittest.TestCase):
         s.send("event")
         self.assertLess(s.idle_time, 0.1)
 
+    def test_backlog(self):
+        sync()
+        self.assertEqual({}, backlog())
+        s1 = topic("testA")
+        s2 = topic("testB")
+        s3 = topic("testC")
+        subber = Subber("sub1")
+        s1.subscribe(subber)
+        s2.subscribe(subber)
+        s1.send("one")
+        s1.send("two")
+        s2.send("three")
+        s3.send("four")
+        self.assertEqual({"testA": 2, "testB": 1, "testC": 1}, backlog())
+        s2.sync()
+        self.assertEqual({"testA": 2, "testC": 1}, backlog())
+        s3.destroy()
+        self.assertEqual({"testA": 2}, backlog())
+        sync()
+        self.assertEqual({}, backlog())
+        self.assertEqual([("testB", "three"), ("testA", "one"), ("testA", "two")], subber.messages)
+
+    def test_has_subscribers(self):
+        self.assertFalse(has_subscribers("testsubbers"))
+        self.assertNotIn("testsubbers", pending(), "checking must not create the topic")
+        s = topic("testsubbers")
+        self.assertFalse(s.has_subscribers)
+        self.assertFalse(has_subscribers("testsubbers"))
+        subber = Subber("sub1")
+        s.subscribe(subber)
+        self.assertTrue(s.has_subscribers)
+        self.assertTrue(has_subscribers("testsubbers"))
+        s.unsubscribe(subber)
+        self.assertFalse(has_subscribers("testsubbers"))
+        s.destroy()
+
+    def test_multithreaded_send(self):
+        # many threads hammering send() while the driver thread syncs, must not lose events
+        sync()
+        topics = [topic("stress%d" % i) for i in range(4)]
+        subber = Subber("stress")
+        for t in topics:
+            t.subscribe(subber)
+        num_threads, num_events = 8, 2000
+        start = threading.Event()
+
+        def producer(nr):
+            start.wait()
+            for i in range(num_events):
+                topics[i % len(topics)].send((nr, i))
+
+        threads = [threading.Thread(target=producer, args=(nr,)) for nr in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        while any(thread.is_alive() for thread in threads):
+            sync()
+        for thread in threads:
+            thread.join()
+        sync()
+        self.assertEqual({}, backlog())
+        self.assertEqual(num_threads * num_events, len(subber.messages))
+        for nr in range(num_threads):
+            for t in topics:
+                received = [i for topicname, (sender, i) in subber.messages if sender == nr and topicname == t.name]
+                self.assertEqual(sorted(received), received, "events must arrive in the order they were sent")
+                self.assertEqual(num_events // len(topics), len(received))
+        for t in topics:
+            t.destroy()
+
+    def test_idle_expiry(self):
+        sync()
+        now = time.time()
+        s1 = topic("testA", idle_expiry=10)
+        s2 = topic("testB", idle_expiry=10)
+        s3 = topic("testC", idle_expiry=10)
+        s4 = topic("testD")
+        self.assertEqual(10, s1.idle_expiry)
+        self.assertIsNone(s4.idle_expiry)
+        subber = Subber("sub1")
+        s2.subscribe(subber)
+        self.assertEqual([], expire_idle_topics(now + 5))
+        s3.last_event = now + 5   # as if an event was sent after 5 seconds
+        self.assertEqual(["testA"], expire_idle_topics(now + 11))
+        self.assertEqual("<defunct>", s1.name)
+        self.assertEqual([], expire_idle_topics(now + 14))
+        self.assertEqual(["testC"], expire_idle_topics(now + 16))
+        s2.unsubscribe(subber)
+        self.assertEqual([], expire_idle_topics(now + 16), "expiry must have been pushed back because of the subscriber")
+        self.assertEqual(["testB"], expire_idle_topics(now + 22))
+        self.assertIn("testD", pending())
+        s4.destroy()
+
 
 if __name__ == '__main__':
     unittest.main()
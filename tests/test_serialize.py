@@ -17,6 +17,12 @@ def serializecycle(obj):
     return pickle.loads(ser)
 
 
+class Gadget(base.Item):
+    def init(self):
+        super(Gadget, self).init()
+        self.charge = 42
+
+
 class TestSerializing(unittest.TestCase):
     def setUp(self):
         mud_context.driver = TestDriver()
@@ -36,6 +42,17 @@ class TestSerializing(unittest.TestCase):
         self.assert_base_attrs(x)
         self.assertEqual(["alias"], x.aliases)
 
+    def test_alias_set(self):
+        loc = base.Location("hall")
+        o = base.Item("name", "title", "description")
+        o.aliases = {"alias"}
+        loc.insert(o, None)
+        x = serializecycle(loc)
+        y = list(x.items)[0]
+        self.assertIsInstance(y.aliases, base.AliasSet)
+        y.aliases.add("alias2")
+        self.assertIs(y, x.items_index.find("alias2"), "the loaded aliases must still update the name index")
+
     def test_items_and_container(self):
         o = base.Item("name", "title", "description")
         o.aliases = ["alias"]
@@ -53,6 +70,32 @@ class TestSerializing(unittest.TestCase):
         x = serializecycle(o)
         self.assertEqual("a", x.name)
 
+    def test_slots_and_subclass_attributes(self):
+        o = base.Item("name", "title", "description")
+        self.assertFalse(hasattr(o, "__dict__"), "base items are compact")
+        o.value = 9.5
+        o.add_extradesc({"label"}, "it is old")
+        x = serializecycle(o)
+        self.assert_base_attrs(x)
+        self.assertEqual(9.5, x.value)
+        self.assertEqual({"label": "it is old"}, x.extra_desc)
+        o = Gadget("name", "title", "description")
+        o.verbs = {"zap": "zap it"}
+        o.color = "red"
+        x = serializecycle(o)
+        self.assert_base_attrs(x)
+        self.assertEqual(42, x.charge)
+        self.assertEqual("red", x.color)
+        self.assertEqual({"zap": "zap it"}, x.verbs)
+        o = base.Key("key")
+        o.key_for(code=1234)
+        x = serializecycle(o)
+        self.assertEqual(1234, x.key_code)
+        s = base.Stats.from_race("elf")
+        x = serializecycle(s)
+        self.assertEqual("elf", x.race)
+        self.assertEqual(s.agi, x.agi)
+
     def test_location(self):
         room = base.Location("room", "description")
         x = serializecycle(room)
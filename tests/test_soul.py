@@ -217,6 +217,65 @@ class TestSoul(unittest.TestCase):
         self.assertEqual(None, parsed.who_info[cat].previous_word, "cat doesn't have a previous word")
         self.assertEqual(None, parsed.who_info[player].previous_word, "player doesn't have a previous word")
 
+    def testWhoInfoView(self):
+        soul = tale.soul.Soul()
+        player = tale.player.Player("julie", "f")
+        kate = tale.npc.NPC("kate", "f", title="Kate")
+        cat = tale.npc.NPC("cat", "n", title="hairy cat")
+        player.move(tale.base.Location("somewhere"))
+        cat.move(player.location)
+        kate.move(player.location)
+        parsed = soul.parse(player, "smile at kate and cat and kate")
+        self.assertEqual(["at", "and", "and"], parsed.previous_words)
+        self.assertEqual(2, len(parsed.who_info), "objects occur only once in who_info")
+        self.assertEqual([kate, cat], list(parsed.who_info))
+        self.assertEqual(2, parsed.who_info[kate].sequence, "the last occurrence counts")
+        self.assertEqual({kate: 2, cat: 1}, parsed.who_index())
+        self.assertIsNone(parsed.who_info.get(player))
+        with self.assertRaises(KeyError):
+            parsed.who_info[player]
+        copied = parsed.copy()
+        del copied.who_info[kate]
+        self.assertEqual([cat], copied.who_order)
+        self.assertEqual(["and"], copied.previous_words)
+        self.assertEqual([kate, cat, kate], parsed.who_order, "copy must not share the lists")
+        who, info = copied.who_info.popitem()
+        self.assertIs(cat, who)
+        self.assertEqual("and", info.previous_word)
+        self.assertFalse(copied.who_info)
+        parsed = soul.parse(player, "smile at all except kate")
+        self.assertEqual([cat], parsed.who_order)
+        self.assertEqual(["at"], parsed.previous_words)
+        parsed = tale.soul.ParseResult("smile", who_info={cat: tale.soul.WhoInfo(1, "and"), kate: tale.soul.WhoInfo(0, "at")})
+        self.assertEqual([kate, cat], parsed.who_order)
+        self.assertEqual(["at", "and"], parsed.previous_words)
+        parsed.who_order = [cat]
+        self.assertIsNone(parsed.who_info[cat].previous_word, "changed who_order must not use stale previous words")
+        parsed.recalc_who_info()
+        self.assertEqual([None], parsed.previous_words)
+        self.assertIs(parsed.who_index(), parsed.who_index(), "the index is created only once")
+        parsed.who_info[cat].previous_word = "with"
+        self.assertEqual(["with"], parsed.previous_words, "changing the previous word must change the parse result")
+        parsed.who_info[kate] = tale.soul.WhoInfo(previous_word="and")
+        self.assertEqual([cat, kate], parsed.who_order)
+        self.assertEqual(["with", "and"], parsed.previous_words)
+        self.assertEqual(1, parsed.who_info[kate].sequence)
+        copied = parsed.who_info.copy()
+        self.assertIsInstance(copied, dict)
+        copied[cat].previous_word = "at"
+        del copied[kate]
+        self.assertEqual(["with", "and"], parsed.previous_words, "a copy is independent of the parse result")
+        self.assertEqual("at", copied[cat].previous_word)
+        parsed.who_order.append(cat)
+        parsed.recalc_who_info()
+        self.assertEqual(2, parsed.who_info[cat].sequence, "the index follows changes in who_order")
+        parsed.who_order = [kate]
+        self.assertNotIn(cat, parsed.who_info)
+        self.assertEqual(1, len(parsed.who_info))
+        parsed.who_order[0] = cat
+        parsed.who_order_changed()
+        self.assertEqual([cat], list(parsed.who_info))
+
     def testVerbTarget(self):
         soul = tale.soul.Soul()
         player = tale.player.Player("julie", "f")
@@ -392,6 +451,9 @@ class TestSoul(unittest.TestCase):
         self.assertEqual((None, None, 0), result)
         result = tale.soul.check_name_with_spaces(["give", "paper", "to", "brown", "bird"], 3, livings, items)
         self.assertEqual(("BROWN BIRD", "brown bird", 2), result)
+        items["dark red"] = "DARK RED"
+        result = tale.soul.check_name_with_spaces(["give", "the", "dark", "red", "crystal", "to", "rat"], 2, livings, items)
+        self.assertEqual(("DARK RED CRYSTAL", "dark red crystal", 3), result, "longest name must win")
 
     def testCheckNamesWithSpacesParsing(self):
         soul = tale.soul.Soul()
@@ -435,6 +497,89 @@ class TestSoul(unittest.TestCase):
         self.assertEqual("door two", parsed.verb)
         self.assertEqual([door2], parsed.who_order)
 
+    def testInputLimits(self):
+        soul = tale.soul.Soul()
+        player = tale.player.Player("julie", "f")
+        player.move(tale.base.Location("somewhere"))
+        with self.assertRaises(tale.errors.ParseError) as x:
+            soul.parse(player, "smile " + "a" * tale.soul.MAX_INPUT_LENGTH)
+        self.assertEqual("That's way too long.", str(x.exception))
+        with self.assertRaises(tale.errors.ParseError) as x:
+            soul.parse(player, "smile" + " happily" * tale.soul.MAX_INPUT_WORDS)
+        self.assertEqual("That's way too many words.", str(x.exception))
+        parsed = soul.parse(player, "chant '%s'" % ("bla " * 200))
+        self.assertEqual("chant", parsed.verb)
+
+    def testParseCache(self):
+        soul = tale.soul.Soul()
+        cache = tale.soul.ParseCache()
+        soul.parse_cache = cache
+        player = tale.player.Player("julie", "f")
+        room = tale.base.Location("somewhere")
+        player.move(room)
+        max_npc = tale.npc.NPC("max", "m")
+        room.insert(max_npc, None)
+        parsed = soul.parse(player, "smile at max")
+        parsed.who_order.pop()
+        parsed.who_info.clear()
+        parsed = soul.parse(player, "smile at max")
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        self.assertEqual([max_npc], parsed.who_order, "cached results must be copied")
+        self.assertEqual(0, parsed.who_info[max_npc].sequence)
+        room.add_exits([tale.base.Exit("north", "elsewhere", "A path leads north.")])
+        with self.assertRaises(tale.soul.NonSoulVerb):
+            soul.parse(player, "north")
+        with self.assertRaises(tale.soul.NonSoulVerb) as x:
+            soul.parse(player, "north")
+        self.assertEqual("north", x.exception.parsed.verb)
+        self.assertEqual((2, 2), (cache.hits, cache.misses))
+        # changes in the room invalidate the cached results
+        room.remove(max_npc, None)
+        parsed = soul.parse(player, "smile at max")
+        self.assertEqual([], parsed.who_order)
+        room.insert(max_npc, None)
+        room.insert(tale.npc.NPC("kate", "f"), None)
+        parsed = soul.parse(player, "smile at max")
+        self.assertEqual([max_npc], parsed.who_order)
+        self.assertEqual((2, 4), (cache.hits, cache.misses))
+        # parses involving pronouns are not cached
+        soul.previously_parsed = parsed
+        soul.parse(player, "kiss him")
+        soul.parse(player, "kiss him")
+        self.assertEqual((2, 4), (cache.hits, cache.misses))
+        cache.reset_stats()
+        self.assertEqual(0.0, cache.hit_rate)
+        cache.size = 2
+        for cmd in ["smile", "grin", "nod", "grin"]:
+            soul.parse(player, cmd)
+        self.assertEqual(0.25, cache.hit_rate)
+        self.assertEqual(["nod", "grin"], [key[1] for key in cache.entries])
+
+    def testParseCacheInvalidation(self):
+        self.assertIsNone(tale.soul.Soul.parse_cache, "parse cache must be opt-in")
+        soul = tale.soul.Soul()
+        soul.parse_cache = tale.soul.ParseCache()
+        player = tale.player.Player("julie", "f")
+        room = tale.base.Location("somewhere")
+        player.move(room)
+        kate = tale.npc.NPC("kate", "f")
+        kate.aliases = {"katie"}
+        room.insert(kate, None)
+        with self.assertRaises(tale.errors.ParseError):
+            soul.parse(player, "smile at kat")
+        kate.aliases.add("kat")
+        self.assertEqual([kate], soul.parse(player, "smile at kat").who_order, "alias changed in place")
+        room.add_exits([tale.base.Exit("north", "elsewhere", "A path leads north.")])
+        with self.assertRaises(tale.soul.NonSoulVerb):
+            soul.parse(player, "north")
+        del room.exits["north"]
+        room.exits_changed()
+        tale.base.Exit("south", "elsewhere", "A path leads south.").bind(room)
+        with self.assertRaises(tale.soul.UnknownVerbException):
+            soul.parse(player, "north")
+        for key in soul.parse_cache.entries:
+            self.assertFalse(any(isinstance(k, tale.base.MudObject) for k in key), "the cache must not keep objects alive")
+
     def testEnterExits(self):
         soul = tale.soul.Soul()
         player = tale.player.Player("julie", "f")
@@ -813,6 +958,33 @@ class TestSoul(unittest.TestCase):
             parsed = soul.parse(player, "kiss her")
         self.assertEqual("She is no longer around.", str(x.exception))
 
+    def test_verb_template(self):
+        template = tale.soul.compile_verb_template("wave$ 100% \nYOUR hand \nHOW \nAT")
+        self.assertEqual("wave$ 100%%%%%%(YOUR)s hand%(HOW)s \nAT", template)
+        action = template % {"HOW": " happily"}
+        self.assertEqual("wave$ 100% your hand happily \nAT", action % {"YOUR": " your"})
+        template = tale.soul.compile_verb_template("stretch \nWHERE")
+        action = template % {"WHERE": tale.soul._template_value(" on \nYOUR toes, 50%")}
+        self.assertEqual("stretch on their toes, 50%", action % {"YOUR": " their"})
+
+    def test_verb_templates_recompiled(self):
+        soul = tale.soul.Soul()
+        player = tale.player.Player("julie", "f")
+        parsed = tale.soul.ParseResult("frobnizificate")
+        ORIG_VERBS = tale.soul.VERBS.copy()
+        try:
+            tale.soul.VERBS["frobnizificate"] = (tale.soul.SIMP, None, "frobnize$ \nHOW \nAT", "at")
+            who, player_msg, room_msg, target_msg = soul.process_verb_parsed(player, parsed)
+            self.assertEqual("You frobnize.", player_msg)
+            self.assertEqual("Julie frobnizes.", room_msg)
+            tale.soul.VERBS["frobnizificate"] = (tale.soul.SIMP, None, "twiddle$ \nYOUR thumbs \nHOW", "at")
+            who, player_msg, room_msg, target_msg = soul.process_verb_parsed(player, parsed)
+            self.assertEqual("You twiddle your thumbs.", player_msg)
+            self.assertEqual("Julie twiddles her thumbs.", room_msg)
+        finally:
+            tale.soul.VERBS = ORIG_VERBS
+            tale.soul.verbs_changed()
+
     def test_adjust_verbs(self):
         allowed = ["hug", "ponder", "sit", "kick", "cough", "greet", "poke", "yawn"]
         remove = ["hug", "kick"]
@@ -835,6 +1007,20 @@ class TestSoul(unittest.TestCase):
             tale.soul.AGGRESSIVE_VERBS = ORIG_AGGRESSIVE_VERBS
             tale.soul.NONLIVING_OK_VERBS = ORIG_NONLIVING_OK_VERBS
             tale.soul.MOVEMENT_VERBS = ORIG_MOVEMENT_VERBS
+            tale.soul.verbs_changed()
+
+    def test_verbs_by_prefix(self):
+        self.assertIn("smile", tale.soul.verbs_by_prefix("smi"))
+        ORIG_VERBS = tale.soul.VERBS.copy()
+        try:
+            tale.soul.VERBS["frobnizificate"] = tale.soul.VERBS.pop("smile")
+            tale.soul.verbs_changed()
+            self.assertNotIn("smile", tale.soul.verbs_by_prefix("smi"), "same amount of verbs, but renamed")
+            self.assertEqual(["frobnizificate"], tale.soul.verbs_by_prefix("frob"))
+        finally:
+            tale.soul.VERBS = ORIG_VERBS
+            tale.soul.verbs_changed()
+        self.assertEqual([], tale.soul.verbs_by_prefix("frob"))
 
 
 if __name__ == "__main__":
@@ -26,6 +26,7 @@ class StoryCaseBase(object):
         # it more or less gets the job done to be able to load the next story.
         del sys.path[0]
         tale.soul.VERBS = self.verbs
+        tale.soul.verbs_changed()
         for m in list(sys.modules.keys()):
             if m.startswith("zones") or m == "story":
                 del sys.modules[m]
@@ -6,6 +6,7 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 """
 from __future__ import print_function, division, unicode_literals, absolute_import
 import datetime
+import pickle
 import unittest
 from tale import util, mud_context, pubsub
 from tale.errors import ParseError, ActionRefused
@@ -374,6 +375,118 @@ class TestUtil(unittest.TestCase):
             func(42, actor=actor2)
         func(42, actor=actor3)
 
+    def test_frozendict(self):
+        d = util.FrozenDict({"a": 1}, b=2)
+        self.assertEqual({"a": 1, "b": 2}, d)
+        with self.assertRaises(TypeError):
+            d["c"] = 3
+        with self.assertRaises(TypeError):
+            d.update(c=3)
+        with self.assertRaises(TypeError):
+            del d["a"]
+        with self.assertRaises(TypeError):
+            d.pop("a")
+        copied = d.copy()
+        copied["c"] = 3
+        self.assertEqual({"a": 1, "b": 2}, d)
+        x = pickle.loads(pickle.dumps(d, pickle.HIGHEST_PROTOCOL))
+        self.assertIsInstance(x, util.FrozenDict)
+        self.assertEqual(d, x)
+
+
+class TestNameIndex(unittest.TestCase):
+    def test_index(self):
+        key = Item("key", "rusty key")
+        key.aliases = {"rusty"}
+        key2 = Item("key", "shiny key")
+        bag = Item("bag", "Leather Bag")
+        index = util.NameIndex([key, bag])
+        self.assertEqual(2, len(index))
+        self.assertIs(key, index.find("key"))
+        self.assertIs(key, index.find("rusty"))
+        self.assertIsNone(index.find("rusty key"), "find doesn't look at titles")
+        self.assertIs(key, index.search("Rusty Key"))
+        self.assertIs(bag, index.search("leather bag"))
+        self.assertTrue("rusty" in index)
+        self.assertFalse("leather bag" in index)
+        self.assertIs(key, index["key"])
+        with self.assertRaises(KeyError):
+            index["bottle"]
+        self.assertEqual({"key", "rusty", "bag"}, set(index))
+        index.add(key2)
+        self.assertIs(key2, index.find("key"))
+        index.discard(key2)
+        index.discard(key2)
+        self.assertIs(key, index.find("key"))
+        key.aliases = {"old"}   # the name index isn't notified because the key isn't in a location
+        index.add(key)
+        self.assertIsNone(index.find("rusty"))
+        self.assertIs(key, index.find("old"))
+        self.assertEqual(2, len(index))
+        index.clear()
+        self.assertEqual(0, len(index))
+        self.assertIsNone(index.find("key"))
+
+    def test_indexes(self):
+        key = Item("key")
+        key2 = Item("key")
+        bag = Item("bag")
+        indexes = util.NameIndexes(util.NameIndex([key]), util.NameIndex([key2, bag]))
+        self.assertIs(key, indexes["key"])
+        self.assertIs(bag, indexes["bag"])
+        self.assertIsNone(indexes.find("bottle"))
+        self.assertTrue("bag" in indexes)
+        self.assertEqual(3, len(indexes))
+        self.assertEqual(["bag", "key", "key"], sorted(indexes))
+        self.assertIs(key2, util.search_item("KEY", util.NameIndex([key2])))
+
+    def test_token_trie(self):
+        trie = util.TokenTrie(["brown bird", "dark red crystal", "dark red"])
+        words = "give the dark red crystal to the brown bird".split()
+        self.assertEqual(("dark red crystal", 3), trie.longest_match(words, 2))
+        self.assertEqual((None, 0), trie.longest_match(words, 3))
+        self.assertEqual(("brown bird", 2), trie.longest_match(words, 7))
+        self.assertEqual((None, 0), trie.longest_match(words, 8))
+        trie.discard("dark red crystal")
+        self.assertEqual(("dark red", 2), trie.longest_match(words, 2))
+        trie.add("brown bird")
+        trie.discard("brown bird")
+        self.assertEqual(("brown bird", 2), trie.longest_match(words, 7), "was added twice")
+        trie.discard("brown bird")
+        trie.discard("dark red")
+        trie.discard("unknown name")
+        self.assertEqual({}, trie.root)
+        bird = Item("brown bird")
+        bird.aliases = {"bird"}
+        index = util.NameIndex([bird, Item("crystal")])
+        self.assertEqual((bird, "brown bird", 2), index.longest_match(words, 7))
+        self.assertEqual((bird, "bird", 1), index.longest_match(words, 8))
+        self.assertEqual((None, None, 0), index.longest_match(words, 2))
+        index.discard(bird)
+        self.assertEqual((None, None, 0), index.longest_match(words, 7))
+
+    def test_names_by_prefix(self):
+        words = ["apple", "banana", "bandana", "band", "cherry"]
+        words.sort()
+        self.assertEqual(["banana", "band", "bandana"], util.words_by_prefix(words, "ban"))
+        self.assertEqual(["banana", "band"], util.words_by_prefix(words, "ban", 2))
+        self.assertEqual(["cherry"], util.words_by_prefix(words, "c"))
+        self.assertEqual([], util.words_by_prefix(words, "d"))
+        self.assertEqual(words, util.words_by_prefix(words, ""))
+        key = Item("key")
+        key.aliases = {"keyring"}
+        kettle = Item("kettle")
+        index = util.NameIndex([key, kettle])
+        self.assertEqual(["kettle", "key", "keyring"], index.names_by_prefix("ke"))
+        self.assertEqual(["kettle"], index.names_by_prefix("ke", 1))
+        index.add(Item("kerosine"))
+        self.assertEqual(["kerosine", "kettle", "key", "keyring"], index.names_by_prefix("ke"))
+        index.discard(kettle)
+        self.assertEqual(["kerosine", "key", "keyring"], index.names_by_prefix("ke"))
+        indexes = util.NameIndexes(util.NameIndex([Item("kite")]), index)
+        self.assertEqual(["kite", "kerosine"], indexes.names_by_prefix("k", 2))
+        self.assertEqual(["kite", "kerosine", "key", "keyring"], indexes.names_by_prefix("k"))
+
 
 if __name__ == '__main__':
     unittest.main()